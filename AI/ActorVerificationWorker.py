@@ -0,0 +1,180 @@
+import math
+import queue
+import threading
+import time
+
+from Core import Logger
+from Core.PublicDroneControl import PublicDroneControl
+
+# Seconds during which detections near the screen point an actor was verified at are not hit tested again: about the time for the UE engine to
+# remove the actor from the image and for Yolo to analyze a frame without it. Another person detected there meanwhile is only verified afterwards
+RECENT_POINT_TTL = 0.2
+RECENT_POINT_RADIUS = 0.05  # Normalized screen distance from that point
+POINT_GRID = 0.01  # Points of a coalesced batch closer than this (normalized screen distance) are hit tested once
+
+
+class ActorVerificationWorker(threading.Thread):
+    """
+    Thread verifying the people detected by Yolo with the UE engine and destroying the verified actors, so the grading loop never waits for a round trip.
+    Points submitted while a verification is running are coalesced into the next one: one GetTargetsOfPoints and one DestroyActors for all of them.
+
+    Actors are tracked by their index, as the same person is detected in many consecutive frames:
+    - an actor is only reported (and scored) once, when the UE engine confirmed its destroy;
+    - an actor whose destroy was sent but not confirmed (lost round trip) is in flight: it is sent again with the next DestroyActors, and is not hit
+      tested meanwhile;
+    - for a short time after an actor was destroyed, detections near the screen point it was seen at are dropped without a hit test.
+    """
+
+    def __init__(self, publicDroneControl: PublicDroneControl, onVerified, logger: Logger.LoggerThread = None,
+                 recentPointTtl: float = RECENT_POINT_TTL, recentPointRadius: float = RECENT_POINT_RADIUS):
+        """
+        :param publicDroneControl: PublicDroneControl to hit test the points and destroy the actors with
+        :param onVerified: function called from the worker thread with the list of indices of the actors confirmed destroyed, and the
+                           time.monotonic() at which the oldest frame they were detected in was captured (None if unknown)
+        :param logger: logger to log lost round trips, None to not log
+        :param recentPointTtl: seconds during which detections near a destroyed actor are dropped
+        :param recentPointRadius: normalized screen distance from a destroyed actor within which detections are dropped
+        """
+        threading.Thread.__init__(self)
+        self.daemon = True
+        self._stop_event = threading.Event()
+
+        self._publicDroneControl = publicDroneControl
+        self._onVerified = onVerified
+        self._logger = logger
+        self.recentPointTtl = recentPointTtl
+        self.recentPointRadius = recentPointRadius
+
+        self._pending = queue.SimpleQueue()  # Lists of points submitted, with their frame timestamp. None wakes up the thread to stop it
+        self._inFlight = set()  # Indices of the actors whose destroy was sent but not confirmed
+        self._recentPoints = {}  # Actor index -> (x, y, expiry time.monotonic()) of the screen point the destroyed actor was seen at
+        self.destroyedActors = set()  # Indices of the actors confirmed destroyed
+
+        # Counters
+        self.pointsSubmitted = 0
+        self.pointsSkipped = 0  # Not hit tested: duplicates in a coalesced batch, or near a recently destroyed actor
+        self.hitTests = 0  # GetTargetsOfPoints round trips
+        self.lostRoundTrips = 0
+
+    def submit(self, points, frameTimestamp: float = None) -> None:
+        """
+        Queue points to verify, without waiting. Called from any thread
+        :param points: list of (normalized X, normalized Y) coordinates on screen, e.g. the centers of the people detected in a frame
+        :param frameTimestamp: time.monotonic() at which the frame the points were detected in was captured
+        :return: None
+        """
+        if points:
+            self._pending.put((list(points), frameTimestamp))
+
+    def stop(self):
+        """
+        Method to be called when the thread should be stopped (stop itself)
+        :return:
+        """
+        self._stop_event.set()
+        self._pending.put(None)  # Wake up the thread
+
+    def stopped(self):
+        """
+        Check if the thread has been stopped
+        :return:
+        """
+        return self._stop_event.is_set()
+
+    def is_running(self):
+        """
+        More explicit method to check if the thread is currently running.
+        """
+        return self.is_alive() and not self.stopped()
+
+    def run(self):
+        """
+        Method to be executed by the thread: verify the submitted points, coalescing those submitted during the previous verification
+        :return:
+        """
+        while not self.stopped():
+            submitted = [self._pending.get()]
+            while not self._pending.empty():
+                submitted.append(self._pending.get())
+            submitted = [entry for entry in submitted if entry is not None]
+            if not submitted or self.stopped():
+                continue
+
+            points = [point for entryPoints, _ in submitted for point in entryPoints]
+            frameTimestamps = [frameTimestamp for _, frameTimestamp in submitted if frameTimestamp is not None]
+            self.pointsSubmitted += len(points)
+            try:
+                self._verify(points, min(frameTimestamps) if frameTimestamps else None)
+            except Exception as e:
+                if self._logger is not None:
+                    self._logger.exception(f"Error in actor verification: {e}")
+
+    def _pointsToHitTest(self, points, now: float) -> list[tuple[float, float]]:
+        """
+        :param points: submitted points
+        :param now: current time.monotonic()
+        :return: the points not near an actor destroyed recently, with duplicates removed
+        """
+        self._recentPoints = {index: recent for index, recent in self._recentPoints.items() if recent[2] > now}
+        cells = set()
+        selected = []
+        for x, y in points:
+            cell = (round(x / POINT_GRID), round(y / POINT_GRID))
+            if cell in cells or any(math.hypot(x - recentX, y - recentY) <= self.recentPointRadius for recentX, recentY, _ in self._recentPoints.values()):
+                continue
+            cells.add(cell)
+            selected.append((x, y))
+        self.pointsSkipped += len(points) - len(selected)
+        return selected
+
+    def _verify(self, points, frameTimestamp: float or None) -> None:
+        """
+        Hit test the points, and destroy the actors hit along with the ones still in flight, in one round trip each
+        :param points: submitted points
+        :param frameTimestamp: time.monotonic() at which the oldest frame of the points was captured
+        :return: None
+        """
+        points = self._pointsToHitTest(points, time.monotonic())
+        hits = {}  # Actor index -> screen point it was hit at
+        if points:
+            self.hitTests += 1
+            try:
+                targets = self._publicDroneControl.getTargetsOfPoints(points)
+            except TimeoutError as e:
+                self._lostRoundTrip(e)
+                targets = []
+            for point, target in zip(points, targets):
+                index = self._publicDroneControl.actorIndex.indexOfTarget(target)  # None once destroyed
+                if index is not None and index not in self._inFlight:
+                    hits.setdefault(index, point)
+        if not hits and not self._inFlight:
+            return
+
+        self._inFlight.update(hits)
+        try:
+            destroyed = self._publicDroneControl.destroyActors(sorted(self._inFlight))
+        except TimeoutError as e:
+            self._lostRoundTrip(e)  # Still in flight, sent again with the next verification
+            return
+
+        now = time.monotonic()
+        destroyed = [index for index in destroyed if index in self._inFlight and index not in self.destroyedActors]
+        self._inFlight.clear()  # Answered: actors not confirmed do not exist anymore for the UE engine
+        for index in destroyed:
+            self.destroyedActors.add(index)
+            if index in hits:
+                self._recentPoints[index] = (*hits[index], now + self.recentPointTtl)
+        if destroyed:
+            self._onVerified(destroyed, frameTimestamp)
+
+    def _lostRoundTrip(self, error: Exception) -> None:
+        self.lostRoundTrips += 1
+        if self._logger is not None:
+            self._logger.warning(f"Actor verification not received: {error}")
+
+    def summary(self) -> str:
+        """
+        :return: counters of the worker, for the logs
+        """
+        return (f"Actor verification: submitted={self.pointsSubmitted} skipped={self.pointsSkipped} hitTests={self.hitTests} "
+                f"destroyed={len(self.destroyedActors)} inFlight={len(self._inFlight)} lost={self.lostRoundTrips}")
@@ -1,17 +1,29 @@
 import threading
+import time
+
 import cv2
 from cv2 import aruco
 
+from AI.FrameBroker import FrameSubscription
 from AI.ThreadSafeResults import ThreadSafeResults
 
 
 class ArucoDetection(threading.Thread):
-    def __init__(self, latest_results: ThreadSafeResults):
+    def __init__(self, latest_results: ThreadSafeResults, frameSource: FrameSubscription = None):
+        """
+        :param latest_results: results of the detection on the latest frame
+        :param frameSource: subscription to a FrameBroker to read the frames from, None to open the webcam
+        """
         # Initializing the thread without running it
         threading.Thread.__init__(self)
         self._stop_event = threading.Event()
         self._start_event = threading.Event()  # Event to track if the thread has started
         self.latest_results: ThreadSafeResults = latest_results
+        self.frameSource = frameSource
+
+        # Set up the Aruco dictionary and parameters
+        self.arucoDict = aruco.getPredefinedDictionary(aruco.DICT_4X4_1000)
+        self.arucoParams = aruco.DetectorParameters()
 
     def stop(self):
         """
@@ -19,6 +31,8 @@ class ArucoDetection(threading.Thread):
         :return: 
         """""
         self._stop_event.set()
+        if self.frameSource is not None:
+            self.frameSource.close()  # Wake up the thread waiting for a frame
 
     def stopped(self):
         """
@@ -47,6 +61,13 @@ class ArucoDetection(threading.Thread):
         """
         self._start_event.set()
 
+        if self.frameSource is not None:
+            for frame in self.frameSource:  # Until the subscription is closed
+                if self.stopped():
+                    break
+                self._detect(frame.image, frame.timestamp)
+            return
+
         cap = cv2.VideoCapture(0)  # Initialize the webcam (0 is the default webcam)
 
         # Set the resolution
@@ -59,16 +80,13 @@ class ArucoDetection(threading.Thread):
         while not self.stopped():
             ret, frame = cap.read()  # Read a frame
             if ret:  # Check if the frame is read correctly
-
-                # Set up the Aruco dictionary and parameters
-                arucoDict = aruco.getPredefinedDictionary(aruco.DICT_4X4_1000)
-                arucoParams = aruco.DetectorParameters()
-
-                corners, ids, rejected = cv2.aruco.detectMarkers(frame, arucoDict, parameters=arucoParams)  # Detect aruco codes in frame
-                self.latest_results.update_results((corners, ids, rejected))
-
+                self._detect(frame, time.monotonic())
             else:
                 print("Aruco: Failed to capture frame")
 
         # Release the VideoCapture object
         cap.release()
+
+    def _detect(self, frame, frameTimestamp: float) -> None:
+        corners, ids, rejected = cv2.aruco.detectMarkers(frame, self.arucoDict, parameters=self.arucoParams)  # Detect aruco codes in frame
+        self.latest_results.update_results((corners, ids, rejected), frameTimestamp=frameTimestamp)
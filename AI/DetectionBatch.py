@@ -0,0 +1,178 @@
+import numpy as np
+
+# One row per detected object
+DETECTION_DTYPE = np.dtype([
+    ('cls', np.int32),  # Class index, see DetectionBatch.names
+    ('conf', np.float32),  # Confidence
+    ('xywhn', np.float32, (4,)),  # x_center, y_center, width, height, normalized to the image size (0 to 1)
+    ('xyxy', np.float32, (4,)),  # xmin, ymin, xmax, ymax in pixels of the original image
+    ('frame_id', np.int64),  # Index of the frame the object was detected in
+    ('timestamp', np.float64),  # time.monotonic() at which the frame was received by the detection
+    ('track_id', np.int64),  # Id of the object across frames given by AI.DetectionTracker, NO_TRACK if not tracked
+])
+NO_TRACK = -1
+
+
+class DetectionView:
+    """
+    Lazy view on one row of a DetectionBatch, with the attributes of YoloDetectionObject (as numbers, not strings).
+    Values are only read from the batch when accessed.
+    """
+    __slots__ = ('_batch', '_index')
+
+    def __init__(self, batch: 'DetectionBatch', index: int):
+        self._batch = batch
+        self._index = index
+
+    @property
+    def objectName(self) -> str:
+        return self._batch.names[int(self._batch.array['cls'][self._index])]
+
+    @property
+    def xCenter(self) -> float:
+        return float(self._batch.array['xywhn'][self._index, 0])
+
+    @property
+    def yCenter(self) -> float:
+        return float(self._batch.array['xywhn'][self._index, 1])
+
+    @property
+    def width(self) -> float:
+        return float(self._batch.array['xywhn'][self._index, 2])
+
+    @property
+    def height(self) -> float:
+        return float(self._batch.array['xywhn'][self._index, 3])
+
+    @property
+    def confidence(self) -> float:
+        return float(self._batch.array['conf'][self._index])
+
+    @property
+    def trackId(self) -> int:
+        return int(self._batch.array['track_id'][self._index])
+
+    def __str__(self):
+        return f"{self.objectName}"
+
+    def __repr__(self):
+        return self.__str__()
+
+
+class DetectionBatch:
+    """
+    Class to represent all the objects detected by Yolo in a frame, as columns of a numpy structured array (see DETECTION_DTYPE),
+    without a Python object per detected object. Iterating or indexing gives lazy DetectionView objects, for code written for YoloDetectionObject.
+    """
+
+    def __init__(self, array: np.ndarray, names):
+        """
+        :param array: structured array of dtype DETECTION_DTYPE
+        :param names: class names of the model, indexed by class index (list, or dict as in DetectMultiBackend.names)
+        """
+        self.array = array
+        self.names = names
+
+    @classmethod
+    def empty(cls, names) -> 'DetectionBatch':
+        """
+        :param names: class names of the model
+        :return: batch without any detected object
+        """
+        return cls(np.zeros(0, dtype=DETECTION_DTYPE), names)
+
+    @classmethod
+    def concatenate(cls, batches) -> 'DetectionBatch':
+        """
+        :param batches: batches of detections of the same model, at least one
+        :return: batch of the objects of all the batches, in order
+        """
+        batches = list(batches)
+        return cls(np.concatenate([batch.array for batch in batches]), batches[0].names)
+
+    @classmethod
+    def fromArrays(cls, names, classes, confidences, xywhn, xyxy, frameId: int, timestamp: float, trackIds=NO_TRACK) -> 'DetectionBatch':
+        """
+        :param names: class names of the model
+        :param classes: (n,) class indices
+        :param confidences: (n,) confidences
+        :param xywhn: (n, 4) normalized x_center, y_center, width, height
+        :param xyxy: (n, 4) xmin, ymin, xmax, ymax in pixels
+        :param frameId: index of the frame
+        :param timestamp: time.monotonic() at which the frame was received
+        :param trackIds: (n,) track ids, NO_TRACK if the objects are not tracked
+        :return: batch of the n detected objects
+        """
+        array = np.empty(len(classes), dtype=DETECTION_DTYPE)
+        array['cls'] = classes
+        array['conf'] = confidences
+        array['xywhn'] = xywhn
+        array['xyxy'] = xyxy
+        array['frame_id'] = frameId
+        array['timestamp'] = timestamp
+        array['track_id'] = trackIds
+        return cls(array, names)
+
+    @property
+    def cls(self) -> np.ndarray:
+        return self.array['cls']
+
+    @property
+    def conf(self) -> np.ndarray:
+        return self.array['conf']
+
+    @property
+    def xywhn(self) -> np.ndarray:
+        return self.array['xywhn']
+
+    @property
+    def xyxy(self) -> np.ndarray:
+        return self.array['xyxy']
+
+    @property
+    def trackIds(self) -> np.ndarray:
+        return self.array['track_id']
+
+    def classIndex(self, name: str) -> int or None:
+        """
+        :param name: class name, e.g. "person"
+        :return: index of the class, or None if the model has no such class
+        """
+        items = self.names.items() if isinstance(self.names, dict) else enumerate(self.names)
+        return next((index for index, className in items if className == name), None)
+
+    def ofClass(self, name: str) -> 'DetectionBatch':
+        """
+        :param name: class name, e.g. "person"
+        :return: batch of the detected objects of this class only
+        """
+        index = self.classIndex(name)
+        if index is None:
+            return DetectionBatch(self.array[:0], self.names)
+        return DetectionBatch(self.array[self.array['cls'] == index], self.names)
+
+    def centers(self) -> np.ndarray:
+        """
+        :return: (n, 2) normalized x_center, y_center of the detected objects, as given to verifyAndDestroyActorFromPoint
+        """
+        return self.array['xywhn'][:, :2]
+
+    def __len__(self):
+        return len(self.array)
+
+    def __getitem__(self, index):
+        if isinstance(index, (int, np.integer)):
+            if not -len(self.array) <= index < len(self.array):
+                raise IndexError(f"Detection index {index} out of range for a batch of {len(self.array)}")
+            return DetectionView(self, int(index) % len(self.array))
+        return DetectionBatch(self.array[index], self.names)  # Slice or mask
+
+    def __iter__(self):
+        for index in range(len(self.array)):
+            yield DetectionView(self, index)
+
+    def __str__(self):
+        return f"DetectionBatch({', '.join(str(view) for view in self)})"
+
+    def __repr__(self):
+        return self.__str__()
@@ -0,0 +1,210 @@
+import itertools
+
+import numpy as np
+from scipy.optimize import linear_sum_assignment
+
+from AI.DetectionBatch import NO_TRACK, DetectionBatch
+
+DEFAULT_IOU_THRESHOLD = 0.3  # Minimal IOU between a detection and the predicted box of a track to associate them
+DEFAULT_MAX_AGE = 15  # Frames a track is kept without being detected (frames skipped by the keyframe mode included)
+DEFAULT_MIN_HITS = 2  # Detections needed before a track is reported, so a single false detection never gets an id
+# Maximal distance between the centers of a detection and of the predicted box of a track, in sizes of the box (square root of its area), to
+# associate them when they do not overlap enough: small objects (people seen from the drone) moving between two keyframes, or tracks whose
+# velocity is not known yet
+DEFAULT_DISTANCE_GATE = 2.0
+
+
+class _KalmanBoxTrack:
+    """
+    Track of one object: constant velocity Kalman filter on the box x_center, y_center, area, aspect ratio (as in SORT), in pixels
+    """
+    # State: x, y, s (area), r (aspect ratio), vx, vy, vs. The aspect ratio is assumed constant
+    _F = np.eye(7) + np.eye(7, k=4)  # Transition, one frame
+    _H = np.eye(4, 7)  # Measurement
+    _Q = np.diag([1, 1, 1, 1, 0.01, 0.01, 0.0001])  # Process noise
+    _R = np.diag([1, 1, 10, 10])  # Measurement noise
+
+    def __init__(self, trackId: int, box: np.ndarray, cls: int, conf: float):
+        self.trackId = trackId
+        self.cls = cls
+        self.conf = conf
+        self.x = np.zeros(7)
+        self.x[:4] = _toMeasurement(box)
+        self.P = np.diag([10, 10, 10, 10, 1e4, 1e4, 1e4])  # High uncertainty of the unobserved initial velocity
+        self.hits = 1
+        self.age = 0  # Frames since the last detection
+
+    def predict(self) -> np.ndarray:
+        if self.x[2] + self.x[6] <= 0:  # The area would become negative
+            self.x[6] = 0.0
+        self.x = self._F @ self.x
+        self.P = self._F @ self.P @ self._F.T + self._Q
+        self.age += 1
+        return self.box()
+
+    def update(self, box: np.ndarray, cls: int, conf: float) -> None:
+        y = _toMeasurement(box) - self._H @ self.x
+        S = self._H @ self.P @ self._H.T + self._R
+        K = self.P @ self._H.T @ np.linalg.inv(S)
+        self.x = self.x + K @ y
+        self.P = (np.eye(7) - K @ self._H) @ self.P
+        self.cls, self.conf = cls, conf
+        self.hits += 1
+        self.age = 0
+
+    def box(self) -> np.ndarray:
+        """
+        :return: xyxy of the current estimate
+        """
+        x, y, s, r = self.x[:4]
+        w = np.sqrt(max(s, 0.0) * max(r, 1e-6))
+        h = max(s, 0.0) / w if w > 0 else 0.0
+        return np.array([x - w / 2, y - h / 2, x + w / 2, y + h / 2])
+
+
+class DetectionTracker:
+    """
+    SORT-style tracker over the Yolo detections: every object gets a stable track id across frames (DetectionBatch.trackIds), by associating
+    the detections of a frame with the boxes predicted by a Kalman filter per track (Hungarian assignment on the IOU).
+    Between two frames run through the detector (keyframe mode of runYoloDetection), predict propagates the tracks, so consumers still get a
+    box per object on every frame while the detector only runs on one frame out of k.
+
+        tracker = DetectionTracker()
+        tracked = tracker.update(batch, im0.shape)  # Frame run through the detector
+        tracked = tracker.predict(frameId, timestamp)  # Frame skipped by the detector
+    """
+
+    def __init__(self, iouThreshold: float = DEFAULT_IOU_THRESHOLD, maxAge: int = DEFAULT_MAX_AGE, minHits: int = DEFAULT_MIN_HITS,
+                 distanceGate: float = DEFAULT_DISTANCE_GATE):
+        """
+        :param iouThreshold: minimal IOU between a detection and the predicted box of a track to associate them
+        :param maxAge: frames a track is kept without being detected
+        :param minHits: detections needed before a track is reported
+        :param distanceGate: see DEFAULT_DISTANCE_GATE, 0 to only associate on the IOU
+        """
+        self.iouThreshold = iouThreshold
+        self.distanceGate = distanceGate
+        self.maxAge = maxAge
+        self.minHits = minHits
+        self._tracks: list[_KalmanBoxTrack] = []
+        self._trackIds = itertools.count()
+        self._names = []
+        self._shape = None  # (height, width) of the frames
+        self.tracksCreated = 0
+
+    def update(self, batch: DetectionBatch, shape0) -> DetectionBatch:
+        """
+        Associate the detections of a frame with the tracks, and start tracks for the new objects
+        :param batch: detections of the frame
+        :param shape0: shape of the frame, (height, width, ...)
+        :return: the detections with their track ids, NO_TRACK for the objects not tracked for minHits frames yet
+        """
+        self._names, self._shape = batch.names, shape0[:2]
+        predicted = np.array([track.predict() for track in self._tracks]).reshape(-1, 4)
+        boxes = batch.xyxy.astype(np.float64)
+
+        trackIds = np.full(len(batch), NO_TRACK, dtype=np.int64)
+        unmatched = set(range(len(batch)))
+        if len(predicted) and len(boxes):
+            sameClass = batch.cls[:, None] == np.array([track.cls for track in self._tracks])[None]  # Only associated within a class
+            iou = np.where(sameClass, _iou(boxes, predicted), 0.0)
+            matches = self._assign(-iou, -self.iouThreshold, range(len(boxes)), range(len(predicted)))
+            if self.distanceGate > 0:  # Second round on the distance, for the detections and tracks left
+                distance = np.where(sameClass, _centerDistance(boxes, predicted), np.inf)
+                matchedTracks = {trackIndex for _, trackIndex in matches}
+                matches += self._assign(distance, self.distanceGate, [d for d in range(len(boxes)) if d not in {d for d, _ in matches}],
+                                        [t for t in range(len(predicted)) if t not in matchedTracks])
+            for detection, trackIndex in matches:
+                track = self._tracks[trackIndex]
+                track.update(boxes[detection], int(batch.cls[detection]), float(batch.conf[detection]))
+                unmatched.discard(detection)
+                if track.hits >= self.minHits:
+                    trackIds[detection] = track.trackId
+        self._tracks = [track for track in self._tracks if track.age <= self.maxAge]
+        for detection in sorted(unmatched):
+            track = _KalmanBoxTrack(next(self._trackIds), boxes[detection], int(batch.cls[detection]), float(batch.conf[detection]))
+            self._tracks.append(track)
+            self.tracksCreated += 1
+            if track.hits >= self.minHits:
+                trackIds[detection] = track.trackId
+
+        tracked = DetectionBatch(batch.array.copy(), batch.names)
+        tracked.array['track_id'] = trackIds
+        return tracked
+
+    @staticmethod
+    def _assign(cost: np.ndarray, maxCost: float, detections, tracks) -> list[tuple[int, int]]:
+        """
+        :param cost: (detections, tracks) cost of every association
+        :param maxCost: maximal cost of an association
+        :param detections: indices of the detections to associate
+        :param tracks: indices of the tracks to associate
+        :return: (detection, track) of the associations of minimal total cost
+        """
+        detections, tracks = list(detections), list(tracks)
+        if not detections or not tracks:
+            return []
+        cost = cost[np.ix_(detections, tracks)]
+        rows, columns = linear_sum_assignment(np.minimum(cost, maxCost + 1.0))  # Finite costs, the associations above maxCost are then dropped
+        return [(detections[row], tracks[column]) for row, column in zip(rows, columns) if cost[row, column] <= maxCost]
+
+    def predict(self, frameId: int, timestamp: float) -> DetectionBatch:
+        """
+        Propagate the tracks to a frame not run through the detector
+        :param frameId: index of the frame
+        :param timestamp: time.monotonic() at which the frame was received
+        :return: predicted boxes of the reported tracks, with the class and confidence of their last detection
+        """
+        for track in self._tracks:
+            track.predict()
+        self._tracks = [track for track in self._tracks if track.age <= self.maxAge]
+        reported = [track for track in self._tracks if track.hits >= self.minHits]
+        if not reported or self._shape is None:
+            return DetectionBatch.empty(self._names)
+
+        xyxy = np.array([track.box() for track in reported])
+        height, width = self._shape
+        xyxy[:, [0, 2]] = xyxy[:, [0, 2]].clip(0, width)
+        xyxy[:, [1, 3]] = xyxy[:, [1, 3]].clip(0, height)
+        xywhn = np.stack([(xyxy[:, 0] + xyxy[:, 2]) / 2 / width, (xyxy[:, 1] + xyxy[:, 3]) / 2 / height,
+                          (xyxy[:, 2] - xyxy[:, 0]) / width, (xyxy[:, 3] - xyxy[:, 1]) / height], 1)
+        return DetectionBatch.fromArrays(self._names, [track.cls for track in reported], [track.conf for track in reported], xywhn, xyxy,
+                                         frameId, timestamp, [track.trackId for track in reported])
+
+    def __len__(self):
+        return len(self._tracks)
+
+
+def _toMeasurement(box: np.ndarray) -> np.ndarray:
+    """
+    :param box: xyxy
+    :return: x_center, y_center, area, aspect ratio (width / height)
+    """
+    w, h = box[2] - box[0], box[3] - box[1]
+    return np.array([box[0] + w / 2, box[1] + h / 2, w * h, w / max(h, 1e-6)])
+
+
+def _centerDistance(boxes1: np.ndarray, boxes2: np.ndarray) -> np.ndarray:
+    """
+    :param boxes1: (n, 4) xyxy
+    :param boxes2: (m, 4) xyxy
+    :return: (n, m) distance between the centers of every pair, in sizes (square root of the area) of the box of boxes2
+    """
+    centers1 = (boxes1[:, :2] + boxes1[:, 2:]) / 2
+    centers2 = (boxes2[:, :2] + boxes2[:, 2:]) / 2
+    sizes2 = np.sqrt((boxes2[:, 2:] - boxes2[:, :2]).clip(0).prod(1))
+    return np.linalg.norm(centers1[:, None] - centers2[None], axis=2) / np.maximum(sizes2[None], 1e-6)
+
+
+def _iou(boxes1: np.ndarray, boxes2: np.ndarray) -> np.ndarray:
+    """
+    :param boxes1: (n, 4) xyxy
+    :param boxes2: (m, 4) xyxy
+    :return: (n, m) IOU of every pair
+    """
+    topLeft = np.maximum(boxes1[:, None, :2], boxes2[None, :, :2])
+    bottomRight = np.minimum(boxes1[:, None, 2:], boxes2[None, :, 2:])
+    inter = (bottomRight - topLeft).clip(0).prod(2)
+    area1 = (boxes1[:, 2:] - boxes1[:, :2]).prod(1)
+    area2 = (boxes2[:, 2:] - boxes2[:, :2]).prod(1)
+    return inter / np.maximum(area1[:, None] + area2[None] - inter, 1e-9)
@@ -0,0 +1,275 @@
+import itertools
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from AI.GradeRules import GradeRules
+from AI.RolloutRecorder import RolloutRecorder
+from Core.Coordinate import Coordinate
+from Core.PublicDroneControl import PublicDroneControl
+from Core.SimulationParams import SimulationParams
+from Core.utils import loadSimParams
+
+# Control axes of an action, in the order of its columns. Amounts are clipped to [-1, 1] (multiplier of the default speed)
+ACTION_AXES = ('upAmount', 'pitchForwardAmount', 'rollRightAmount', 'yawRightAmount', 'cameraDownAmount')
+
+# Screen points hit tested every step (normalized X, normalized Y): a 5 x 4 grid over the image.
+# The "detections" observation tells, for every point, if a person not yet found is seen there
+DETECTION_GRID = tuple(((i % 5 + 0.5) / 5, (i // 5 + 0.5) / 4) for i in range(20))
+
+DEFAULT_STEP_DURATION = 0.1  # Seconds the controls of an action are applied for, the time a primitive control is held by the UE engine
+
+
+class _Episode:
+    """
+    State of the episode of one drone of a DroneVecEnv
+    """
+
+    def __init__(self, publicDroneControl: PublicDroneControl):
+        self.publicDroneControl = publicDroneControl
+        self.episodeId = 0  # Unique across the drones of the DroneVecEnv
+        self.startTime = time.monotonic()
+        self.lastStepTime = self.startTime
+        self.collisionBaseline = 0  # Collision count of the drone when the episode started (the UE engine never resets it)
+        self.collisions = 0  # Collisions since the start of the episode
+        self.points = 0.0
+        self.steps = 0
+        self.targetsFound = 0
+
+
+class DroneVecEnv:
+    """
+    Vectorized RL environment over several drones, in the style of the gym VecEnv API: reset() and step(actions) act on all the drones at once
+    and return batched numpy observations, rewards and dones. The drones are driven from one process over one pair of sockets
+    (see PublicDroneControl.createFleet): with the SimulatorServer every drone has its own world, so each runs an independent episode.
+    The drones are stepped concurrently by a thread pool, so a step takes about the step duration plus one round trip, whatever the number of drones.
+
+    Rewards follow the grading rules of gradeConfig.json (see GradeRules): time costs points, a collision costs points and ends the episode,
+    and every person seen at a point of DETECTION_GRID is verified and destroyed by the UE engine, and adds points. An episode also ends after the
+    simulation time, or once all the people are found. Episodes which ended are reset automatically, as in gym VecEnv: the observation returned for
+    them is the first of the new episode, and the last one of the ended episode is in the info "terminalObservation".
+
+    Observations are a dict of:
+    - "droneState": (n, 4) float32, x, y, z (UE units) and collisions since the start of the episode, per drone
+    - "detections": (n, len(DETECTION_GRID)) float32, 1 where a person not yet found is seen at the point of the grid, 0 elsewhere
+    - "frames": list of the newest camera frame of every drone (or None), only if frame subscriptions were given
+
+    Given a RolloutRecorder (with the columns of rolloutColumns), every step is recorded as one row per drone, for offline training.
+    """
+
+    def __init__(self, publicDroneControls: list[PublicDroneControl], simParams: SimulationParams = None,
+                 stepDuration: float = DEFAULT_STEP_DURATION, startLocation: Coordinate = None, frameSubscriptions: list = None,
+                 recorder: RolloutRecorder = None):
+        """
+        :param publicDroneControls: one PublicDroneControl per drone, e.g. from PublicDroneControl.createFleet (see create)
+        :param simParams: number of people and grading parameters, loaded from gradeConfig.json if None
+        :param stepDuration: number of seconds the controls of an action are applied for before the observation is taken
+        :param startLocation: location the drone is moved to when its episode is reset, None to start where the last episode ended
+        :param frameSubscriptions: FrameSubscription of the camera of every drone, to add the frames to the observations. None for no frames
+        :param recorder: recorder of the steps, created with the columns of rolloutColumns. None to not record
+        """
+        if frameSubscriptions is not None and len(frameSubscriptions) != len(publicDroneControls):
+            raise Exception(f"One frame subscription per drone is needed, got {len(frameSubscriptions)} for {len(publicDroneControls)} drones")
+        self.simParams = simParams if simParams is not None else loadSimParams()
+        self.rules = GradeRules(self.simParams)
+        self.stepDuration = stepDuration
+        self.startLocation = startLocation
+        self._frameSubscriptions = frameSubscriptions
+        self._lastFrames = [None] * len(publicDroneControls)
+        self._recorder = recorder
+        self._lastObservations = None  # Batched observations returned by the last reset or step, recorded with the next step
+        self._episodeIds = itertools.count()
+
+        self._episodes = [_Episode(publicDroneControl) for publicDroneControl in publicDroneControls]
+        self._executor = ThreadPoolExecutor(max_workers=len(publicDroneControls), thread_name_prefix="DroneVecEnv")
+
+    @classmethod
+    def create(cls, ip, port, numEnvs: int, binary: bool = True, **kwargs) -> 'DroneVecEnv':
+        """
+        :param ip: IP address of the UE engine
+        :param port: port number of the UE engine receiver socket
+        :param numEnvs: number of drones
+        :param binary: True to use the binary encoding if the UE engine supports it
+        :param kwargs: other arguments of the constructor
+        :return: DroneVecEnv driving drones 0 to numEnvs - 1 over one pair of sockets
+        """
+        publicDroneControls = PublicDroneControl.createFleet(ip, port, numEnvs)
+        if binary:
+            publicDroneControls[0].negotiateBinaryProtocol()  # Shared by the fleet
+        return cls(publicDroneControls, **kwargs)
+
+    @staticmethod
+    def rolloutColumns(frameShape: tuple = None) -> dict:
+        """
+        :param frameShape: shape of the camera frames to record, e.g. (1080, 1920, 3). None to not record frames
+        :return: columns of a RolloutRecorder recording the steps: per drone and step, the time, drone index, episode id and step in the episode,
+                 the observation before the step, the action, the reward, done, and the observation after the step
+                 (the last one of the episode if it ended). The frame is the one of the observation before the step
+        """
+        columns = {"time": ("float64", ()), "env": ("int32", ()), "episode": ("int64", ()), "step": ("int32", ()),
+                   "droneState": ("float32", (4,)), "detections": ("float32", (len(DETECTION_GRID),)), "action": ("float32", (len(ACTION_AXES),)),
+                   "reward": ("float32", ()), "done": ("bool", ()),
+                   "nextDroneState": ("float32", (4,)), "nextDetections": ("float32", (len(DETECTION_GRID),))}
+        if frameShape is not None:
+            columns["frame"] = ("uint8", tuple(frameShape))
+        return columns
+
+    @property
+    def numEnvs(self) -> int:
+        return len(self._episodes)
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=True)
+
+    #  VecEnv API ----------------------------------------------------------------
+
+    def reset(self) -> dict:
+        """
+        Start a new episode on every drone: new people are spawned, and the drone is moved to the start location
+        :return: batched observations of the first step of the episodes
+        """
+        observations = list(self._executor.map(self._resetEpisode, self._episodes))
+        self._lastObservations = self._batch(observations)
+        return self._lastObservations
+
+    def step(self, actions) -> tuple[dict, np.ndarray, np.ndarray, list[dict]]:
+        """
+        Apply one action per drone for stepDuration seconds, concurrently
+        :param actions: (n, len(ACTION_AXES)) amounts of the control axes of every drone, see ACTION_AXES
+        :return: batched observations, (n,) float32 rewards, (n,) bool dones, and one info dict per drone
+                 ("points", "targetsFound", "steps", and "terminalObservation" for the episodes which ended)
+        """
+        actions = np.clip(np.asarray(actions, dtype=np.float64), -1, 1)
+        if actions.shape != (self.numEnvs, len(ACTION_AXES)):
+            raise Exception(f"Actions must have shape {(self.numEnvs, len(ACTION_AXES))}, got {actions.shape}")
+        if self._recorder is not None and self._lastObservations is None:
+            raise Exception("reset must be called before the first step is recorded")
+        episodeIds = [episode.episodeId for episode in self._episodes]  # Before the episodes which end are reset
+        steps = [episode.steps for episode in self._episodes]
+        startTime = time.monotonic()
+        results = list(self._executor.map(self._stepEpisode, self._episodes, actions.tolist()))
+
+        observations, rewards, dones, infos = zip(*results)
+        observations, rewards, dones, infos = self._batch(observations), np.array(rewards, dtype=np.float32), np.array(dones, dtype=bool), list(infos)
+        if self._recorder is not None:
+            self._record(startTime, episodeIds, steps, actions, rewards, dones, infos, observations)
+        self._lastObservations = observations
+        return observations, rewards, dones, infos
+
+    #  End VecEnv API ------------------------------------------------------------
+
+    def _resetEpisode(self, episode: _Episode) -> tuple:
+        """
+        Called from the thread pool
+        :param episode: episode to reset
+        :return: first observation of the new episode
+        """
+        publicDroneControl = episode.publicDroneControl
+        publicDroneControl.spawnXActors(self.simParams.numOfPeople)
+        if self.startLocation is not None:
+            location = self.startLocation
+            publicDroneControl.moveDroneToLocation(location.x, location.y, location.z, speed=50, turnWithMove=False)
+        episode.episodeId = next(self._episodeIds)
+        episode.collisionBaseline = publicDroneControl.getDroneState().collisionCount
+        episode.startTime = episode.lastStepTime = time.monotonic()
+        episode.collisions = 0
+        episode.points = self.rules.initialPoints
+        episode.steps = 0
+        episode.targetsFound = 0
+        observation, _ = self._observe(episode)
+        return observation
+
+    def _stepEpisode(self, episode: _Episode, action: list[float]) -> tuple:
+        """
+        Called from the thread pool: send the controls, wait for the step duration, then observe and grade the drone
+        :param episode: episode of the drone
+        :param action: amounts of the control axes
+        :return: observation, reward, done and info of the step
+        """
+        publicDroneControl = episode.publicDroneControl
+        with publicDroneControl.batch() as batch:
+            batch.moveDroneUp(action[0])
+            batch.moveDroneForward(action[1])
+            batch.moveDroneRight(action[2])
+            batch.rotateDroneRight(action[3])
+            batch.rotateCameraDown(action[4])
+        time.sleep(self.stepDuration)
+
+        observation, hitActors = self._observe(episode)
+        found = len(publicDroneControl.destroyActors(hitActors)) if hitActors else 0  # Verified by the UE engine, like GradeAI does
+
+        now = time.monotonic()
+        collisions = int(observation[0][3])
+        reward = (self.rules.recognitionReward(found) - self.rules.timeCost(now - episode.lastStepTime) -
+                  self.rules.collisionPenalty(collisions - episode.collisions))
+        episode.lastStepTime = now
+        episode.collisions = collisions
+        episode.points += reward
+        episode.steps += 1
+        episode.targetsFound += found
+
+        allFound = len(publicDroneControl.actorIndex) == 0
+        done = self.rules.endsRun(now - episode.startTime, collisions) or allFound
+        info = {"points": episode.points, "targetsFound": episode.targetsFound, "steps": episode.steps}
+        if done:
+            info["terminalObservation"] = observation
+            observation = self._resetEpisode(episode)
+        return observation, reward, done, info
+
+    def _observe(self, episode: _Episode) -> tuple[tuple, list[int]]:
+        """
+        Query the state of the drone and hit test the detection grid, in one round trip
+        :param episode: episode of the drone
+        :return: observation of the drone (drone state row, detections row), and indices of the actors seen at the points of the grid
+        """
+        publicDroneControl = episode.publicDroneControl
+        with publicDroneControl.batch() as batch:
+            state = batch.getDroneState()
+            targets = batch.getTargetsOfPoints(DETECTION_GRID)
+        state = state.result()
+        location = state.location
+
+        hitActors = []
+        detections = np.zeros(len(DETECTION_GRID), dtype=np.float32)
+        for i, target in enumerate(targets.result()):
+            index = publicDroneControl.actorIndex.indexOfTarget(target)  # None for the ground, and for people already found
+            if index is not None:
+                detections[i] = 1
+                if index not in hitActors:
+                    hitActors.append(index)
+        droneState = np.array([location.x, location.y, location.z, state.collisionCount - episode.collisionBaseline], dtype=np.float32)
+        return (droneState, detections), hitActors
+
+    def _record(self, startTime: float, episodeIds: list[int], steps: list[int], actions: np.ndarray, rewards: np.ndarray, dones: np.ndarray,
+                infos: list[dict], observations: dict) -> None:
+        """
+        Record a step, one row per drone
+        """
+        previous = self._lastObservations
+        nextObservations = [info.get("terminalObservation", (droneState, detections))  # Not the first observation of the next episode
+                            for info, droneState, detections in zip(infos, observations["droneState"], observations["detections"])]
+        rows = {"time": np.full(self.numEnvs, startTime), "env": np.arange(self.numEnvs), "episode": episodeIds, "step": steps,
+                "droneState": previous["droneState"], "detections": previous["detections"], "action": actions, "reward": rewards, "done": dones,
+                "nextDroneState": np.stack([droneState for droneState, _ in nextObservations]),
+                "nextDetections": np.stack([detections for _, detections in nextObservations])}
+        if "frame" in self._recorder.columns:
+            frameShape = tuple(self._recorder.columns["frame"]["shape"])
+            frames = previous.get("frames") or [None] * self.numEnvs
+            rows["frame"] = np.stack([frame if frame is not None else np.zeros(frameShape, dtype=np.uint8) for frame in frames])
+        self._recorder.appendBatch(**rows)
+
+    def _batch(self, observations) -> dict:
+        """
+        :param observations: observation of every drone
+        :return: observations stacked into the batched observation dict
+        """
+        batched = {"droneState": np.stack([droneState for droneState, _ in observations]),
+                   "detections": np.stack([detections for _, detections in observations])}
+        if self._frameSubscriptions is not None:
+            for i, subscription in enumerate(self._frameSubscriptions):
+                frame = subscription.get(timeout=0)  # Newest frame, without waiting
+                if frame is not None:
+                    self._lastFrames[i] = frame.image
+            batched["frames"] = list(self._lastFrames)
+        return batched
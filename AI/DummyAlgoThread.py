@@ -2,17 +2,16 @@ import json
 import threading
 import time
 from pathlib import Path
-from typing import List
 
-from Core.Coordinate import Coordinate
+from Core.CoordinateArray import CoordinateArray
 from Core.Logger import LoggerThread as Logger
 from Core.PublicDroneControl import PublicDroneControl
 
 
-def read_json_to_list_of_lists() -> List[Coordinate]:
+def read_json_to_list_of_lists() -> CoordinateArray:
     """
-    Reads the graphPointsConfig.json file and returns a list of Coordinate objects.
-    :return: List[Coordinate] - list of Coordinate objects representing the points to visit
+    Reads the graphPointsConfig.json file and returns the points to visit.
+    :return: CoordinateArray - locations of the points to visit, in order (iterating gives Coordinate objects)
     """
     current_script_path = Path(__file__).resolve()  # Get the path of the current script
     root_path = current_script_path.parent.parent  # Navigate to the root directory. Adjust the number of .parent based on your directory structure
@@ -20,13 +19,8 @@ def read_json_to_list_of_lists() -> List[Coordinate]:
     with open(path, 'r') as file:
         data = json.load(file)
 
-    list_of_lists = []  # Initialize an empty list to store the lists of floats
-
-    # Iterate through the sorted keys to maintain order
-    for key in sorted(data.keys(), key=int):  # Sorting keys as integers to ensure correct order
-        list_of_lists.append(Coordinate(data[key][0], data[key][1], data[key][2]))
-
-    return list_of_lists
+    # Sorting keys as integers to ensure correct order
+    return CoordinateArray([data[key][:3] for key in sorted(data.keys(), key=int)])
 
 
 class DummyAlgoThread(threading.Thread):
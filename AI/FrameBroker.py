@@ -0,0 +1,200 @@
+import collections
+import threading
+import time
+from typing import NamedTuple
+
+import cv2
+import numpy as np
+
+from Core.SharedFrameRing import SharedFrameRing
+
+# Drop policies of a FrameSubscription, applied when a frame arrives while the queue of the subscription is full
+LATEST_ONLY = 'latest-only'  # Keep only the newest frame (queue of 1)
+DROP_OLDEST = 'drop-oldest'  # Drop the oldest queued frame
+DROP_NEWEST = 'drop-newest'  # Drop the arriving frame
+DROP_POLICIES = (LATEST_ONLY, DROP_OLDEST, DROP_NEWEST)
+
+
+class BrokerFrame(NamedTuple):
+    image: np.ndarray  # Read-only, shared by all the subscriptions (freed once the last consumer released it)
+    index: int  # Index of the frame in the capture, starting at 0
+    timestamp: float  # time.monotonic() at which the frame was captured
+
+
+class FrameSubscription:
+    """
+    Queue of the frames delivered by a FrameBroker to one consumer. Only every stride-th frame of the capture is delivered, and frames arriving
+    while the queue is full are dropped according to the drop policy, so a slow consumer never slows down the capture or the other consumers.
+    """
+
+    def __init__(self, stride: int = 1, policy: str = LATEST_ONLY, maxFrames: int = 1):
+        """
+        :param stride: deliver one frame out of stride
+        :param policy: drop policy, one of DROP_POLICIES
+        :param maxFrames: size of the queue (always 1 with LATEST_ONLY)
+        """
+        if policy not in DROP_POLICIES:
+            raise Exception(f"Unknown drop policy: {policy}, expected one of {DROP_POLICIES}")
+        if stride < 1 or maxFrames < 1:
+            raise Exception(f"Stride and queue size must be at least 1, got {stride} and {maxFrames}")
+        self.stride = stride
+        self.policy = policy
+        self.maxFrames = 1 if policy == LATEST_ONLY else maxFrames
+        self._frames = collections.deque()
+        self._condition = threading.Condition()
+        self._closed = False
+        self.delivered = 0
+        self.dropped = 0
+
+    def _offer(self, frame: BrokerFrame) -> None:
+        # Called by the broker thread for every captured frame
+        if frame.index % self.stride != 0:
+            return
+        with self._condition:
+            if len(self._frames) >= self.maxFrames:
+                self.dropped += 1
+                if self.policy == DROP_NEWEST:
+                    return
+                self._frames.popleft()
+            self._frames.append(frame)
+            self._condition.notify()
+
+    def get(self, timeout: float = None) -> BrokerFrame or None:
+        """
+        Wait for the next frame of the subscription
+        :param timeout: maximal number of seconds to wait, None waits forever
+        :return: the oldest queued frame, or None if the subscription was closed or the timeout expired
+        """
+        with self._condition:
+            if not self._condition.wait_for(lambda: self._frames or self._closed, timeout=timeout) or not self._frames:
+                return None
+            self.delivered += 1
+            return self._frames.popleft()
+
+    def close(self) -> None:
+        """
+        Stop delivering frames, and wake up the consumer waiting in get
+        :return: None
+        """
+        with self._condition:
+            self._closed = True
+            self._frames.clear()
+            self._condition.notify_all()
+
+    def closed(self) -> bool:
+        return self._closed
+
+    def __iter__(self):
+        while True:
+            frame = self.get()
+            if frame is None:
+                return
+            yield frame
+
+
+class FrameBroker(threading.Thread):
+    """
+    Thread owning the single capture of the simulation image, fanning out every frame to the subscribed detectors (YoloDetection,
+    ArucoDetection), so the device is opened once and each frame is decoded once. Frames are read-only numpy arrays shared by all the
+    subscriptions, without copies.
+    Detectors running in other processes read the frames from a SharedFrameRing, written by the broker if sharedMemoryName is given.
+    """
+
+    def __init__(self, source=0, width: int = 1920, height: int = 1080, sharedMemoryName: str = None, slots: int = 4):
+        """
+        :param source: cv2.VideoCapture source (webcam index, video file or stream URL)
+        :param width: requested width of the capture
+        :param height: requested height of the capture
+        :param sharedMemoryName: name of a SharedFrameRing to publish the frames to for other processes (shm://name), None to not publish
+        :param slots: number of frames of the SharedFrameRing
+        """
+        threading.Thread.__init__(self)
+        self.daemon = True
+        self._stop_event = threading.Event()
+        self._lock = threading.Lock()  # To ensure thread-safe operations on the subscriptions
+
+        self.source = source
+        self.width = width
+        self.height = height
+        self.sharedMemoryName = sharedMemoryName
+        self.slots = slots
+        self._subscriptions: list[FrameSubscription] = []
+        self.framesCaptured = 0
+        self.captureFailures = 0
+
+    def subscribe(self, stride: int = 1, policy: str = LATEST_ONLY, maxFrames: int = 1) -> FrameSubscription:
+        """
+        :param stride: deliver one frame out of stride
+        :param policy: drop policy, one of DROP_POLICIES
+        :param maxFrames: size of the queue of the subscription
+        :return: new subscription, receiving the frames captured from now on
+        """
+        subscription = FrameSubscription(stride, policy, maxFrames)
+        with self._lock:
+            self._subscriptions = self._subscriptions + [subscription]  # Replaced, not modified, so run iterates without the lock
+        return subscription
+
+    def unsubscribe(self, subscription: FrameSubscription) -> None:
+        with self._lock:
+            self._subscriptions = [s for s in self._subscriptions if s is not subscription]
+        subscription.close()
+
+    def stop(self):
+        """
+        Method to be called when the thread should be stopped (stop itself)
+        :return:
+        """
+        self._stop_event.set()
+
+    def stopped(self):
+        """
+        Check if the thread has been stopped
+        :return:
+        """
+        return self._stop_event.is_set()
+
+    def is_running(self):
+        """
+        More explicit method to check if the thread is currently running.
+        """
+        return self.is_alive() and not self.stopped()
+
+    def run(self):
+        """
+        Method to be executed by the thread: capture frames and deliver them to the subscriptions until stopped
+        :return:
+        """
+        cap = None
+        ring = None
+        try:  # The subscriptions are closed even if the capture cannot be opened, so consumers waiting for frames are released
+            cap = cv2.VideoCapture(self.source)
+            cap.set(cv2.CAP_PROP_FRAME_WIDTH, self.width)
+            cap.set(cv2.CAP_PROP_FRAME_HEIGHT, self.height)
+            if not cap.isOpened():  # Check if the capture is opened correctly
+                raise IOError(f"Cannot open capture {self.source}")
+
+            while not self.stopped():
+                ret, image = cap.read()  # A new array for every frame, so delivered frames are never overwritten
+                if not ret:
+                    self.captureFailures += 1
+                    time.sleep(0.01)
+                    continue
+                image.flags.writeable = False
+                frame = BrokerFrame(image, self.framesCaptured, time.monotonic())
+                self.framesCaptured += 1
+
+                if self.sharedMemoryName is not None:
+                    if ring is None:
+                        ring = SharedFrameRing(self.sharedMemoryName, create=True, height=image.shape[0], width=image.shape[1],
+                                               channels=image.shape[2] if image.ndim == 3 else 1, slots=self.slots)
+                    ring.write(image, frame.timestamp)
+                for subscription in self._subscriptions:
+                    subscription._offer(frame)
+        finally:
+            if cap is not None:
+                cap.release()
+            for subscription in self._subscriptions:
+                subscription.close()
+            if ring is not None:
+                ring.close()
+                ring.unlink()
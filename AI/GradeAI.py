@@ -1,17 +1,31 @@
 import json
+import os
+import queue
 import threading
 import time
 from pathlib import Path
-from typing import List
 
-from AI.YoloDetectionObject import YoloDetectionObject
+from AI.ActorVerificationWorker import ActorVerificationWorker
+from AI.FrameBroker import LATEST_ONLY, FrameBroker
+from AI.GradeRules import GradeRules
+from AI.DetectionBatch import NO_TRACK, DetectionBatch
 from Core import Logger
 from AI.ArucoDetection import ArucoDetection
 from Core.DroneState import DroneState
 from Core.PublicDroneControl import PublicDroneControl
 from Core.SimulationParams import SimulationParams
+from YoloImpl.DetectionService import DetectionService
 from YoloImpl.MainYoloDetect import YoloDetection
 from AI.ThreadSafeResults import ThreadSafeResults
+from Core.TimerWheel import TimerWheel
+
+DRONE_STATE_WATCHDOG_PERIOD = 0.5  # Seconds between two checks of the drone state, in case it is not pushed by the UE engine
+
+# Events of the event loop of GradeAI.run
+_EVENT_DRONE_STATE = 'droneState'
+_EVENT_YOLO_RESULTS = 'yoloResults'
+_EVENT_ACTORS_VERIFIED = 'actorsVerified'
+_EVENT_STOP = 'stop'
 
 
 class GradeAI(threading.Thread):
@@ -28,12 +42,13 @@ class GradeAI(threading.Thread):
     2. Sending the current grade at some rate per second to the client.
     """
 
-    def __init__(self, logger: Logger.LoggerThread, publicDroneControl: PublicDroneControl, simParams: SimulationParams):
+    def __init__(self, logger: Logger.LoggerThread, publicDroneControl: PublicDroneControl, simParams: SimulationParams, detectionWorkers: int = 0):
         """
         Constructor of the class. Reads the gradeConfig json file for the needed grading parameters.
         :param logger: logger to log the needed information
         :param publicDroneControl: PublicDroneControl object to access the needed information in run function
         :param simParams: SimulationParams object to get the needed parameters of the simulation
+        :param detectionWorkers: number of processes running the Yolo detection (DetectionService), 0 to run it in a thread of this process
         """
 
         # Initializing the thread without running it
@@ -45,24 +60,41 @@ class GradeAI(threading.Thread):
         self._logger = logger  # Logger to file
 
         # Load parameters from JSON
-        self._currentPoints: float = simParams.initialPoints  # Initial points
-        self._simulationTime: float = simParams.simulationTime  # In seconds
-        self._pointsForTargetDetection: float = simParams.addPointsForRecognition
-        self._pointsDeductedPerCollision: float = simParams.pointsDeductedForCollision
-        self._costPointsPerSec: float = simParams.decreasePointsPerSec
+        self._rules = GradeRules(simParams)  # Grading rules, shared with the rewards of DroneVecEnv
+        self._currentPoints: float = self._rules.initialPoints  # Initial points
+
+        # Thread owning the single capture of the video, shared by the Yolo and Aruco detection threads
+        # (publishing the frames to a SharedFrameRing too when the Yolo detection runs in other processes)
+        ringName = f"grade_frames_{os.getpid()}" if detectionWorkers > 0 else None
+        self._frameBroker = FrameBroker(source=0, width=1920, height=1080, sharedMemoryName=ringName)
 
         # Object of thread, which when started will have the image analysis of Yolo of the current frame in video, which can be requested
         self._yoloResults = ThreadSafeResults()
-        self._yoloDetectionThreadObj = YoloDetection(self._yoloResults)
+        if detectionWorkers > 0:
+            self._yoloDetectionThreadObj = DetectionService(self._yoloResults, ringName, workers=detectionWorkers)
+        else:
+            self._yoloDetectionThreadObj = YoloDetection(self._yoloResults, frame_source=self._frameBroker.subscribe(stride=1, policy=LATEST_ONLY))
+
+        # Thread verifying the people detected by Yolo with the UE engine and destroying them, without blocking the grading
+        self._verificationWorker = ActorVerificationWorker(publicDroneControl, onVerified=self._onActorsVerified, logger=logger)
 
         # Object of thread, which when started will analyze aruco codes of the current frame in video, which can be requested
         self._arucoResults = ThreadSafeResults()
-        self._arucoDetectionThreadObj = ArucoDetection(self._arucoResults)
+        self._arucoDetectionThreadObj = ArucoDetection(self._arucoResults, frameSource=self._frameBroker.subscribe(stride=3, policy=LATEST_ONLY))
 
         # Util variables
         self.simulation_start_time = time.time()
         self.last_point_time = time.time()
         self.totalTargetsDetected = 0
+        self._yoloVersion = 0  # Version of the last Yolo results handled
+        self.yoloFramesSkipped = 0  # Frames analyzed by Yolo whose results were replaced by newer ones before being handled
+        self.peopleTracked = set()  # Track ids of the people detected, when the detection tracks them (--track or --keyframe-interval)
+        self.lastScoringLatency = None  # Seconds from the capture of the last handled frame to the end of its grading
+
+        # Event loop of run: events pushed by the telemetry and detection threads, and timers of the time-based grading
+        self._events = queue.SimpleQueue()
+        self._timerWheel = TimerWheel(tickDuration=0.01)
+        self._notifiedCollisionCount = 0  # Collision count of the last drone state queued, only used by the telemetry thread
 
     def stop(self):
         """
@@ -71,7 +103,10 @@ class GradeAI(threading.Thread):
         """""
         self._yoloDetectionThreadObj.stop()
         self._arucoDetectionThreadObj.stop()
+        self._verificationWorker.stop()
+        self._frameBroker.stop()
         self._stop_event.set()
+        self._events.put((_EVENT_STOP, None))  # Wake up the event loop
 
     def stopped(self):
         """
@@ -82,93 +117,155 @@ class GradeAI(threading.Thread):
 
     def run(self):
         """
-        Method to be executed by the thread.
+        Method to be executed by the thread: event loop reacting to the drone states pushed by the UE engine and to the Yolo results as soon as
+        they are published, and calling the timers of the time-based grading (points deducted each second, end of the simulation) when due.
+        The drone state is only requested from the UE engine if it is not pushed (see _handleDroneStateWatchdog).
         :param self:
         :return:
         """
         try:
             self.simulation_start_time = time.time()
             self.last_point_time = self.simulation_start_time
-            current_time = time.time()
+            self._publicDroneControl.addDroneStateListener(self._onDroneState)
+            self._yoloResults.add_listener(self._onYoloResults)
+            self._startFrameBroker()
+            self._yoloDetectionThreadObj.start()
+            self._verificationWorker.start()
+            # self._arucoDetectionThreadObj.start()
 
-            while not self._stop_event.is_set() and (current_time - self.simulation_start_time) < self._simulationTime:  # Run for the duration of the simulation or until stopped
-                current_time = time.time()
-                self._handleDecreaseGradeEachSec(current_time)
-                self._handleCollision()
-                self._handleImageFromUE()
-                self._logger.info(f"Points: {self._currentPoints}")
+            self._timerWheel.schedule(1, self._handleDecreaseGradeEachSec, period=1)
+            self._timerWheel.schedule(self._rules.simulationTime, self._handleEndSimulationTime)
+            self._timerWheel.schedule(0, self._handleDroneStateWatchdog, period=DRONE_STATE_WATCHDOG_PERIOD)
 
-                time.sleep(1)  # Sleep for a very short time to keep responsiveness high
+            while not self.stopped():
+                try:
+                    event, value = self._events.get(timeout=self._timerWheel.timeUntilNextTimer())
+                except queue.Empty:
+                    event, value = None, None  # A timer is due
+                if event == _EVENT_DRONE_STATE:
+                    self._handleCollision(value)
+                elif event == _EVENT_YOLO_RESULTS:
+                    self._handleYoloDetection()
+                elif event == _EVENT_ACTORS_VERIFIED:
+                    self._handleActorsVerified(*value)
+                if not self.stopped():
+                    self._timerWheel.advance()
         except Exception as e:
             self._logger.exception(f"Error in GradeAI: {e}")
         finally:
+            self._publicDroneControl.removeDroneStateListener(self._onDroneState)
+            self._yoloResults.remove_listener(self._onYoloResults)
             self._logger.info(f"Grade thread ended. Final points: {self._currentPoints}")
             self._logger.info(f"Total targets detected: {self.totalTargetsDetected}")
+            self._logger.info(f"Unique people tracked: {len(self.peopleTracked)}")
+            self._logger.info(f"Yolo frames handled: {self._yoloVersion - self.yoloFramesSkipped}, skipped: {self.yoloFramesSkipped}")
+            self._logger.info(f"Last scoring latency: {self.lastScoringLatency}")
+            self._logger.info(self._verificationWorker.summary())
+            self._logger.info(self._publicDroneControl.linkStats.summary())
             self.stop()  # Stop the thread after the duration
 
-    def _handleEndSimulationTime(self, startTime: float, currTime: float):
+    #  Event Sources --------------------------------------------------------------
+
+    def _onDroneState(self, state: DroneState):
+        # Called by the telemetry thread of PublicDroneControl for every pushed state. Only collisions are graded, so other states are not queued
+        if state.collisionCount != self._notifiedCollisionCount:
+            self._notifiedCollisionCount = state.collisionCount
+            self._events.put((_EVENT_DRONE_STATE, state))
+
+    def _onYoloResults(self, snapshot):
+        # Called by the Yolo detection thread for every published DetectionBatch. The event only wakes up the loop, which handles the newest results
+        self._events.put((_EVENT_YOLO_RESULTS, snapshot.version))
+
+    def _onActorsVerified(self, actorIndices: list[int], frameTimestamp: float or None):
+        # Called by the verification worker thread, points are added by the event loop
+        self._events.put((_EVENT_ACTORS_VERIFIED, (actorIndices, frameTimestamp)))
+
+    #  End Event Sources ----------------------------------------------------------
+
+    def _handleEndSimulationTime(self):
         """
-        Function to handle the end of the simulation time
-        :param startTime: start time of the thread
-        :param currTime: current time of the thread
+        Timer called at the end of the simulation time
         :return: None
         """
-        if abs(currTime - startTime) > self._simulationTime:  # End of simulation time
-            self._logger.info(f"Simulation has ended due to timeout. Final number of points: {self._currentPoints}")  # Logging
-            self.stop()  # Stop thread
+        self._logger.info(f"Simulation has ended due to timeout. Final number of points: {self._currentPoints}")  # Logging
+        self.stop()  # Stop thread
 
-    def _handleDecreaseGradeEachSec(self, current_time: float):
+    def _handleDecreaseGradeEachSec(self):
         """
-        Function decrease 1 point each second,
+        Timer called each second, decreasing 1 point each second,
         To teach the drone that it depend on time.
         """
-        if current_time - self.last_point_time >= 1:  # Check if a full second has passed since the last point deduction
-            with self._lock:
-                self._currentPoints -= self._costPointsPerSec  # Deduct points
-                self.last_point_time = current_time
+        with self._lock:
+            self._currentPoints -= self._rules.timeCost(1)  # Deduct points
+            self.last_point_time = time.time()
+        self._logger.info(f"Points: {self._currentPoints}")
 
-    def _handleCollision(self):
+    def _handleDroneStateWatchdog(self):
+        """
+        Timer checking the drone state when it is not pushed, e.g. if the UE engine does not support subscribeDroneState or the stream stopped.
+        While the stream is alive the state is read from the cache of the pushed states, without network traffic
+        :return: None
+        """
+        try:
+            state: DroneState = self._publicDroneControl.getLatestDroneState(maxAge=DRONE_STATE_WATCHDOG_PERIOD)  # Polled only if the stream stopped
+        except TimeoutError as e:  # Lost datagrams are retried by PublicDroneControl, check again at the next period if all attempts were lost
+            self._logger.warning(f"Drone state not received: {e}")
+            return
+        self._handleCollision(state)
+
+    def _handleCollision(self, state: DroneState):
         """
         Function to handle the collision of the drone with physical objects
+        :param state: newest state of the drone
         :return: None
         """
-        state: DroneState = self._publicDroneControl.getDroneState()
-        if state is not None and state.collisionCount != 0:
-            self._currentPoints -= self._pointsDeductedPerCollision
-            self._logger.info(f"Collision detected. Points deducted: {self._pointsDeductedPerCollision}")
+        if state is not None and state.collisionCount != 0 and not self.stopped():
+            penalty = self._rules.collisionPenalty(state.collisionCount)
+            self._currentPoints -= penalty
+            self._logger.info(f"Collision detected. Points deducted: {penalty}")
             self.stop()  # Stop the thread if a collision is detected and end simulation # Logging
 
-    def _handleImageFromUE(self):
+    def _startFrameBroker(self):
         """
-        Function to handle the image from the UE. It will handle the Yolo detection and Aruco detection
-        :return:
+        Start capturing the video, if not already started by another detection thread
+        :return: None
         """
-        self._logger.info("Handling image from UE")
-        self._handleYoloDetection()
-        self._logger.info("Handling image from UE after yolo")
-        # self._handleArucoDetection()
+        if not self._frameBroker.is_alive() and not self._frameBroker.stopped():
+            self._frameBroker.start()
 
     def _handleYoloDetection(self):
         """
-        Function to handle the Yolo detection. It will get the latest results from the Yolo detection thread and handle them by adding points if a target is detected,
-        and destroying the actor (person) if detected
+        Function to handle the Yolo detection. It will get the latest results from the Yolo detection thread and submit the detected people
+        to the verification worker, which destroys the actors verified by the UE engine. Points are added once they are verified
         :return:
         """
-        if not self._yoloDetectionThreadObj.is_running():  # If the yolo thread is not yet running, run it
-            self._yoloDetectionThreadObj.start()
-
-        if self._yoloResults.getIsChanged():  # If the results have been updated
-            yoloLatestResults: List[YoloDetectionObject] = self._yoloResults.get_latest_results()  # get results of yolo detection (request results)
+        snapshot = self._yoloResults.wait_for_new(self._yoloVersion, timeout=0)  # Results newer than the last handled, without waiting
+        if snapshot is None:  # Already handled along with an earlier event
+            return
+        self._yoloVersion = snapshot.version
+        self.yoloFramesSkipped += snapshot.skipped
+        yoloLatestResults: DetectionBatch = snapshot.results
 
-            peopleCount = 0
-            for detection in yoloLatestResults:
-                if detection.objectName == "person":
-                    peopleCount += 1
-                    self._publicDroneControl.verifyAndDestroyActorFromPoint(detection.xCenter, detection.yCenter)  # Destroy the actor (person) if detected
+        people = yoloLatestResults.ofClass("person")
+        self.peopleTracked.update(people.trackIds[people.trackIds != NO_TRACK].tolist())  # Unique people, however many frames they are in
+        points = people.centers().tolist()  # Normalized floats
+        self._verificationWorker.submit(points, snapshot.frameTimestamp)  # Verified and destroyed in the background, see _handleActorsVerified
 
-            self._currentPoints += self._pointsForTargetDetection * peopleCount  # Add points for each person detected
-            self.totalTargetsDetected += peopleCount
-            self._logger.info(f"{peopleCount} target/s detected. Points added: {self._pointsForTargetDetection * peopleCount}")
+    def _handleActorsVerified(self, actorIndices: list[int], frameTimestamp: float or None):
+        """
+        Function to handle the actors (people) verified and destroyed by the verification worker, by adding points for each.
+        Each actor is only reported once, however many frames it was detected in
+        :param actorIndices: indices of the actors destroyed
+        :param frameTimestamp: time.monotonic() at which the oldest frame they were detected in was captured
+        :return: None
+        """
+        verifiedCount = len(actorIndices)
+        reward = self._rules.recognitionReward(verifiedCount)
+        self._currentPoints += reward  # Add points for each person detected
+        self.totalTargetsDetected += verifiedCount
+        self._logger.info(f"{verifiedCount} target/s detected. Points added: {reward}")
+        if frameTimestamp is not None:
+            self.lastScoringLatency = time.monotonic() - frameTimestamp
 
     def _handleArucoDetection(self):
         """
@@ -176,7 +273,8 @@ class GradeAI(threading.Thread):
         :return:
         """
         if not self._arucoDetectionThreadObj.is_running():  # If the aruco thread is not yet running, run it
-            self._arucoDetectionThreadObj.run()
+            self._startFrameBroker()
+            self._arucoDetectionThreadObj.start()
 
         arucoLatestResults = self._arucoResults.get_latest_results()  # get results of aruco codes detection (request results)
         self._logger.info("Aruco detection: " + str(arucoLatestResults))  # log results
@@ -0,0 +1,51 @@
+from Core.SimulationParams import SimulationParams
+
+
+class GradeRules:
+    """
+    Grading rules of the gradeConfig.json file, shared by GradeAI (grading a run of the drone) and DroneVecEnv (rewards of RL episodes),
+    so both always grade the same way:
+    - points are deducted for every second of flight,
+    - points are deducted for a collision, which ends the run,
+    - points are added for every target (person) recognized and verified by the UE engine,
+    - the run ends after the simulation time.
+    """
+
+    def __init__(self, simParams: SimulationParams):
+        """
+        :param simParams: SimulationParams object holding the grading parameters
+        """
+        self.initialPoints: float = simParams.initialPoints
+        self.simulationTime: float = simParams.simulationTime  # In seconds
+        self.pointsForTargetDetection: float = simParams.addPointsForRecognition
+        self.pointsDeductedPerCollision: float = simParams.pointsDeductedForCollision
+        self.costPointsPerSec: float = simParams.decreasePointsPerSec
+
+    def timeCost(self, seconds: float) -> float:
+        """
+        :param seconds: duration of flight
+        :return: points deducted for it
+        """
+        return self.costPointsPerSec * seconds
+
+    def collisionPenalty(self, newCollisions: int) -> float:
+        """
+        :param newCollisions: number of collisions since the last check
+        :return: points deducted for them. Only the first collision is graded, as it ends the run
+        """
+        return self.pointsDeductedPerCollision if newCollisions > 0 else 0.0
+
+    def recognitionReward(self, targetsRecognized: int) -> float:
+        """
+        :param targetsRecognized: number of targets verified (and destroyed) since the last check
+        :return: points added for them
+        """
+        return self.pointsForTargetDetection * targetsRecognized
+
+    def endsRun(self, elapsed: float, collisions: int) -> bool:
+        """
+        :param elapsed: seconds since the start of the run
+        :param collisions: number of collisions since the start of the run
+        :return: True if the run is over
+        """
+        return collisions > 0 or elapsed >= self.simulationTime
@@ -0,0 +1,108 @@
+import json
+from pathlib import Path
+
+import numpy as np
+
+from AI.RolloutRecorder import INDEX_FILE, VERSION
+
+
+class RolloutDataset:
+    """
+    Read-only view of a recording of RolloutRecorder, for replay buffers: the chunk files are memory-mapped, so only the rows actually read are
+    loaded from disk, whatever the size of the recording. Only the rows published in the index are visible; refresh() picks up the rows
+    recorded since, so training can read a recording while it is still being written.
+
+        dataset = RolloutDataset("rollouts/run1")
+        batch = dataset.sample(256)  # Column -> (256, *row shape) array
+    """
+
+    def __init__(self, directory):
+        """
+        :param directory: directory of the recording
+        """
+        self.directory = Path(directory)
+        self.columns: dict = {}
+        self.chunkSize = 0
+        self._chunks = []  # (name, rows, column -> memmap) of the chunks
+        self._rows = 0
+        self.refresh()
+
+    def refresh(self) -> int:
+        """
+        Read the index again, to see the rows recorded since the dataset was opened
+        :return: number of rows of the dataset
+        """
+        with open(self.directory / INDEX_FILE, 'r') as file:
+            index = json.load(file)
+        if index["version"] != VERSION:
+            raise Exception(f"Rollout recording {self.directory} has version {index['version']}, expected {VERSION}")
+        self.columns = index["columns"]
+        self.chunkSize = index["chunkSize"]
+
+        chunks = []
+        for i, chunk in enumerate(index["chunks"]):
+            if i < len(self._chunks) and self._chunks[i][0] == chunk["name"]:
+                memmaps = self._chunks[i][2]  # Already mapped, the file is the same, only more of its rows are valid
+            else:
+                memmaps = {name: np.load(self.directory / f"{chunk['name']}.{name}.npy", mmap_mode='r') for name in self.columns}
+            chunks.append((chunk["name"], chunk["rows"], memmaps))
+        self._chunks = chunks
+        self._rows = sum(rows for _, rows, _ in chunks)
+        return self._rows
+
+    def __len__(self):
+        return self._rows
+
+    def _locate(self, indices: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """
+        :param indices: row indices of the dataset
+        :return: chunk of every row, and index of the row in its chunk
+        """
+        indices = np.asarray(indices, dtype=np.int64)
+        if len(indices) and (indices.min() < 0 or indices.max() >= self._rows):
+            raise IndexError(f"Row index out of range for a dataset of {self._rows} rows")
+        starts = np.cumsum([0] + [rows for _, rows, _ in self._chunks])
+        chunkIndices = np.searchsorted(starts, indices, side='right') - 1
+        return chunkIndices, indices - starts[chunkIndices]
+
+    def gather(self, indices) -> dict:
+        """
+        :param indices: row indices of the dataset
+        :return: column name -> (len(indices), *row shape) array of the rows, in the order of indices
+        """
+        chunkIndices, rowIndices = self._locate(indices)
+        batch = {name: np.empty((len(rowIndices), *spec["shape"]), dtype=np.dtype(spec["dtype"])) for name, spec in self.columns.items()}
+        for chunkIndex in np.unique(chunkIndices):  # One fancy-indexed read per chunk and column
+            selected = chunkIndices == chunkIndex
+            memmaps = self._chunks[chunkIndex][2]
+            for name, values in batch.items():
+                values[selected] = memmaps[name][rowIndices[selected]]
+        return batch
+
+    def __getitem__(self, index: int) -> dict:
+        """
+        :param index: row index of the dataset
+        :return: column name -> value of the row
+        """
+        return {name: values[0] for name, values in self.gather([index]).items()}
+
+    def sample(self, batchSize: int, rng: np.random.Generator = None) -> dict:
+        """
+        :param batchSize: number of rows to sample, uniformly with replacement
+        :param rng: random generator, a new one if None
+        :return: column name -> (batchSize, *row shape) array of the sampled rows
+        """
+        if self._rows == 0:
+            raise Exception(f"Cannot sample from the empty rollout recording {self.directory}")
+        rng = rng if rng is not None else np.random.default_rng()
+        return self.gather(rng.integers(0, self._rows, batchSize))
+
+    def iterBatches(self, batchSize: int):
+        """
+        Stream the rows in the order they were recorded, without loading more than a batch at once
+        :param batchSize: number of rows per batch (the last batch of every chunk may be smaller)
+        :return: generator of column name -> (rows, *row shape) read-only memmap slices
+        """
+        for _, rows, memmaps in self._chunks:
+            for start in range(0, rows, batchSize):
+                yield {name: memmap[start:min(rows, start + batchSize)] for name, memmap in memmaps.items()}
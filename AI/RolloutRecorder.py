@@ -0,0 +1,165 @@
+import json
+import os
+import threading
+from pathlib import Path
+
+import numpy as np
+
+# Layout of a rollout directory:
+#   index.json: {"version", "chunkSize", "columns": {name: {"dtype", "shape"}}, "chunks": [{"name", "rows"}], "rows"}
+#   <chunk name>.<column>.npy: one .npy file per column and chunk, holding chunkSize rows of the column (only the first "rows" are valid)
+# Rows are only appended. A chunk is preallocated when its first row is written, and filled in place through a numpy memmap, so recording never
+# rewrites older data. index.json is replaced atomically when a chunk is full and on flush, so readers (see RolloutDataset) only see complete rows.
+INDEX_FILE = 'index.json'
+VERSION = 1
+# Size of the chunks when chunkSize is not given: as many rows as fit in DEFAULT_CHUNK_BYTES for the widest column (so chunks of frames stay
+# a manageable size), at most DEFAULT_CHUNK_ROWS (the files of a chunk are preallocated)
+DEFAULT_CHUNK_BYTES = 256 * 1024 * 1024
+DEFAULT_CHUNK_ROWS = 65536
+
+
+class RolloutRecorder:
+    """
+    Append-only recorder of trajectories (drone states, commands sent, detections, rewards, frames...) into chunked, memory-mapped, columnar files.
+    Every column has a fixed dtype and row shape, declared when the recording is created. Rows are written straight to memmaps of the chunk files,
+    so recording millions of transitions never holds them in RAM, and RolloutDataset reads them back the same way.
+    Opening an existing recording appends to it.
+
+        recorder = RolloutRecorder("rollouts/run1", {"droneState": ("float32", (4,)), "reward": ("float32", ())})
+        recorder.append(droneState=[0, 0, 300, 0], reward=-0.1)
+        recorder.close()
+    """
+
+    def __init__(self, directory, columns: dict = None, chunkSize: int = None):
+        """
+        :param directory: directory of the recording, created if needed
+        :param columns: column name -> (dtype, row shape), e.g. {"action": ("float32", (5,))}. Must match the columns of an existing recording,
+                        and may be None to append to one
+        :param chunkSize: number of rows per chunk, see DEFAULT_CHUNK_BYTES if None
+        """
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()  # To ensure thread-safe appends
+
+        indexPath = self.directory / INDEX_FILE
+        if indexPath.exists():
+            with open(indexPath, 'r') as file:
+                self._index = json.load(file)
+            if self._index["version"] != VERSION:
+                raise Exception(f"Rollout recording {self.directory} has version {self._index['version']}, expected {VERSION}")
+            if columns is not None and _normalizeColumns(columns) != self._index["columns"]:
+                raise Exception(f"Columns {columns} do not match the columns of the recording {self.directory}: {self._index['columns']}")
+        else:
+            if not columns:
+                raise Exception(f"Columns are needed to create the rollout recording {self.directory}")
+            columns = _normalizeColumns(columns)
+            if chunkSize is None:
+                rowBytes = max(np.dtype(spec["dtype"]).itemsize * int(np.prod(spec["shape"], dtype=np.int64)) for spec in columns.values())
+                chunkSize = max(1, min(DEFAULT_CHUNK_ROWS, DEFAULT_CHUNK_BYTES // rowBytes))
+            self._index = {"version": VERSION, "chunkSize": chunkSize, "columns": columns, "chunks": [], "rows": 0}
+            self._writeIndex()
+
+        self.chunkSize: int = self._index["chunkSize"]
+        self.columns: dict = self._index["columns"]
+        self._memmaps = None  # Column -> memmap of the chunk being filled
+        self._rowsInChunk = 0
+        chunks = self._index["chunks"]
+        if chunks and chunks[-1]["rows"] < self.chunkSize:  # Continue filling the last chunk
+            self._memmaps = {name: np.load(self._chunkPath(chunks[-1]["name"], name), mmap_mode='r+') for name in self.columns}
+            self._rowsInChunk = chunks[-1]["rows"]
+
+    def __enter__(self) -> 'RolloutRecorder':
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __len__(self):
+        return self._index["rows"] + (self._rowsInChunk - self._index["chunks"][-1]["rows"] if self._memmaps is not None else 0)
+
+    def _chunkPath(self, chunkName: str, column: str) -> Path:
+        return self.directory / f"{chunkName}.{column}.npy"
+
+    def _writeIndex(self) -> None:
+        temporaryPath = self.directory / (INDEX_FILE + '.tmp')
+        with open(temporaryPath, 'w') as file:
+            json.dump(self._index, file)
+        os.replace(temporaryPath, self.directory / INDEX_FILE)  # Atomic, readers never see a partial index
+
+    def _openChunk(self) -> None:
+        chunkName = f"chunk-{len(self._index['chunks']):06d}"
+        self._memmaps = {name: np.lib.format.open_memmap(self._chunkPath(chunkName, name), mode='w+', dtype=np.dtype(spec["dtype"]),
+                                                         shape=(self.chunkSize, *spec["shape"]))
+                         for name, spec in self.columns.items()}
+        self._index["chunks"].append({"name": chunkName, "rows": 0})
+        self._rowsInChunk = 0
+
+    def _commitChunk(self) -> None:
+        """
+        Flush the rows written to the chunk being filled, and publish them in the index
+        """
+        if self._memmaps is None:
+            return
+        for memmap in self._memmaps.values():
+            memmap.flush()
+        chunk = self._index["chunks"][-1]
+        self._index["rows"] += self._rowsInChunk - chunk["rows"]
+        chunk["rows"] = self._rowsInChunk
+        self._writeIndex()
+        if self._rowsInChunk == self.chunkSize:
+            self._memmaps = None  # Full, the next row opens a new chunk
+
+    def append(self, **row) -> None:
+        """
+        Append one row
+        :param row: value of every column, of the row shape of the column
+        :return: None
+        """
+        self.appendBatch(**{name: np.asarray(value)[np.newaxis] for name, value in row.items()})
+
+    def appendBatch(self, **columns) -> None:
+        """
+        Append several rows at once, e.g. one per drone of a DroneVecEnv step
+        :param columns: values of every column, of shape (rows, *row shape of the column)
+        :return: None
+        """
+        if set(columns) != set(self.columns):
+            raise Exception(f"Values are needed for exactly the columns {sorted(self.columns)}, got {sorted(columns)}")
+        arrays = {name: np.asarray(values) for name, values in columns.items()}
+        counts = {len(values) for values in arrays.values()}
+        if len(counts) != 1:
+            raise Exception(f"All the columns must have the same number of rows, got {counts}")
+        count = counts.pop()
+
+        with self._lock:
+            written = 0
+            while written < count:
+                if self._memmaps is None:
+                    self._openChunk()
+                rows = min(count - written, self.chunkSize - self._rowsInChunk)
+                for name, values in arrays.items():
+                    self._memmaps[name][self._rowsInChunk:self._rowsInChunk + rows] = values[written:written + rows]
+                self._rowsInChunk += rows
+                written += rows
+                if self._rowsInChunk == self.chunkSize:
+                    self._commitChunk()
+
+    def flush(self) -> None:
+        """
+        Write the rows appended so far to disk, and make them visible to the readers
+        :return: None
+        """
+        with self._lock:
+            self._commitChunk()
+
+    def close(self) -> None:
+        self.flush()
+        self._memmaps = None
+
+
+def _normalizeColumns(columns: dict) -> dict:
+    """
+    :param columns: column name -> (dtype, row shape)
+    :return: column name -> {"dtype": dtype name, "shape": list}, as stored in the index
+    """
+    return {name: {"dtype": np.dtype(dtype).str, "shape": [int(size) for size in shape]} for name, (dtype, shape) in columns.items()}
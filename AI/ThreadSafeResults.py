@@ -1,35 +1,126 @@
+import collections
 import threading
-from typing import List
+import time
+from typing import Any, List, NamedTuple
+
+from AI.DetectionBatch import DetectionBatch
+
+
+class ResultsSnapshot(NamedTuple):
+    results: Any  # Published results, never modified once published
+    version: int  # Number of results published so far, starting at 1
+    timestamp: float  # time.monotonic() at which the results were published
+    frameTimestamp: float or None  # time.monotonic() at which the analyzed frame was captured, if known
+    skipped: int  # Number of versions published since the version the consumer waited from, and never returned to it
 
 
 class ThreadSafeResults:
     """
     Class to store the results of the Yolo detection and Aruco detection threads in a thread-safe manner.
+    Every published result gets a new version, so consumers can wait for results newer than the last ones they handled (wait_for_new),
+    and know how many they skipped. An optional history keeps the last results, for consumers which must not skip any.
     """
-    def __init__(self):
+    def __init__(self, historySize: int = 0):
+        """
+        :param historySize: number of past snapshots to keep for get_history, 0 to keep none
+        """
         self.lock = threading.Lock()
+        self._condition = threading.Condition(self.lock)
         self.isChanged = False
         self.results = []
+        self.version = 0
+        self._latest: ResultsSnapshot or None = None
+        self.history = collections.deque(maxlen=historySize) if historySize > 0 else None
+        self._fetchedVersion = 0  # Version returned by the last get_latest_results
+        self.skipped = 0  # Versions never returned by get_latest_results, because newer ones were published before it was called
+        self._listeners = []  # Functions called with every new snapshot, see add_listener
+
+    def update_results(self, new_results, frameTimestamp: float = None):  # for yolo this is a DetectionBatch
+        with self._condition:
+            snapshot = self._publish(new_results, frameTimestamp)
+        self._notifyListeners(snapshot)
+
+    def _publish(self, new_results, frameTimestamp: float = None):
+        # Must be called with the lock held
+        self.results = new_results
+        self.isChanged = True
+        self.version += 1
+        self._latest = ResultsSnapshot(new_results, self.version, time.monotonic(), frameTimestamp, 0)
+        if self.history is not None:
+            self.history.append(self._latest)
+        self._condition.notify_all()
+        return self._latest
+
+    def _notifyListeners(self, snapshot: ResultsSnapshot):
+        # Called without the lock held, so listeners may read the results
+        for listener in self._listeners:
+            listener(snapshot)
+
+    def add_listener(self, listener):
+        """
+        :param listener: function called with every new ResultsSnapshot, from the publishing thread. It must return quickly, e.g. by queuing an event
+        """
+        with self.lock:
+            self._listeners = self._listeners + [listener]  # Replaced, not modified, so it is iterated without the lock
+
+    def remove_listener(self, listener):
+        with self.lock:
+            self._listeners = [registered for registered in self._listeners if registered is not listener]
+
+    def wait_for_new(self, version: int, timeout: float = None) -> ResultsSnapshot or None:
+        """
+        Wait for results newer than a version, without polling
+        :param version: version of the last results handled by the consumer, 0 if none
+        :param timeout: maximal number of seconds to wait, None waits forever, 0 returns immediately
+        :return: snapshot of the newest results, with the number of versions skipped since version, or None if there are none before the timeout
+        """
+        with self._condition:
+            if not self._condition.wait_for(lambda: self.version > version, timeout=timeout):
+                return None
+            return self._latest._replace(skipped=self.version - version - 1)
 
-    def update_results(self, new_results):  # for yolo this is a list of YoloDetectionObject
+    def latest(self) -> ResultsSnapshot or None:
+        """
+        :return: snapshot of the newest results, or None if none were published
+        """
         with self.lock:
-            self.results = new_results
-            self.isChanged = True
+            return self._latest
+
+    def get_history(self, sinceVersion: int = 0) -> List[ResultsSnapshot]:
+        """
+        :param sinceVersion: version of the last results handled by the consumer
+        :return: snapshots newer than sinceVersion still in the history, oldest first (empty if the results have no history)
+        """
+        with self.lock:
+            if self.history is None:
+                return []
+            return [snapshot for snapshot in self.history if snapshot.version > sinceVersion]
 
     def get_latest_results(self) -> List:
         with self.lock:
-            current_results = self.results.copy()  # Make a copy of the current results
-            self.results.clear()  # Optionally clear results after fetching to avoid re-processing
+            current_results = self.results
+            self.results = []  # Replace the results after fetching to avoid re-processing (no copy, they are never modified once published)
             self.isChanged = False
+            self.skipped += max(0, self.version - self._fetchedVersion - 1)
+            self._fetchedVersion = self.version
             return current_results
 
     def clear_results(self):
         with self.lock:
-            self.results.clear()  # Explicitly clear results when needed
+            self.results = []  # Explicitly clear results when needed
 
     def append_results(self, new_results):
-        with self.lock:
-            self.results.append(new_results)  # Append new results to existing list
+        """
+        Publish the current results with new ones appended, as a new version
+        :param new_results: a DetectionBatch, concatenated to the current DetectionBatch (Yolo), or results appended to the current list
+        """
+        with self._condition:
+            if isinstance(new_results, DetectionBatch):
+                results = DetectionBatch.concatenate([self.results, new_results]) if len(self.results) else new_results
+            else:
+                results = self.results + [new_results]
+            snapshot = self._publish(results)
+        self._notifyListeners(snapshot)
 
     def getIsChanged(self):
         with self.lock:
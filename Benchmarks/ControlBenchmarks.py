@@ -0,0 +1,323 @@
+"""
+Benchmarks of the drone control and telemetry path: round trip times of the queries, throughput of concurrent queries, rate of fire-and-forget
+controls, age of the pushed drone states, and latency from a YOLO detection to the destroy of the detected actor.
+
+By default the benchmarks run against an in-process SimulatorServer, so they can run on any machine. Use --external to run them against a
+running UE engine (or a separately started Simulator/_MainSimulator.py).
+Results are printed as a table and written as JSON (--output). Given a previous JSON (--baseline), the run fails if a latency percentile
+regressed by more than --tolerance.
+
+Usage:
+    $ python -m Benchmarks.ControlBenchmarks --iterations 1000 --output bench.json
+    $ python -m Benchmarks.ControlBenchmarks --latency-ms 5 --jitter-ms 5 --loss 0.01 --binary
+    $ python -m Benchmarks.ControlBenchmarks --baseline bench.json --tolerance 0.2
+"""
+
+import argparse
+import json
+import platform
+import sys
+import threading
+import time
+from pathlib import Path
+
+from AI.ActorVerificationWorker import ActorVerificationWorker
+from AI.DetectionBatch import DetectionBatch
+from AI.ThreadSafeResults import ThreadSafeResults
+from Core.PublicDroneControl import PublicDroneControl
+from Simulator.NetworkConditions import NetworkConditions
+from Simulator.SimulatedWorld import SimulatedWorld
+from Simulator.SimulatorServer import SimulatorServer
+
+PERCENTILES = (50, 95, 99)
+HIT_TEST_GRID = [((i % 5 + 0.5) / 5, (i // 5 + 0.5) / 4) for i in range(20)]  # Screen points hit tested at once by rtt_getTargetsOfPoints_20
+
+
+def summarizeLatencies(latencies: list[float]) -> dict:
+    """
+    :param latencies: measured latencies in seconds
+    :return: count, mean, min, max and PERCENTILES of the latencies in milliseconds (nearest-rank percentiles)
+    """
+    if not latencies:
+        return {"count": 0}
+    ordered = sorted(latencies)
+    summary = {"count": len(ordered), "meanMs": sum(ordered) / len(ordered) * 1000, "minMs": ordered[0] * 1000, "maxMs": ordered[-1] * 1000}
+    for percentile in PERCENTILES:
+        rank = max(0, min(len(ordered) - 1, int(len(ordered) * percentile / 100 + 0.5) - 1))
+        summary[f"p{percentile}Ms"] = ordered[rank] * 1000
+    return summary
+
+
+def _timeCalls(function, iterations: int, warmup: int) -> tuple[list[float], int]:
+    """
+    :param function: function to call, without arguments
+    :param iterations: number of timed calls
+    :param warmup: number of calls before the timed calls
+    :return: latencies of the timed calls which succeeded, and number of calls which timed out
+    """
+    for _ in range(warmup):
+        try:
+            function()
+        except TimeoutError:
+            pass
+    latencies, timeouts = [], 0
+    for _ in range(iterations):
+        start = time.perf_counter()
+        try:
+            function()
+        except TimeoutError:
+            timeouts += 1
+            continue
+        latencies.append(time.perf_counter() - start)
+    return latencies, timeouts
+
+
+#  Benchmarks ----------------------------------------------------------------
+
+def benchmarkQuery(name: str, function, iterations: int, warmup: int) -> dict:
+    """
+    Round trip time of a query, sent one after the other
+    :param name: name of the benchmark
+    :param function: function sending the query and waiting for its reply
+    :param iterations: number of timed queries
+    :param warmup: number of queries sent before timing
+    :return: result of the benchmark
+    """
+    latencies, timeouts = _timeCalls(function, iterations, warmup)
+    return {"name": name, "timeouts": timeouts, "latency": summarizeLatencies(latencies)}
+
+
+def benchmarkConcurrentQueries(publicDroneControl: PublicDroneControl, threads: int, iterations: int) -> dict:
+    """
+    Throughput of getDroneState queries sent concurrently from several threads sharing one PublicDroneControl
+    :param publicDroneControl: PublicDroneControl to benchmark
+    :param threads: number of threads sending queries
+    :param iterations: number of queries sent by each thread
+    :return: result of the benchmark
+    """
+    results = [None] * threads
+
+    def worker(index: int):
+        results[index] = _timeCalls(publicDroneControl.getDroneState, iterations, 0)
+
+    workers = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    start = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    latencies = [latency for threadLatencies, _ in results for latency in threadLatencies]
+    return {"name": f"concurrent_getDroneState_x{threads}", "timeouts": sum(timeouts for _, timeouts in results),
+            "throughputPerSec": len(latencies) / elapsed, "latency": summarizeLatencies(latencies)}
+
+
+def benchmarkControlRate(publicDroneControl: PublicDroneControl, duration: float, simulator: SimulatorServer = None) -> dict:
+    """
+    Rate at which fire-and-forget controls can be sent
+    :param publicDroneControl: PublicDroneControl to benchmark
+    :param duration: number of seconds to send controls for
+    :param simulator: in-process simulator, to count the controls which were received. None if running against an external engine
+    :return: result of the benchmark
+    """
+    receivedBefore = simulator.receivedMessages if simulator is not None else None
+    sent = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < duration:
+        publicDroneControl.rotateCameraUp(0)  # Moves nothing, so the drone stays where the other benchmarks expect it
+        sent += 1
+    elapsed = time.perf_counter() - start
+    publicDroneControl.getDroneState()  # The reply comes after all the controls were handled by the simulator
+
+    result = {"name": "control_rate", "sent": sent, "sentPerSec": sent / elapsed}
+    if simulator is not None:
+        result["received"] = simulator.receivedMessages - receivedBefore - 1
+        result["receivedPerSec"] = result["received"] / elapsed
+    return result
+
+
+def benchmarkTelemetry(publicDroneControl: PublicDroneControl, rateHz: float, duration: float) -> dict:
+    """
+    Age of the newest pushed drone state, when read at random times, and the rate at which the engine pushed drone states
+    :param publicDroneControl: PublicDroneControl to benchmark, subscribed to the drone state stream at rateHz during the benchmark
+    :param rateHz: rate of the drone state stream
+    :param duration: number of seconds to read the drone state for
+    :return: result of the benchmark
+    """
+    publicDroneControl.subscribeDroneState(rateHz=rateHz)
+    time.sleep(0.2)  # Let the stream start
+    first = publicDroneControl.droneStateCache.read()
+    ages = []
+    start = time.perf_counter()
+    while time.perf_counter() - start < duration:
+        sample = publicDroneControl.droneStateCache.read()
+        if sample is not None:
+            ages.append(time.monotonic() - sample.timestamp)
+        time.sleep(0.0037)  # Not a multiple of the stream period, so reads are spread over it
+    last = publicDroneControl.droneStateCache.read()
+
+    streamed = last.sequence - first.sequence if first is not None and last is not None else 0
+    return {"name": f"telemetry_{rateHz:g}Hz", "streamedPerSec": streamed / duration, "outOfOrder": publicDroneControl.droneStateCache.outOfOrder,
+            "age": summarizeLatencies(ages)}
+
+
+def benchmarkDetectionToVerify(publicDroneControl: PublicDroneControl, iterations: int) -> dict:
+    """
+    Latency from a YOLO detection being published in the ThreadSafeResults, to the actor being confirmed destroyed by the ActorVerificationWorker,
+    with the results handled like GradeAI._handleYoloDetection. Before each detection the drone is moved above a spawned actor, with the
+    camera looking down, so the detection at the center of the screen hits it
+    :param publicDroneControl: PublicDroneControl to benchmark
+    :param iterations: number of detections
+    :return: result of the benchmark
+    """
+    actors = publicDroneControl.spawnXActors(iterations)  # At most MAX_ACTORS_TO_SPAWN
+    publicDroneControl.turnCameraXDegreesAtSpeed(89, speedMultiplier=1000)
+
+    yoloResults = ThreadSafeResults()
+    verified = []  # (time the detection was published, time the actor was confirmed destroyed)
+    done = threading.Event()
+
+    def onVerified(actorIndices, frameTimestamp):
+        verified.append((publishedAt, time.perf_counter()))
+        done.set()
+
+    worker = ActorVerificationWorker(publicDroneControl, onVerified, recentPointTtl=0)  # Every detection is of a new actor at the center of the screen
+    worker.start()
+    yoloResults.add_listener(lambda snapshot: worker.submit(snapshot.results.ofClass("person").centers().tolist(), snapshot.frameTimestamp))
+    latencies, timeouts = [], 0
+    for actor in actors:
+        publicDroneControl.moveDroneToLocation(actor.x, actor.y, actor.z + 500, speed=1000, turnWithMove=False)
+        done.clear()
+        verified.clear()
+        publishedAt = time.perf_counter()
+        yoloResults.update_results(DetectionBatch.fromArrays(["person"], [0], [0.9], [[0.5, 0.5, 0.1, 0.2]], [[0, 0, 0, 0]], len(latencies), time.monotonic()),
+                                   frameTimestamp=time.monotonic())
+        if not done.wait(timeout=10) or not verified:
+            timeouts += 1
+            continue
+        latencies.append(verified[0][1] - verified[0][0])
+    worker.stop()
+    worker.join()
+    return {"name": "detection_to_verify", "timeouts": timeouts, "latency": summarizeLatencies(latencies)}
+
+#  End Benchmarks ------------------------------------------------------------
+
+
+def compareToBaseline(results: dict, baseline: dict, tolerance: float) -> list[str]:
+    """
+    :param results: results of this run
+    :param baseline: results of a previous run
+    :param tolerance: allowed relative increase of each latency percentile, e.g. 0.2 for 20%
+    :return: descriptions of the regressions, empty if there is none
+    """
+    baselineBenchmarks = {benchmark["name"]: benchmark for benchmark in baseline["benchmarks"]}
+    regressions = []
+    for benchmark in results["benchmarks"]:
+        previous = baselineBenchmarks.get(benchmark["name"])
+        if previous is None:
+            continue
+        for key in ("latency", "age"):
+            if key not in benchmark or key not in previous:
+                continue
+            for percentile in PERCENTILES:
+                metric = f"p{percentile}Ms"
+                new, old = benchmark[key].get(metric), previous[key].get(metric)
+                if new is not None and old is not None and new > old * (1 + tolerance):
+                    regressions.append(f"{benchmark['name']} {key} {metric}: {old:.3f} -> {new:.3f}")
+    return regressions
+
+
+def printResults(results: dict) -> None:
+    print(f"{'benchmark':<32} {'count':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}  other")
+    for benchmark in results["benchmarks"]:
+        latency = benchmark.get("latency", benchmark.get("age", {}))
+        other = ", ".join(f"{key}={value:.1f}" if isinstance(value, float) else f"{key}={value}"
+                          for key, value in benchmark.items() if key not in ("name", "latency", "age"))
+        if latency.get("count"):
+            print(f"{benchmark['name']:<32} {latency['count']:>7} {latency['p50Ms']:>9.3f} {latency['p95Ms']:>9.3f} {latency['p99Ms']:>9.3f} "
+                  f"{latency['maxMs']:>9.3f}  {other}")
+        else:
+            print(f"{benchmark['name']:<32} {'':>7} {'':>9} {'':>9} {'':>9} {'':>9}  {other}")
+
+
+def run(ip: str = "127.0.0.1", port: int = 3001, external: bool = False, binary: bool = False, iterations: int = 500, warmup: int = 50,
+        threads: int = 8, duration: float = 2.0, telemetryRateHz: float = 100, detections: int = 50,
+        latencyMs: float = 0.0, jitterMs: float = 0.0, loss: float = 0.0, seed: int = 0) -> dict:
+    """
+    Run all the benchmarks
+    :return: results of the run, as written to the JSON output
+    """
+    simulator = None
+    networkConditions = NetworkConditions(latencyMs, jitterMs, loss, seed)
+    if not external:
+        simulator = SimulatorServer(ip, port, world=SimulatedWorld(seed=seed), networkConditions=networkConditions)
+        simulator.start()
+
+    publicDroneControl = PublicDroneControl(ip, port)
+    try:
+        binary = publicDroneControl.negotiateBinaryProtocol() if binary else False
+        benchmarks = [
+            benchmarkQuery("rtt_getDroneState", publicDroneControl.getDroneState, iterations, warmup),
+            benchmarkQuery("rtt_getCameraTarget", publicDroneControl.getCameraTarget, iterations, warmup),
+            benchmarkQuery("rtt_getTargetOfPoint", lambda: publicDroneControl.getTargetOfPoint(0.25, 0.75), iterations, warmup),
+            benchmarkQuery("rtt_getTargetsOfPoints_20", lambda: publicDroneControl.getTargetsOfPoints(HIT_TEST_GRID), iterations, warmup),
+            benchmarkConcurrentQueries(publicDroneControl, threads, iterations // threads or 1),
+            benchmarkControlRate(publicDroneControl, duration, simulator),
+            benchmarkTelemetry(publicDroneControl, telemetryRateHz, duration),
+            benchmarkDetectionToVerify(publicDroneControl, detections),
+        ]
+    finally:
+        publicDroneControl.subscribeDroneState(rateHz=0)
+        if simulator is not None:
+            simulator.stop()
+            simulator.join()
+
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "target": f"{ip}:{port}" if external else "in-process simulator",
+        "protocol": "binary" if binary else "json",
+        "networkConditions": None if external else {"latencyMs": latencyMs, "jitterMs": jitterMs, "loss": loss},
+        "benchmarks": benchmarks,
+        "linkStats": publicDroneControl.linkStats.snapshot(),
+    }
+
+
+def parseOptions():
+    parser = argparse.ArgumentParser(description="Benchmarks of the drone control and telemetry path")
+    parser.add_argument('--ip', type=str, default="127.0.0.1", help="IP address of the UE engine")
+    parser.add_argument('--port', type=int, default=3001, help="port of the client receiver socket")
+    parser.add_argument('--external', action='store_true', help="run against a running UE engine instead of the in-process simulator")
+    parser.add_argument('--binary', action='store_true', help="negotiate the binary protocol")
+    parser.add_argument('--iterations', type=int, default=500, help="number of timed queries per round trip benchmark")
+    parser.add_argument('--warmup', type=int, default=50, help="number of queries sent before timing")
+    parser.add_argument('--threads', type=int, default=8, help="number of threads of the concurrent queries benchmark")
+    parser.add_argument('--duration', type=float, default=2.0, help="seconds of the control rate and telemetry benchmarks")
+    parser.add_argument('--telemetry-rate', type=float, default=100, help="rate of the drone state stream, in Hz")
+    parser.add_argument('--detections', type=int, default=50, help="number of detections of the detection to verify benchmark (at most 150, one per actor)")
+    parser.add_argument('--latency-ms', type=float, default=0.0, help="latency of the in-process simulator")
+    parser.add_argument('--jitter-ms', type=float, default=0.0, help="jitter of the in-process simulator")
+    parser.add_argument('--loss', type=float, default=0.0, help="loss of the in-process simulator")
+    parser.add_argument('--seed', type=int, default=0, help="seed of the in-process simulator")
+    parser.add_argument('--output', type=str, default=None, help="path of the JSON results")
+    parser.add_argument('--baseline', type=str, default=None, help="JSON results of a previous run to compare to")
+    parser.add_argument('--tolerance', type=float, default=0.2, help="allowed relative increase of the latency percentiles over the baseline")
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    opt = parseOptions()
+    results = run(ip=opt.ip, port=opt.port, external=opt.external, binary=opt.binary, iterations=opt.iterations, warmup=opt.warmup,
+                  threads=opt.threads, duration=opt.duration, telemetryRateHz=opt.telemetry_rate, detections=opt.detections,
+                  latencyMs=opt.latency_ms, jitterMs=opt.jitter_ms, loss=opt.loss, seed=opt.seed)
+    printResults(results)
+    if opt.output is not None:
+        Path(opt.output).write_text(json.dumps(results, indent=2))
+
+    if opt.baseline is not None:
+        regressions = compareToBaseline(results, json.loads(Path(opt.baseline).read_text()), opt.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        sys.exit(1 if regressions else 0)
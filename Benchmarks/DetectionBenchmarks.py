@@ -0,0 +1,187 @@
+"""
+Benchmark of the recall and latency of the Yolo detection paths on labeled frames: the full-frame path of runYoloDetection (the frame
+letterboxed to --imgsz) against tiled inference (YoloImpl.TiledInference) with several tile sizes and overlaps. People seen from the flight
+altitude of the drone are a few pixels high, which the full-frame path loses.
+
+Frames are read from a YOLO-format dataset: images under .../images/ and one label file per image under .../labels/ (class x_center y_center
+width height, normalized). An object counts as found if a detection of its class has an IOU of at least --match-iou with it.
+
+Usage:
+    $ python -m Benchmarks.DetectionBenchmarks --weights YoloImpl/yolov5s.pt --source datasets/aerial/images --classes 0
+    $ python -m Benchmarks.DetectionBenchmarks --tiles 640:0.2 960:0.2 --output detection.json
+"""
+
+import argparse
+import glob
+import json
+import os
+import platform
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+import torch
+
+from Benchmarks.ControlBenchmarks import summarizeLatencies
+from YoloImpl.models.common import DetectMultiBackend
+from YoloImpl.TiledInference import TiledInference
+from YoloImpl.utils.augmentations import letterbox
+from YoloImpl.utils.dataloaders import IMG_FORMATS, img2label_paths
+from YoloImpl.utils.general import check_img_size, non_max_suppression, scale_boxes, xywhn2xyxy
+from YoloImpl.utils.metrics import box_iou
+from YoloImpl.utils.torch_utils import select_device
+
+
+def loadLabeledFrames(source: str, classes=None) -> list[tuple[str, np.ndarray, np.ndarray]]:
+    """
+    :param source: directory of the images of a YOLO-format dataset
+    :param classes: classes of the objects to find, None for all
+    :return: (path, frame, (n, 5) class and xyxy pixels of the labeled objects) of every image
+    """
+    paths = sorted(path for path in glob.glob(os.path.join(source, '*.*')) if path.split('.')[-1].lower() in IMG_FORMATS)
+    frames = []
+    for path, labelPath in zip(paths, img2label_paths(paths)):
+        im0 = cv2.imread(path)
+        labels = np.loadtxt(labelPath, ndmin=2, dtype=np.float32) if os.path.isfile(labelPath) else np.zeros((0, 5), np.float32)
+        if classes is not None:
+            labels = labels[np.isin(labels[:, 0], classes)]
+        boxes = xywhn2xyxy(labels[:, 1:5], w=im0.shape[1], h=im0.shape[0])
+        frames.append((path, im0, np.concatenate([labels[:, :1], boxes], 1)))
+    return frames
+
+
+def _toTensor(model: DetectMultiBackend, im: np.ndarray) -> torch.Tensor:
+    im = torch.from_numpy(im).to(model.device)
+    im = im.half() if model.fp16 else im.float()  # uint8 to fp16/32
+    im /= 255  # 0 - 255 to 0.0 - 1.0
+    return im if len(im.shape) == 4 else im[None]
+
+
+def _countFound(det: torch.Tensor, labels: np.ndarray, matchIou: float) -> int:
+    """
+    :param det: (n, 6) detections of a frame, xyxy pixels, conf, cls
+    :param labels: (m, 5) class and xyxy pixels of the labeled objects of the frame
+    :return: number of labeled objects matched by a detection of their class, each detection matching at most one object
+    """
+    if not len(det) or not len(labels):
+        return 0
+    iou = box_iou(torch.from_numpy(labels[:, 1:]).to(det.device), det[:, :4]).cpu().numpy()
+    iou[labels[:, :1] != det[:, 5].cpu().numpy()[None]] = 0
+    found, used = 0, np.zeros(len(det), dtype=bool)
+    for i in np.argsort(-iou.max(1)):  # Best matches first
+        candidates = np.where((iou[i] >= matchIou) & ~used)[0]
+        if len(candidates):
+            used[candidates[iou[i, candidates].argmax()]] = True
+            found += 1
+    return found
+
+
+def benchmarkPath(name: str, detect, frames: list, matchIou: float, warmup: int) -> dict:
+    """
+    :param name: name of the detection path
+    :param detect: function of a frame returning its (n, 6) detections in pixels of the frame
+    :param frames: labeled frames of loadLabeledFrames
+    :param matchIou: IOU above which a detection matches a labeled object
+    :param warmup: number of frames detected before timing
+    :return: recall, detections per frame and latency of the path
+    """
+    for _, im0, _ in frames[:warmup]:
+        detect(im0)
+    latencies, found, labeled, detections = [], 0, 0, 0
+    for _, im0, labels in frames:
+        start = time.perf_counter()
+        det = detect(im0)
+        if det.is_cuda:
+            torch.cuda.synchronize()
+        latencies.append(time.perf_counter() - start)
+        found += _countFound(det, labels, matchIou)
+        labeled += len(labels)
+        detections += len(det)
+    return {"name": name, "recall": found / labeled if labeled else 0.0, "objects": labeled, "detectionsPerFrame": detections / len(frames),
+            "latency": summarizeLatencies(latencies)}
+
+
+def run(weights: str, source: str, imgsz: int = 640, tiles=((640, 0.2),), classes=None, confThres: float = 0.25, iouThres: float = 0.45,
+        matchIou: float = 0.5, device: str = '', half: bool = False, warmup: int = 3) -> dict:
+    """
+    Run the full-frame path and every tiled configuration on the labeled frames
+    :param tiles: (tile size, overlap) of the tiled configurations
+    :return: results of the run, as written to the JSON output
+    """
+    model = DetectMultiBackend(weights, device=select_device(device), fp16=half)
+    frames = loadLabeledFrames(source, classes)
+    if not frames:
+        raise Exception(f"No labeled images in {source}")
+    size = check_img_size(imgsz, s=model.stride)
+
+    @torch.inference_mode()
+    def detectFullFrame(im0):
+        im = letterbox(im0, size, stride=model.stride, auto=model.pt)[0]  # padded resize, as the dataloaders of runYoloDetection
+        im = _toTensor(model, np.ascontiguousarray(im.transpose((2, 0, 1))[::-1]))
+        det = non_max_suppression(model(im), confThres, iouThres, classes)[0]
+        det[:, :4] = scale_boxes(im.shape[2:], det[:, :4], im0.shape).round()
+        return det
+
+    def detectTiled(tiler):
+        @torch.inference_mode()
+        def detect(im0):
+            im, tileOrigins = tiler.slice(im0)
+            return tiler.merge(model(_toTensor(model, im)), tileOrigins, im0.shape)
+        return detect
+
+    benchmarks = [benchmarkPath(f"full_frame_{size}", detectFullFrame, frames, matchIou, warmup)]
+    for tileSize, overlap in tiles:
+        tiler = TiledInference(check_img_size(tileSize, s=model.stride), overlap, conf_thres=confThres, iou_thres=iouThres, classes=classes)
+        benchmarks.append(benchmarkPath(f"tiled_{tiler.tile_size}_{overlap:g}", detectTiled(tiler), frames, matchIou, warmup))
+
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "torch": torch.__version__,
+        "device": str(model.device),
+        "weights": str(weights),
+        "source": str(source),
+        "frames": len(frames),
+        "benchmarks": benchmarks,
+    }
+
+
+def printResults(results: dict) -> None:
+    print(f"{'benchmark':<24} {'recall':>7} {'objects':>8} {'det/frame':>10} {'p50 ms':>9} {'p95 ms':>9} {'max ms':>9}")
+    for benchmark in results["benchmarks"]:
+        latency = benchmark["latency"]
+        print(f"{benchmark['name']:<24} {benchmark['recall']:>7.3f} {benchmark['objects']:>8} {benchmark['detectionsPerFrame']:>10.1f} "
+              f"{latency['p50Ms']:>9.1f} {latency['p95Ms']:>9.1f} {latency['maxMs']:>9.1f}")
+
+
+def parseTile(value: str) -> tuple[int, float]:
+    size, _, overlap = value.partition(':')
+    return int(size), float(overlap or 0.2)
+
+
+def parseOptions():
+    parser = argparse.ArgumentParser(description="Recall and latency of the full-frame and tiled Yolo detection")
+    parser.add_argument('--weights', type=str, default='YoloImpl/yolov5s.pt', help="model path")
+    parser.add_argument('--source', type=str, required=True, help="directory of the images of a YOLO-format dataset (labels in ../labels)")
+    parser.add_argument('--imgsz', type=int, default=640, help="inference size of the full-frame path")
+    parser.add_argument('--tiles', nargs='+', type=parseTile, default=[(640, 0.2)], help="tiled configurations, as size:overlap")
+    parser.add_argument('--classes', nargs='+', type=int, default=None, help="classes of the objects to find, e.g. --classes 0 for people")
+    parser.add_argument('--conf-thres', type=float, default=0.25, help="confidence threshold")
+    parser.add_argument('--iou-thres', type=float, default=0.45, help="NMS IOU threshold")
+    parser.add_argument('--match-iou', type=float, default=0.5, help="IOU above which a detection matches a labeled object")
+    parser.add_argument('--device', default='', help="cuda device, i.e. 0 or cpu")
+    parser.add_argument('--half', action='store_true', help="use FP16 half-precision inference")
+    parser.add_argument('--warmup', type=int, default=3, help="number of frames detected before timing")
+    parser.add_argument('--output', type=str, default=None, help="path of the JSON results")
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    opt = parseOptions()
+    results = run(opt.weights, opt.source, imgsz=opt.imgsz, tiles=opt.tiles, classes=opt.classes, confThres=opt.conf_thres,
+                  iouThres=opt.iou_thres, matchIou=opt.match_iou, device=opt.device, half=opt.half, warmup=opt.warmup)
+    printResults(results)
+    if opt.output is not None:
+        Path(opt.output).write_text(json.dumps(results, indent=2))
@@ -0,0 +1,88 @@
+import math
+
+from Core.Coordinate import Coordinate
+from Core.Target import Target
+
+DEFAULT_TOLERANCE = 1.0  # UE units (centimeters). Positions of hit actors may differ from their spawn locations by float rounding
+DEFAULT_CELL_SIZE = 100.0  # UE units, about the distance between two actors, so most cells hold at most a few actors
+
+
+class ActorIndex:
+    """
+    Uniform grid over the locations of the spawned actors (on the horizontal plane, actors stand on the ground), to find the actor hit by a hit
+    test in O(1) whatever the number of actors, with a tolerance instead of exact float equality.
+    Actors keep the index they were spawned with, which identifies them in DestroyActor, and are removed from the grid in O(1) once destroyed.
+    Not thread-safe: it is owned by the thread verifying the targets.
+    """
+
+    def __init__(self, actors: list[Coordinate] = None, cellSize: float = DEFAULT_CELL_SIZE):
+        """
+        :param actors: locations of the spawned actors, as returned by SpawnXActors
+        :param cellSize: size of the cells of the grid in UE units
+        """
+        self.cellSize = cellSize
+        self._cells = {}  # (cell x, cell y) -> {actor index: location}
+        self._cellOfActor = {}  # Actor index -> (cell x, cell y)
+        for index, location in enumerate(actors or []):
+            self.add(index, location)
+
+    def _cell(self, x: float, y: float) -> tuple[int, int]:
+        return math.floor(x / self.cellSize), math.floor(y / self.cellSize)
+
+    def add(self, index: int, location: Coordinate) -> None:
+        """
+        :param index: index of the actor, as used by DestroyActor
+        :param location: location of the actor
+        :return: None
+        """
+        self.remove(index)
+        cell = self._cell(location.x, location.y)
+        self._cells.setdefault(cell, {})[index] = location
+        self._cellOfActor[index] = cell
+
+    def remove(self, index: int) -> bool:
+        """
+        :param index: index of the actor, as used by DestroyActor
+        :return: True if the actor was in the index
+        """
+        cell = self._cellOfActor.pop(index, None)
+        if cell is None:
+            return False
+        actors = self._cells[cell]
+        del actors[index]
+        if not actors:
+            del self._cells[cell]
+        return True
+
+    def nearest(self, position: Coordinate, tolerance: float = DEFAULT_TOLERANCE) -> int or None:
+        """
+        :param position: position to look around, e.g. of the target of a hit test
+        :param tolerance: maximal distance between the position and the location of the actor, in UE units
+        :return: index of the nearest actor within tolerance of the position, or None if there is none
+        """
+        minCellX, minCellY = self._cell(position.x - tolerance, position.y - tolerance)
+        maxCellX, maxCellY = self._cell(position.x + tolerance, position.y + tolerance)
+        nearestIndex, nearestDistance = None, tolerance
+        for cellX in range(minCellX, maxCellX + 1):
+            for cellY in range(minCellY, maxCellY + 1):
+                for index, location in self._cells.get((cellX, cellY), {}).items():
+                    distance = math.dist((location.x, location.y, location.z), (position.x, position.y, position.z))
+                    if distance <= nearestDistance:
+                        nearestIndex, nearestDistance = index, distance
+        return nearestIndex
+
+    def indexOfTarget(self, target: Target or None, tolerance: float = DEFAULT_TOLERANCE) -> int or None:
+        """
+        :param target: result of a hit test
+        :param tolerance: maximal distance between the position of the target and the location of the actor, in UE units
+        :return: index of the spawned actor that was hit, or None if the target is not a (not yet destroyed) spawned actor
+        """
+        if target is None:
+            return None
+        return self.nearest(target.position, tolerance)
+
+    def __len__(self):
+        return len(self._cellOfActor)
+
+    def __contains__(self, index: int):
+        return index in self._cellOfActor
@@ -0,0 +1,557 @@
+import asyncio
+import functools
+import logging
+import threading
+import time
+from concurrent.futures import Future
+
+from Core.ActorIndex import ActorIndex
+from Core.Coordinate import Coordinate
+from Core.BinaryCodec import PROTOCOL_VERSION, SUPPORTED_VERSIONS, encodeBinary
+from Core.CommandBatch import AsyncCommandBatch, CommandBatch
+from Core.DroneProtocol import (DEFAULT_DRONE_ID, DEFAULT_MAX_RETRIES, DEFAULT_TIMEOUTS, batchAttempts, batchBody, checkDone, controlsBody,
+                                daytimeChangeBody, decodeDatagram, decodeTelemetry, destroyActorBody, destroyActorsBody, droneGradeBody, encodeJson,
+                                getTargetOfPointBody, getTargetsOfPointsBody, gotoBody, helloBody, requestAttempts, spawnActorsBody,
+                                subscribeDroneStateBody, turnCameraBody, turnTowardsBody, withDroneId)
+from Core.DroneState import DroneState
+from Core.LatestValueCache import LatestValueCache
+from Core.LinkStats import LinkStats
+from Core.RequestTracker import RequestTracker
+from Core.Target import Target
+
+_logger = logging.getLogger(__name__)
+
+
+class _DroneDatagramProtocol(asyncio.DatagramProtocol):
+    """
+    Datagram protocol receiving the replies of the UE engine and resolving the matching in-flight requests
+    """
+
+    def __init__(self, requestTracker: RequestTracker, linkStats: LinkStats):
+        self._requestTracker = requestTracker
+        self._linkStats = linkStats
+
+    def datagram_received(self, data: bytes, addr) -> None:
+        try:
+            replies = decodeDatagram(data)  # A batch may be answered with several replies in one datagram
+        except Exception as e:  # Malformed datagram, dropped
+            _logger.warning(f"Dropped a malformed datagram from the UE engine: {e!r}")
+            return
+        for reply in replies:
+            if not self._requestTracker.resolve(*reply):
+                self._linkStats.recordStale()  # Stale and duplicate replies are dropped by the tracker
+
+
+class _TelemetryDatagramProtocol(asyncio.DatagramProtocol):
+    """
+    Datagram protocol receiving the drone states pushed by the UE engine
+    """
+
+    def __init__(self, transport: 'AsyncDroneTransport'):
+        self._transport = transport
+
+    def datagram_received(self, data: bytes, addr) -> None:
+        self._transport.publishTelemetry(data)
+
+
+class AsyncDroneTransport:
+    """
+    asyncio version of DroneTransport: the sockets to the UE engine, shared by the AsyncDroneControl of every drone of a fleet.
+    Every request gets a request id unique to the transport, so replies are routed to the request (and so to the drone) that sent it.
+    Created with the open() coroutine, usually through AsyncDroneControl.create or AsyncDroneControl.createFleet
+    """
+
+    def __init__(self, ip, port, timeouts: dict = None, maxRetries: int = DEFAULT_MAX_RETRIES):
+        """
+        Use AsyncDroneTransport.open() instead of calling the constructor directly
+        """
+        self.ip = ip
+        self.ip_portSend = (ip, port + 1)
+        self.telemetryPort = port + 2
+        self._requestTracker = RequestTracker()  # Correlates replies with in-flight requests by their request id
+        self._timeouts = {**DEFAULT_TIMEOUTS, **(timeouts or {})}
+        self._maxRetries = maxRetries
+        self._encode = encodeJson  # Encoding of the messages to the UE engine, see negotiateBinaryProtocol
+        self.linkStats = LinkStats()  # Counters of sent, lost and retransmitted requests and round trip times, of all the drones
+        self._datagramTransport: asyncio.DatagramTransport = None
+
+        # Drone states pushed by the UE engine, see AsyncDroneControl.subscribeDroneState. The socket is only opened once subscribed
+        self._telemetryTransport: asyncio.DatagramTransport = None
+        self._telemetryLock = asyncio.Lock()  # To ensure the telemetry socket is opened once by concurrent subscriptions
+        self._droneStateCaches: dict[int, LatestValueCache] = {}  # Only written by the event loop
+        self._droneStateListeners: dict[int, list] = {}  # Drone id -> functions called with every new pushed DroneState of the drone
+
+    @classmethod
+    async def open(cls, ip, port, timeouts: dict = None, maxRetries: int = DEFAULT_MAX_RETRIES) -> 'AsyncDroneTransport':
+        """
+        This function is used to open the sockets to the UE engine on the running event loop
+        :param ip: IP address of the UE engine
+        :param port: port number of the UE engine receiver socket (+1 is used for the sender socket)
+        :param timeouts: time to wait for a reply per command name, in seconds (None waits forever). Overrides the defaults of DEFAULT_TIMEOUTS
+        :param maxRetries: number of retransmissions of idempotent queries whose reply was not received in time
+        :return: AsyncDroneTransport
+        """
+        transport = cls(ip, port, timeouts, maxRetries)
+        loop = asyncio.get_running_loop()
+        transport._datagramTransport, _ = await loop.create_datagram_endpoint(
+            lambda: _DroneDatagramProtocol(transport._requestTracker, transport.linkStats), local_addr=(ip, port))
+        return transport
+
+    def close(self) -> None:
+        """
+        Close the sockets. Requests still in flight will never complete
+        :return: None
+        """
+        self._datagramTransport.close()
+        if self._telemetryTransport is not None:
+            self._telemetryTransport.close()
+
+    #  Telemetry -----------------------------------------------------------------
+
+    async def startTelemetry(self, port: int = None) -> int:
+        """
+        Open the socket receiving the pushed drone states, if not already open
+        :param port: port to receive the drone states on (default is the port of the receiver socket + 2). Ignored if already open
+        :return: port the drone states are received on
+        """
+        async with self._telemetryLock:
+            if self._telemetryTransport is None:
+                self.telemetryPort = port or self.telemetryPort
+                loop = asyncio.get_running_loop()
+                self._telemetryTransport, _ = await loop.create_datagram_endpoint(lambda: _TelemetryDatagramProtocol(self),
+                                                                                   local_addr=(self.ip, self.telemetryPort))
+            return self.telemetryPort
+
+    def publishTelemetry(self, data: bytes) -> None:
+        """
+        Publish the drone states of a pushed datagram to the caches and listeners of their drones. Called by the event loop
+        :param data: the datagram
+        :return: None
+        """
+        try:
+            states = decodeTelemetry(data)  # One datagram may hold the states of several drones
+        except Exception as e:  # Malformed datagram, dropped
+            _logger.warning(f"Dropped a malformed drone state from the UE engine: {e!r}")
+            return
+        for droneId, sequence, state in states:
+            if self.droneStateCache(droneId).publish(state, sequence):
+                for listener in self._droneStateListeners.get(droneId, ()):
+                    try:
+                        listener(state)
+                    except Exception:  # A failing listener must not stop the telemetry of the other listeners and drones
+                        _logger.exception(f"Drone state listener {listener!r} of drone {droneId} failed")
+
+    def droneStateCache(self, droneId: int = DEFAULT_DRONE_ID) -> LatestValueCache:
+        """
+        :param droneId: id of the drone
+        :return: cache of the newest drone state pushed for the drone
+        """
+        return self._droneStateCaches.setdefault(droneId, LatestValueCache())
+
+    def addDroneStateListener(self, droneId: int, listener) -> None:
+        # Replaced, not modified, so listeners can be added from other threads (SyncDroneControl) while the event loop iterates
+        self._droneStateListeners = {**self._droneStateListeners, droneId: self._droneStateListeners.get(droneId, []) + [listener]}
+
+    def removeDroneStateListener(self, droneId: int, listener) -> None:
+        listeners = [registered for registered in self._droneStateListeners.get(droneId, []) if registered is not listener]
+        self._droneStateListeners = {**self._droneStateListeners, droneId: listeners}
+
+    #  End Telemetry -------------------------------------------------------------
+
+    #  Requests ------------------------------------------------------------------
+
+    def send(self, body: dict, droneId: int = DEFAULT_DRONE_ID) -> None:
+        """
+        This function is used to send a message to the UE engine
+        :param body: JSON body of the message to send to UE engine, encoded as JSON or binary (see negotiateBinaryProtocol)
+        :param droneId: id of the drone the message is for
+        :return: None
+        """
+        self._datagramTransport.sendto(self._encode(withDroneId(body, droneId)), self.ip_portSend)
+
+    async def call(self, command: str, body: dict, droneId: int = DEFAULT_DRONE_ID):
+        """
+        This function is used to send a request and wait for its reply without blocking the event loop.
+        Follows the same timeout and retransmission rules as DroneTransport.call (see DroneProtocol.requestAttempts)
+        :param command: name of the command the reply will be prefixed with
+        :param body: JSON body of the request
+        :param droneId: id of the drone the request is for
+        :return: the parsed reply payload
+        :raises TimeoutError: if no reply was received after all attempts
+        """
+        requestId, future = self._requestTracker.register(command)
+        reply = asyncio.wrap_future(future)
+        msg = {**body, "requestId": requestId}
+        try:
+            for attempt, timeout in requestAttempts(command, requestId, self._requestTracker, self.linkStats, self._timeouts, self._maxRetries):
+                sentTime = time.monotonic()
+                self.send(msg, droneId)
+                try:
+                    payload = await asyncio.wait_for(asyncio.shield(reply), timeout)
+                except asyncio.TimeoutError:  # Not the builtin TimeoutError before Python 3.11
+                    continue
+                self.linkStats.recordReply(time.monotonic() - sentTime if attempt == 0 else None)  # RTT of retransmitted requests is ambiguous
+                return payload
+        finally:
+            reply.cancel()  # No longer awaited, so the TimeoutError set on the request is not reported as never retrieved
+
+    async def callBatch(self, controls: dict, queries: list[tuple[str, dict]], droneId: int = DEFAULT_DRONE_ID) -> list[Future]:
+        """
+        Coroutine version of DroneTransport.callBatch
+        :param controls: merged control axes and their amounts
+        :param queries: list of (command, body) of the queries
+        :param droneId: id of the drone the controls and queries are for
+        :return: Futures holding the parsed reply payloads, aligned with queries. Queries without a reply hold a TimeoutError
+        """
+        requests = [(command, body, *self._requestTracker.register(command)) for command, body in queries]
+        for attempt, queryBodies, replies, timeout in batchAttempts(requests, self._requestTracker, self.linkStats, self._timeouts, self._maxRetries):
+            self.send(batchBody(controls if attempt == 0 else {}, queryBodies), droneId)  # Controls are only sent once
+            if replies:
+                waiting = [asyncio.wrap_future(reply) for reply in replies]
+                await asyncio.wait(waiting, timeout=timeout)
+                for reply in waiting:
+                    reply.cancel()  # The Futures of the requests are not cancelled, their replies are read from them
+        return [future for _, _, _, future in requests]
+
+    async def negotiateBinaryProtocol(self) -> bool:
+        """
+        Coroutine version of DroneTransport.negotiateBinaryProtocol
+        :return: True if the binary encoding is used from now on, False otherwise
+        """
+        self._encode = encodeBinary
+        try:
+            version = await self.call('hello', helloBody(SUPPORTED_VERSIONS))
+        except (TimeoutError, asyncio.TimeoutError):
+            version = None
+        if version != PROTOCOL_VERSION:
+            self._encode = encodeJson
+            return False
+        return True
+
+    #  End Requests --------------------------------------------------------------
+
+
+class AsyncDroneControl:
+    """
+    asyncio version of PublicDroneControl. Every method is a coroutine, so a single event loop can have many queries and controls in flight at once
+    without a thread per caller. Instances are created with the create() or createFleet() coroutines:
+
+        control = await AsyncDroneControl.create("127.0.0.1", 3001)
+        state, target = await asyncio.gather(control.getDroneState(), control.getTargetOfPoint(0.5, 0.5))
+    """
+
+    def __init__(self, transport: AsyncDroneTransport, droneId: int = DEFAULT_DRONE_ID):
+        """
+        Use AsyncDroneControl.create() or AsyncDroneControl.createFleet() instead of calling the constructor directly
+        """
+        self.droneId = droneId
+        self.transport = transport
+        self.linkStats = transport.linkStats  # Counters of sent, lost and retransmitted requests and round trip times, shared by the fleet
+        self.droneStateCache = transport.droneStateCache(droneId)  # Newest drone state pushed by the UE engine, see subscribeDroneState
+        self.spawnedActors = []
+        self.actorIndex = ActorIndex()  # Spawned actors not destroyed yet, to verify the targets of hit tests
+
+    @classmethod
+    async def create(cls, ip, port, timeouts: dict = None, maxRetries: int = DEFAULT_MAX_RETRIES,
+                     droneId: int = DEFAULT_DRONE_ID) -> 'AsyncDroneControl':
+        """
+        This function is used to create an AsyncDroneControl object on the running event loop
+        :param ip: IP address of the UE engine
+        :param port: port number of the UE engine receiver socket (+1 is used for the sender socket)
+        :param timeouts: time to wait for a reply per command name, in seconds (None waits forever). Overrides the defaults of DEFAULT_TIMEOUTS
+        :param maxRetries: number of retransmissions of idempotent queries whose reply was not received in time
+        :param droneId: id of the drone controlled, 0 being the drone of the map
+        :return: AsyncDroneControl
+        """
+        return cls(await AsyncDroneTransport.open(ip, port, timeouts, maxRetries), droneId)
+
+    @classmethod
+    async def createFleet(cls, ip, port, droneIds, timeouts: dict = None, maxRetries: int = DEFAULT_MAX_RETRIES) -> list['AsyncDroneControl']:
+        """
+        Coroutine version of PublicDroneControl.createFleet: several drones controlled over one pair of sockets
+        :param ip: IP address of the UE engine
+        :param port: port number of the UE engine receiver socket (+1 is used for the sender socket)
+        :param droneIds: ids of the drones to control, or number of drones (ids 0 to n - 1)
+        :param timeouts: see create
+        :param maxRetries: see create
+        :return: list of AsyncDroneControl, one per drone id
+        """
+        if isinstance(droneIds, int):
+            droneIds = range(droneIds)
+        transport = await AsyncDroneTransport.open(ip, port, timeouts, maxRetries)
+        return [cls(transport, droneId) for droneId in droneIds]
+
+    def close(self) -> None:
+        """
+        Close the sockets, shared by all the drones of a fleet. Requests still in flight will never complete
+        :return: None
+        """
+        self.transport.close()
+
+    def _send(self, body: dict) -> None:
+        """
+        This function is used to send a message to the UE engine, for the drone of this object
+        :param body: JSON body of the message to send to UE engine, encoded as JSON or binary (see negotiateBinaryProtocol)
+        :return: None
+        """
+        self.transport.send(body, self.droneId)
+
+    async def _request(self, command: str, body: dict):
+        """
+        This function is used to send a request for the drone of this object and wait for its reply (see AsyncDroneTransport.call)
+        :param command: name of the command the reply will be prefixed with
+        :param body: JSON body of the request
+        :return: the parsed reply payload
+        :raises TimeoutError: if no reply was received after all attempts
+        """
+        return await self.transport.call(command, body, self.droneId)
+
+    async def _callBatch(self, controls: dict, queries: list[tuple[str, dict]]) -> list[Future]:
+        return await self.transport.callBatch(controls, queries, self.droneId)
+
+    async def negotiateBinaryProtocol(self) -> bool:
+        """
+        Coroutine version of PublicDroneControl.negotiateBinaryProtocol. The encoding is shared by all the drones of a fleet
+        :return: True if the binary encoding is used from now on, False otherwise
+        """
+        return await self.transport.negotiateBinaryProtocol()
+
+    def batch(self) -> AsyncCommandBatch:
+        """
+        Version of PublicDroneControl.batch flushed without blocking the event loop:
+
+            async with control.batch() as batch:
+                batch.moveDroneForward(1)
+                state = batch.getDroneState()
+
+        :return: AsyncCommandBatch, sent when the async with block ends
+        """
+        return AsyncCommandBatch(self)
+
+    async def _sendControls(self, controls: dict) -> None:
+        self._send(controlsBody(controls))
+
+    #  Primitive Controls -------------------------------------------------------
+
+    async def moveDroneUp(self, speedMultiplier: float) -> None:
+        await self._sendControls({"upAmount": speedMultiplier})
+
+    async def moveDroneDown(self, speedMultiplier: float) -> None:
+        await self._sendControls({"upAmount": -speedMultiplier})
+
+    async def moveDroneForward(self, speedMultiplier: float) -> None:
+        await self._sendControls({"pitchForwardAmount": speedMultiplier})
+
+    async def moveDroneBackward(self, speedMultiplier: float) -> None:
+        await self._sendControls({"pitchForwardAmount": -speedMultiplier})
+
+    async def moveDroneRight(self, speedMultiplier: float) -> None:
+        await self._sendControls({"rollRightAmount": speedMultiplier})
+
+    async def moveDroneLeft(self, speedMultiplier: float) -> None:
+        await self._sendControls({"rollRightAmount": -speedMultiplier})
+
+    async def rotateDroneRight(self, speedMultiplier: float) -> None:
+        await self._sendControls({"yawRightAmount": speedMultiplier})
+
+    async def rotateDroneLeft(self, speedMultiplier: float) -> None:
+        await self._sendControls({"yawRightAmount": -speedMultiplier})
+
+    async def rotateCameraDown(self, speedMultiplier: float) -> None:
+        await self._sendControls({"cameraDownAmount": speedMultiplier})
+
+    async def rotateCameraUp(self, speedMultiplier: float) -> None:
+        await self._sendControls({"cameraDownAmount": -speedMultiplier})
+
+    #  End Primitive Controls ---------------------------------------------------
+
+    #  Advanced Controls --------------------------------------------------------
+
+    async def hoverDrone(self) -> None:
+        await self._sendControls({"hover": "true"})
+
+    async def rotateDroneXDegreesAtSpeed(self, degrees: float, speed: float = 90) -> None:
+        await self._sendControls({"rotateXDegrees": degrees, "rotationSpeed": speed})
+
+    async def rotateDroneTowardsLocation(self, x: float, y: float, z: float, speed: float = 90) -> None:
+        message = await self._request('turnTowards', turnTowardsBody(x, y, z, speed))
+        checkDone(message, "Error in turning towards location")
+
+    async def moveDroneToLocation(self, x: float, y: float, z: float, speed: float = 2, turnWithMove: bool = True) -> None:
+        message = await self._request('goto', gotoBody(x, y, z, speed, turnWithMove))
+        checkDone(message, "Error in moving to location")
+
+    async def turnCameraXDegreesAtSpeed(self, degrees: float, speedMultiplier: float = 45) -> None:
+        message = await self._request('turnCameraXDeg', turnCameraBody(degrees, speedMultiplier))
+        checkDone(message, "Error in turning camera")
+
+    #  End Advanced Controls ----------------------------------------------------
+
+    #  Drone Vision -------------------------------------------------------------
+
+    async def getDroneState(self) -> DroneState:
+        return await self._request('getDroneState', {"getDroneState": "true"})
+
+    async def subscribeDroneState(self, rateHz: float = 100, port: int = None) -> None:
+        """
+        Coroutine version of PublicDroneControl.subscribeDroneState
+        :param rateHz: number of drone states to push per second. 0 stops the stream
+        :param port: port to receive the drone states on (default is the port of the receiver socket + 2). Ignored if already subscribed by a drone of the fleet
+        :return: None
+        """
+        telemetryPort = await self.transport.startTelemetry(port)  # Shared by all the drones of a fleet
+        self._send(subscribeDroneStateBody(rateHz, telemetryPort))
+
+    def addDroneStateListener(self, listener) -> None:
+        """
+        :param listener: function called with every new DroneState pushed for the drone, from the event loop. It must not block
+        :return: None
+        """
+        self.transport.addDroneStateListener(self.droneId, listener)
+
+    def removeDroneStateListener(self, listener) -> None:
+        self.transport.removeDroneStateListener(self.droneId, listener)
+
+    async def getLatestDroneState(self, maxAge: float = None) -> DroneState:
+        """
+        Coroutine version of PublicDroneControl.getLatestDroneState: the newest pushed drone state, requested with getDroneState if there is none
+        :param maxAge: maximal age of the pushed state in seconds, None to accept any age
+        :return: DroneState
+        """
+        sample = self.droneStateCache.read(maxAge)
+        if sample is not None:
+            return sample.value
+        return await self.getDroneState()
+
+    async def sendDroneGrade(self, grade: float) -> None:
+        self._send(droneGradeBody(grade))
+
+    async def getDistanceToCameraDirection(self) -> float:
+        distance = await self._request('getDistanceToCameraDirection', {"getDistanceToCameraDirection": "true"})
+        return distance / 100  # Convert UE units (centimeters) to meters
+
+    async def getCameraTarget(self) -> Target or None:
+        return await self._request('getCameraTarget', {"getCameraTarget": "true"})
+
+    async def getTargetOfPoint(self, coordinateX: float, coordinateY: float) -> Target or None:
+        return await self._request('GetTargetOfPoint', getTargetOfPointBody(coordinateX, coordinateY))
+
+    async def getTargetsOfPoints(self, points) -> list[Target or None]:
+        points = list(points)
+        if not points:
+            return []
+        return await self._request('GetTargetsOfPoints', getTargetsOfPointsBody(points))
+
+    #  End Drone Vision ---------------------------------------------------------
+
+    #  Map Controls -------------------------------------------------------------
+
+    async def requestDaytimeChange(self, addDegrees: float) -> None:
+        self._send(daytimeChangeBody(addDegrees))
+
+    async def spawnXActors(self, numOfActorsToSpawn: int) -> list[Coordinate] or None:
+        self.spawnedActors = await self._request('SpawnXActors', spawnActorsBody(numOfActorsToSpawn))
+        self.actorIndex = ActorIndex(self.spawnedActors)
+        return self.spawnedActors
+
+    #  End Map Controls ---------------------------------------------------------
+
+    #  Simulation Methods -------------------------------------------------------
+
+    async def verifyAndDestroyActorFromCamera(self) -> bool:
+        return self._destroyIfSpawnedActor(await self.getCameraTarget())
+
+    async def verifyAndDestroyActorFromPoint(self, normalizedX, normalizedY) -> bool:
+        return self._destroyIfSpawnedActor(await self.getTargetOfPoint(normalizedX, normalizedY))
+
+    async def destroyActors(self, indices: list[int]) -> list[int]:
+        if not indices:
+            return []
+        destroyed = await self._request('DestroyActors', destroyActorsBody(indices))
+        for index in destroyed:
+            self.actorIndex.remove(index)
+        return destroyed
+
+    async def verifyAndDestroyActorsFromPoints(self, points) -> list[bool]:
+        hitIndices = []
+        for target in await self.getTargetsOfPoints(points):
+            index = self.actorIndex.indexOfTarget(target)
+            hitIndices.append(index if index not in hitIndices else None)
+        destroyed = set(await self.destroyActors([index for index in hitIndices if index is not None]))
+        return [index in destroyed for index in hitIndices]
+
+    def _destroyIfSpawnedActor(self, target: Target or None) -> bool:
+        index = self.actorIndex.indexOfTarget(target)
+        if index is None:
+            return False
+        self._send(destroyActorBody(index))
+        self.actorIndex.remove(index)
+        return True
+
+    #  End Simulation Methods ---------------------------------------------------
+
+
+class SyncDroneControl:
+    """
+    Blocking facade over AsyncDroneControl, so the existing threaded classes (GradeAI, DummyAlgoThread, PlayerControlThread...) can share one event loop
+    with asyncio code. The loop runs in a daemon thread, and every coroutine method of AsyncDroneControl is exposed as a blocking method of the same name.
+    """
+
+    def __init__(self, ip, port, timeouts: dict = None, maxRetries: int = DEFAULT_MAX_RETRIES, droneId: int = DEFAULT_DRONE_ID):
+        """
+        :param ip: IP address of the UE engine
+        :param port: port number of the UE engine receiver socket (+1 is used for the sender socket)
+        :param timeouts: time to wait for a reply per command name, in seconds. See AsyncDroneControl.create
+        :param maxRetries: number of retransmissions of idempotent queries whose reply was not received in time
+        :param droneId: id of the drone controlled, 0 being the drone of the map
+        """
+        self.loop = asyncio.new_event_loop()
+        self.loop_thread = threading.Thread(target=self.loop.run_forever)
+        self.loop_thread.daemon = True
+        self.loop_thread.start()
+
+        self.asyncControl: AsyncDroneControl = self.submit(AsyncDroneControl.create(ip, port, timeouts, maxRetries, droneId)).result()
+
+    @property
+    def spawnedActors(self) -> list[Coordinate]:
+        return self.asyncControl.spawnedActors
+
+    @property
+    def actorIndex(self) -> ActorIndex:
+        return self.asyncControl.actorIndex
+
+    def batch(self) -> CommandBatch:
+        """
+        Blocking version of AsyncDroneControl.batch, used with a with block as PublicDroneControl.batch
+        :return: CommandBatch, sent when the with block ends
+        """
+        return CommandBatch(self)  # Flushed with the blocking _callBatch of the facade
+
+    def submit(self, coroutine):
+        """
+        Schedule a coroutine on the event loop of the facade from any thread
+        :param coroutine: coroutine to run
+        :return: concurrent.futures.Future holding the result of the coroutine
+        """
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop)
+
+    def close(self) -> None:
+        """
+        Close the sockets and stop the event loop
+        :return: None
+        """
+        self.loop.call_soon_threadsafe(self.asyncControl.close)
+        self.loop.call_soon_threadsafe(self.loop.stop)
+
+    def __getattr__(self, name):
+        if name == 'asyncControl':  # Not created yet
+            raise AttributeError(name)
+        attribute = getattr(self.asyncControl, name)
+        if not asyncio.iscoroutinefunction(attribute):
+            return attribute
+
+        @functools.wraps(attribute)
+        def blocking(*args, **kwargs):
+            return self.submit(attribute(*args, **kwargs)).result()
+
+        return blocking
@@ -0,0 +1,366 @@
+import struct
+
+from Core.Coordinate import Coordinate
+from Core.DroneState import DroneState
+from Core.Target import Target
+
+# Compact binary encoding of the messages exchanged with the UE engine, an alternative to the JSON strings.
+# Every message starts with a fixed header, followed by a fixed-layout payload of little-endian float32 values (see below per opcode):
+#   magic (uint8), version (uint8), opcode (uint8), droneId (uint8), requestId (uint32, 0 if no reply is expected), payload length (uint16)
+# droneId is the drone the request is for, or the drone a pushed state is of (0 for the drone of the map, see PublicDroneControl.createFleet).
+# Several messages may be sent back to back in one datagram (e.g. a batch of controls and queries, or the replies to them).
+# The opcode of a reply is the opcode of its request with the high bit set.
+# The binary encoding is only used once both sides agreed on a version with the 'hello' handshake, see PublicDroneControl.negotiateBinaryProtocol
+
+MAGIC = 0xD7
+PROTOCOL_VERSION = 1
+SUPPORTED_VERSIONS = (1,)
+
+_HEADER = struct.Struct('<BBBBIH')
+MAX_DRONE_ID = 255
+_REPLY_BIT = 0x80
+
+OPCODES = {
+    'controls': 1,
+    'turnTowards': 2,
+    'goto': 3,
+    'turnCameraXDeg': 4,
+    'getDroneState': 5,
+    'getDistanceToCameraDirection': 6,
+    'getCameraTarget': 7,
+    'GetTargetOfPoint': 8,
+    'SpawnXActors': 9,
+    'DestroyActor': 10,
+    'droneGrade': 11,
+    'DaytimeChangeRequested': 12,
+    'subscribeDroneState': 13,
+    'hello': 14,
+    'droneStateStream': 15,
+    'GetTargetsOfPoints': 16,
+    'DestroyActors': 17,
+}
+COMMANDS = {opcode: command for command, opcode in OPCODES.items()}
+
+# Control axes of a 'controls' message, in the order of the bits of its mask. Their values follow the mask as float32, in the same order
+CONTROL_AXES = ('upAmount', 'pitchForwardAmount', 'rollRightAmount', 'yawRightAmount', 'cameraDownAmount', 'rotateXDegrees', 'rotationSpeed')
+_HOVER_BIT = 1 << 15
+
+# Blocking controls are sent inside the "controls" object of the JSON body
+_BLOCKING_CONTROLS = ('turnTowards', 'goto', 'turnCameraXDeg')
+
+_FLOAT2 = struct.Struct('<2f')
+_FLOAT4 = struct.Struct('<4f')
+_GOTO = struct.Struct('<4fB')
+_DRONE_STATE = struct.Struct('<3fI')
+_SUBSCRIBE = struct.Struct('<fH')
+
+
+def isBinary(data: bytes) -> bool:
+    """
+    :param data: datagram received from the other side
+    :return: True if the datagram is binary encoded, False if it is a JSON/text message
+    """
+    return len(data) >= _HEADER.size and data[0] == MAGIC
+
+
+def _message(opcode: int, requestId: int, payload: bytes = b'', version: int = PROTOCOL_VERSION, droneId: int = 0) -> bytes:
+    if not 0 <= droneId <= MAX_DRONE_ID:
+        raise ValueError(f"Drone id cannot be binary encoded: {droneId}")
+    return _HEADER.pack(MAGIC, version, opcode, droneId, requestId, len(payload)) + payload
+
+
+def _splitMessages(data: bytes):
+    """
+    :param data: binary datagram
+    :return: generator of (version, opcode, droneId, requestId, payload) of the messages of the datagram
+    """
+    offset = 0
+    while offset + _HEADER.size <= len(data):
+        magic, version, opcode, droneId, requestId, length = _HEADER.unpack_from(data, offset)
+        if magic != MAGIC:
+            raise ValueError(f"Bad magic byte in binary message: {magic}")
+        offset += _HEADER.size
+        yield version, opcode, droneId, requestId, data[offset:offset + length]
+        offset += length
+
+
+def _packString(value: str) -> bytes:
+    encoded = value.encode('utf-8')[:255]
+    return bytes((len(encoded),)) + encoded
+
+
+def _unpackString(payload: bytes, offset: int) -> tuple[str, int]:
+    length = payload[offset]
+    return payload[offset + 1:offset + 1 + length].decode('utf-8'), offset + 1 + length
+
+
+#  Requests (client -> UE) ---------------------------------------------------
+
+def _encodeControls(controls: dict) -> bytes:
+    mask = 0
+    values = []
+    for bit, axis in enumerate(CONTROL_AXES):
+        if axis in controls:
+            mask |= 1 << bit
+            values.append(controls[axis])
+    if "hover" in controls:
+        mask |= _HOVER_BIT
+    unknown = set(controls) - set(CONTROL_AXES) - {"hover"}
+    if unknown:
+        raise ValueError(f"Controls cannot be binary encoded: {unknown}")
+    return struct.pack(f'<H{len(values)}f', mask, *values)
+
+
+def _encodeRequest(body: dict) -> bytes:
+    """
+    :param body: JSON body of a single request, as built by the functions of Core.DroneProtocol
+    :return: the request as one binary message
+    """
+    opcode, payload = _encodeRequestPayload(body)
+    return _message(opcode, body.get("requestId", 0), payload, droneId=body.get("droneId", 0))
+
+
+def _encodeRequestPayload(body: dict) -> tuple[int, bytes]:
+    """
+    :param body: JSON body of a single request
+    :return: opcode and binary payload of the request
+    """
+    controls = body.get("controls")
+    if controls is not None:
+        if "turnTowards" in controls:
+            v = controls["turnTowards"]
+            return OPCODES['turnTowards'], _FLOAT4.pack(v["turnTowardsXVal"], v["turnTowardsYVal"], v["turnTowardsZVal"], v["turnTowardsSpeed"])
+        if "goto" in controls:
+            v = controls["goto"]
+            return OPCODES['goto'], _GOTO.pack(v["gotoXVal"], v["gotoYVal"], v["gotoZVal"], v["gotoSpeed"], v["turnWithMove"])
+        if "turnCameraXDeg" in controls:
+            v = controls["turnCameraXDeg"]
+            return OPCODES['turnCameraXDeg'], _FLOAT2.pack(v["degrees"], v["speedMultiplier"])
+        return OPCODES['controls'], _encodeControls(controls)
+    if "GetTargetOfPoint" in body:
+        v = body["GetTargetOfPoint"]
+        return OPCODES['GetTargetOfPoint'], _FLOAT2.pack(v["xVal"], v["yVal"])
+    if "SpawnXActors" in body:
+        return OPCODES['SpawnXActors'], struct.pack('<H', body["SpawnXActors"])
+    if "GetTargetsOfPoints" in body:
+        points = [(point["xVal"], point["yVal"]) for point in body["GetTargetsOfPoints"]]
+        return OPCODES['GetTargetsOfPoints'], struct.pack(f'<H{2 * len(points)}f', len(points), *[v for point in points for v in point])
+    if "DestroyActor" in body:
+        return OPCODES['DestroyActor'], struct.pack('<I', body["DestroyActor"])
+    if "DestroyActors" in body:
+        indices = body["DestroyActors"]
+        return OPCODES['DestroyActors'], struct.pack(f'<H{len(indices)}I', len(indices), *indices)
+    if "droneGrade" in body:
+        return OPCODES['droneGrade'], struct.pack('<f', body["droneGrade"])
+    if "DaytimeChangeRequested" in body:
+        return OPCODES['DaytimeChangeRequested'], struct.pack('<f', body["DaytimeChangeRequested"])
+    if "subscribeDroneState" in body:
+        v = body["subscribeDroneState"]
+        return OPCODES['subscribeDroneState'], _SUBSCRIBE.pack(v["rateHz"], v["port"])
+    if "hello" in body:
+        versions = body["hello"]
+        return OPCODES['hello'], bytes((len(versions), *versions))
+    for command in ('getDroneState', 'getDistanceToCameraDirection', 'getCameraTarget'):
+        if command in body:
+            return OPCODES[command], b''
+    raise ValueError(f"Message cannot be binary encoded: {body}")
+
+
+def encodeBinary(body: dict) -> bytes:
+    """
+    This function is used to binary encode a message to the UE engine. Same input as Core.DroneProtocol.encodeJson
+    :param body: JSON body of the message. A batch ({"controls": ..., "queries": [...]}) is encoded as several messages in one datagram,
+                 all for the droneId of the batch
+    :return: the encoded datagram
+    """
+    if "queries" not in body:
+        return _encodeRequest(body)
+    droneId = body.get("droneId", 0)
+    messages = [_encodeRequest({"controls": body["controls"], "droneId": droneId})] if body.get("controls") else []
+    messages += [_encodeRequest({**query, "droneId": droneId}) for query in body["queries"]]
+    return b''.join(messages)
+
+
+def decodeRequests(data: bytes) -> list[dict]:
+    """
+    This function is used by the UE side to decode a binary datagram back into the JSON bodies of its requests
+    :param data: binary datagram received from the client
+    :return: list of JSON bodies, as they would have been received in JSON (with their requestId if a reply is expected, and their droneId if not 0)
+    """
+    bodies = []
+    for _, opcode, droneId, requestId, payload in _splitMessages(data):
+        command = COMMANDS.get(opcode)
+        if command == 'controls':
+            mask = struct.unpack_from('<H', payload)[0]
+            axes = [axis for bit, axis in enumerate(CONTROL_AXES) if mask & (1 << bit)]
+            values = struct.unpack_from(f'<{len(axes)}f', payload, 2)
+            body = {"controls": dict(zip(axes, values))}
+            if mask & _HOVER_BIT:
+                body["controls"]["hover"] = "true"
+        elif command == 'turnTowards':
+            x, y, z, speed = _FLOAT4.unpack(payload)
+            body = {"controls": {"turnTowards": {"turnTowardsXVal": x, "turnTowardsYVal": y, "turnTowardsZVal": z, "turnTowardsSpeed": speed}}}
+        elif command == 'goto':
+            x, y, z, speed, turnWithMove = _GOTO.unpack(payload)
+            body = {"controls": {"goto": {"gotoXVal": x, "gotoYVal": y, "gotoZVal": z, "gotoSpeed": speed, "turnWithMove": bool(turnWithMove)}}}
+        elif command == 'turnCameraXDeg':
+            degrees, speedMultiplier = _FLOAT2.unpack(payload)
+            body = {"controls": {"turnCameraXDeg": {"degrees": degrees, "speedMultiplier": speedMultiplier}}}
+        elif command == 'GetTargetOfPoint':
+            x, y = _FLOAT2.unpack(payload)
+            body = {"GetTargetOfPoint": {"xVal": x, "yVal": y}}
+        elif command == 'SpawnXActors':
+            body = {"SpawnXActors": struct.unpack('<H', payload)[0]}
+        elif command == 'GetTargetsOfPoints':
+            count = struct.unpack_from('<H', payload)[0]
+            values = struct.unpack_from(f'<{2 * count}f', payload, 2)
+            body = {"GetTargetsOfPoints": [{"xVal": values[i], "yVal": values[i + 1]} for i in range(0, len(values), 2)]}
+        elif command == 'DestroyActor':
+            body = {"DestroyActor": struct.unpack('<I', payload)[0]}
+        elif command == 'DestroyActors':
+            count = struct.unpack_from('<H', payload)[0]
+            body = {"DestroyActors": list(struct.unpack_from(f'<{count}I', payload, 2))}
+        elif command in ('droneGrade', 'DaytimeChangeRequested'):
+            body = {command: struct.unpack('<f', payload)[0]}
+        elif command == 'subscribeDroneState':
+            rateHz, port = _SUBSCRIBE.unpack(payload)
+            body = {"subscribeDroneState": {"rateHz": rateHz, "port": port}}
+        elif command == 'hello':
+            body = {"hello": list(payload[1:1 + payload[0]])}
+        elif command in ('getDroneState', 'getDistanceToCameraDirection', 'getCameraTarget'):
+            body = {command: "true"}
+        else:
+            raise ValueError(f"Unknown binary opcode: {opcode}")
+        if requestId:
+            body["requestId"] = requestId
+        if droneId:
+            body["droneId"] = droneId
+        bodies.append(body)
+    return bodies
+
+
+#  End Requests --------------------------------------------------------------
+
+#  Replies (UE -> client) ----------------------------------------------------
+
+def _encodeDroneState(state: DroneState) -> bytes:
+    return _DRONE_STATE.pack(state.location.x, state.location.y, state.location.z, state.collisionCount)
+
+
+def _decodeDroneState(payload: bytes) -> DroneState:
+    x, y, z, collisionCount = _DRONE_STATE.unpack(payload)
+    return DroneState(Coordinate(x, y, z), collisionCount)
+
+
+def _encodeTarget(target: Target or None) -> bytes:
+    if target is None:
+        return b'\x00'
+    return (b'\x01' + struct.pack('<3f', target.position.x, target.position.y, target.position.z) +
+            _packString(target.displayName) + _packString(target.className))
+
+
+def _decodeTarget(payload: bytes, offset: int = 0) -> tuple[Target or None, int]:
+    if payload[offset] == 0:
+        return None, offset + 1
+    x, y, z = struct.unpack_from('<3f', payload, offset + 1)
+    displayName, offset = _unpackString(payload, offset + 13)
+    className, offset = _unpackString(payload, offset)
+    return Target(displayName, className, Coordinate(x, y, z)), offset
+
+
+def encodeReply(command: str, requestId: int, value) -> bytes:
+    """
+    This function is used by the UE side to binary encode the reply to a request
+    :param command: command of the request
+    :param requestId: requestId of the request
+    :param value: value of the reply: DroneState (getDroneState), distance in UE units (getDistanceToCameraDirection), Target or None (hit tests),
+                  list of Target or None (GetTargetsOfPoints), list of actor indices (DestroyActors), list of Coordinate (SpawnXActors), chosen version (hello)
+                  or status string such as 'Done' (blocking controls)
+    :return: the encoded reply message
+    """
+    opcode = OPCODES[command] | _REPLY_BIT
+    if command == 'getDroneState':
+        payload = _encodeDroneState(value)
+    elif command == 'getDistanceToCameraDirection':
+        payload = struct.pack('<f', value)
+    elif command in ('getCameraTarget', 'GetTargetOfPoint'):
+        payload = _encodeTarget(value)
+    elif command == 'GetTargetsOfPoints':
+        payload = struct.pack('<H', len(value)) + b''.join(_encodeTarget(target) for target in value)
+    elif command == 'DestroyActors':
+        payload = struct.pack(f'<H{len(value)}I', len(value), *value)
+    elif command == 'SpawnXActors':
+        payload = struct.pack(f'<H{3 * len(value)}f', len(value), *[axis for c in value for axis in (c.x, c.y, c.z)])
+    elif command == 'hello':
+        payload = bytes((value,))
+    else:
+        payload = str(value).encode('utf-8')
+    return _message(opcode, requestId, payload)
+
+
+def encodeTelemetry(sequence: int, state: DroneState, droneId: int = 0) -> bytes:
+    """
+    This function is used by the UE side to binary encode a pushed drone state. The states of several drones may be sent back to back in one datagram
+    :param sequence: sequence number of the pushed state
+    :param state: DroneState
+    :param droneId: id of the drone the state is of
+    :return: the encoded message
+    """
+    return _message(OPCODES['droneStateStream'], sequence, _encodeDroneState(state), droneId=droneId)
+
+
+def _decodeReplyValue(command: str, payload: bytes):
+    if command in ('getDroneState', 'droneStateStream'):
+        return _decodeDroneState(payload)
+    if command == 'getDistanceToCameraDirection':
+        return struct.unpack('<f', payload)[0]
+    if command in ('getCameraTarget', 'GetTargetOfPoint'):
+        return _decodeTarget(payload)[0]
+    if command == 'GetTargetsOfPoints':
+        targets, offset = [], 2
+        for _ in range(struct.unpack_from('<H', payload)[0]):
+            target, offset = _decodeTarget(payload, offset)
+            targets.append(target)
+        return targets
+    if command == 'DestroyActors':
+        count = struct.unpack_from('<H', payload)[0]
+        return list(struct.unpack_from(f'<{count}I', payload, 2))
+    if command == 'SpawnXActors':
+        count = struct.unpack_from('<H', payload)[0]
+        values = struct.unpack_from(f'<{3 * count}f', payload, 2)
+        return [Coordinate(*values[i:i + 3]) for i in range(0, len(values), 3)]
+    if command == 'hello':
+        return payload[0]
+    return payload.decode('utf-8')
+
+
+def decodeReplies(data: bytes) -> list[tuple[str, int, object]]:
+    """
+    This function is used by the client to decode a binary datagram received from the UE engine
+    :param data: binary datagram
+    :return: list of (command, requestId, value) of the replies and pushed states of the datagram. See encodeReply for the type of the values.
+             The value is the exception raised while decoding it if its payload is malformed (so it is raised to the caller waiting for the reply)
+    :raises ValueError: if the datagram is not made of binary messages
+    """
+    replies = []
+    for _, opcode, _, requestId, payload in _splitMessages(data):
+        command = COMMANDS.get(opcode & ~_REPLY_BIT)
+        if command is not None:
+            try:
+                value = _decodeReplyValue(command, payload)
+            except Exception as e:  # struct.error or IndexError of a truncated payload
+                value = e
+            replies.append((command, requestId, value))
+    return replies
+
+
+def decodePushedStates(data: bytes) -> list[tuple[int, int, DroneState]]:
+    """
+    This function is used by the client to decode a binary datagram received on the telemetry port
+    :param data: binary datagram
+    :return: list of (droneId, sequence number, DroneState) of the pushed states of the datagram
+    """
+    return [(droneId, sequence, _decodeDroneState(payload)) for _, opcode, droneId, sequence, payload in _splitMessages(data)
+            if opcode == OPCODES['droneStateStream']]
+
+#  End Replies ---------------------------------------------------------------
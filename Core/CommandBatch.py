@@ -0,0 +1,150 @@
+from concurrent.futures import Future
+
+from Core.DroneProtocol import getTargetOfPointBody, getTargetsOfPointsBody
+from Core.PrimitiveControls import PrimitiveControls
+
+
+class CommandBatch(PrimitiveControls):
+    """
+    Class to merge several controls and queries into a single message to the UE engine, sent when the batch is flushed.
+    Amounts given for the same control axis are added up. Queries return a Future, resolved once the batch is flushed:
+
+        with publicDroneControl.batch() as batch:
+            batch.moveDroneForward(1)
+            batch.rotateCameraUp(0.3)
+            state = batch.getDroneState()
+        print(state.result().location)
+    """
+
+    def __init__(self, publicDroneControl):
+        """
+        :param publicDroneControl: PublicDroneControl (or SyncDroneControl, AsyncDroneControl for AsyncCommandBatch) the batch is sent with
+        """
+        self._publicDroneControl = publicDroneControl
+        self._controls = {}
+        self._queries = []  # List of (command, body, function converting the reply, Future of the converted reply)
+
+    def __enter__(self) -> 'CommandBatch':
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is None:
+            self.flush()
+        else:
+            self.cancel()
+
+    def _sendControls(self, controls: dict) -> None:
+        for axis, amount in controls.items():
+            if isinstance(amount, (int, float)) and isinstance(self._controls.get(axis), (int, float)):
+                amount += self._controls[axis]
+            self._controls[axis] = amount
+
+    def _query(self, command: str, body: dict, convert=None) -> Future:
+        future = Future()
+        self._queries.append((command, body, convert or (lambda value: value), future))
+        return future
+
+    def getDroneState(self) -> Future:
+        """
+        :return: Future holding the DroneState
+        """
+        return self._query('getDroneState', {"getDroneState": "true"})
+
+    def getDistanceToCameraDirection(self) -> Future:
+        """
+        :return: Future holding the distance to the nearest object in direction of camera in meters
+        """
+        return self._query('getDistanceToCameraDirection', {"getDistanceToCameraDirection": "true"}, lambda distance: distance / 100)
+
+    def getCameraTarget(self) -> Future:
+        """
+        :return: Future holding the Target in the direction of the camera, or None
+        """
+        return self._query('getCameraTarget', {"getCameraTarget": "true"})
+
+    def getTargetOfPoint(self, coordinateX: float, coordinateY: float) -> Future:
+        """
+        :param coordinateX: Normalized X coordinate in 2D space of the simulation (on screen)
+        :param coordinateY: Normalized Y coordinate in 2D space of the simulation (on screen)
+        :return: Future holding the Target in the direction of the point, or None
+        """
+        return self._query('GetTargetOfPoint', getTargetOfPointBody(coordinateX, coordinateY))
+
+    def getTargetsOfPoints(self, points) -> Future:
+        """
+        :param points: list of (normalized X, normalized Y) coordinates on screen
+        :return: Future holding the list of Target (or None), aligned with points
+        """
+        return self._query('GetTargetsOfPoints', getTargetsOfPointsBody(list(points)))
+
+    def flush(self) -> None:
+        """
+        Send all the controls and queries added since the last flush in one message, and wait for the replies of the queries.
+        Queries whose reply was not received hold a TimeoutError
+        :return: None
+        """
+        controls, queries = self._take()
+        if not controls and not queries:
+            return
+        replies = self._publicDroneControl._callBatch(controls, [(command, body) for command, body, _, _ in queries])  # All replies are done
+        self._resolve(replies, queries)
+
+    def cancel(self) -> None:
+        """
+        Drop all the controls and queries added since the last flush without sending them. The Futures of the queries are cancelled,
+        so waiting on them raises CancelledError instead of blocking forever. Called when the with block raises
+        :return: None
+        """
+        _, queries = self._take()
+        for _, _, _, future in queries:
+            future.cancel()
+
+    def _take(self) -> tuple[dict, list]:
+        """
+        :return: controls and queries added since the last flush, removed from the batch
+        """
+        controls, queries = self._controls, self._queries
+        self._controls, self._queries = {}, []
+        return controls, queries
+
+    @staticmethod
+    def _resolve(replies: list[Future], queries: list) -> None:
+        for reply, (_, _, convert, future) in zip(replies, queries):
+            try:
+                future.set_result(convert(reply.result()))
+            except Exception as e:  # TimeoutError if the reply was lost, or error parsing the reply
+                future.set_exception(e)
+
+
+class AsyncCommandBatch(CommandBatch):
+    """
+    CommandBatch of an AsyncDroneControl, flushed without blocking the event loop:
+
+        async with asyncDroneControl.batch() as batch:
+            batch.moveDroneForward(1)
+            state = batch.getDroneState()
+        print(state.result().location)
+    """
+
+    def __enter__(self):
+        raise Exception("The batch of an AsyncDroneControl is used with async with")
+
+    async def __aenter__(self) -> 'AsyncCommandBatch':
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is None:
+            await self.flush()
+        else:
+            self.cancel()
+
+    async def flush(self) -> None:
+        """
+        Coroutine version of CommandBatch.flush
+        :return: None
+        """
+        controls, queries = self._take()
+        if not controls and not queries:
+            return
+        replies = await self._publicDroneControl._callBatch(controls, [(command, body) for command, body, _, _ in queries])  # All replies are done
+        self._resolve(replies, queries)
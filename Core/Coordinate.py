@@ -1,9 +1,56 @@
+import math
+
+DEFAULT_TOLERANCE = 1e-6  # UE units, for isClose
+
 
 class Coordinate:
+    """
+    Immutable location (x, y, z) in UE units. Coordinates are hashable, so they can be put in sets or used as dict keys.
+    Equality is exact, use isClose to compare locations computed in different ways (e.g. received from the UE engine)
+    """
+    __slots__ = ('x', 'y', 'z')
+
     def __init__(self, x: float, y: float, z: float):
-        self.x = x
-        self.y = y
-        self.z = z
+        object.__setattr__(self, 'x', x)
+        object.__setattr__(self, 'y', y)
+        object.__setattr__(self, 'z', z)
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"Coordinate is immutable, cannot set {name}")
+
+    def __delattr__(self, name):
+        raise AttributeError(f"Coordinate is immutable, cannot delete {name}")
+
+    def __reduce__(self):
+        return Coordinate, (self.x, self.y, self.z)
 
     def __eq__(self, other):
+        if not isinstance(other, Coordinate):
+            return NotImplemented
         return self.x == other.x and self.y == other.y and self.z == other.z
+
+    def __hash__(self):
+        return hash((self.x, self.y, self.z))
+
+    def __iter__(self):
+        yield self.x
+        yield self.y
+        yield self.z
+
+    def __repr__(self):
+        return f"Coordinate({self.x}, {self.y}, {self.z})"
+
+    def distanceTo(self, other: 'Coordinate') -> float:
+        """
+        :param other: another location
+        :return: euclidean distance between the two locations, in UE units
+        """
+        return math.dist((self.x, self.y, self.z), (other.x, other.y, other.z))
+
+    def isClose(self, other: 'Coordinate', tolerance: float = DEFAULT_TOLERANCE) -> bool:
+        """
+        :param other: another location
+        :param tolerance: maximal difference of each of x, y and z, in UE units
+        :return: True if both locations are the same up to the tolerance
+        """
+        return abs(self.x - other.x) <= tolerance and abs(self.y - other.y) <= tolerance and abs(self.z - other.z) <= tolerance
@@ -0,0 +1,91 @@
+import numpy as np
+
+from Core.Coordinate import Coordinate
+
+
+class CoordinateArray:
+    """
+    Sequence of locations stored as one (n, 3) float64 numpy array (x, y, z per row), instead of a Coordinate object per location, for long lists
+    such as the spawned actors, the waypoints of a path or a history of drone locations. Indexing gives Coordinate objects (or a CoordinateArray
+    for slices and masks), so it can replace a list of Coordinate in read-only code, while bulk computations use the array directly.
+    """
+
+    def __init__(self, array: np.ndarray = None):
+        """
+        :param array: (n, 3) array of x, y, z in UE units, copied to float64. Empty if None
+        """
+        array = np.zeros((0, 3)) if array is None else np.array(array, dtype=np.float64)
+        if array.size == 0:
+            array = array.reshape(0, 3)
+        if array.ndim != 2 or array.shape[1] != 3:
+            raise Exception(f"A CoordinateArray needs an (n, 3) array, got shape {array.shape}")
+        array.flags.writeable = False  # Like Coordinate, the locations are immutable
+        self.array = array
+
+    @classmethod
+    def fromCoordinates(cls, coordinates) -> 'CoordinateArray':
+        """
+        :param coordinates: iterable of Coordinate
+        :return: array of the locations, in the same order
+        """
+        return cls([(c.x, c.y, c.z) for c in coordinates])
+
+    @property
+    def x(self) -> np.ndarray:
+        return self.array[:, 0]
+
+    @property
+    def y(self) -> np.ndarray:
+        return self.array[:, 1]
+
+    @property
+    def z(self) -> np.ndarray:
+        return self.array[:, 2]
+
+    def toList(self) -> list[Coordinate]:
+        return [Coordinate(x, y, z) for x, y, z in self.array.tolist()]
+
+    def distancesTo(self, coordinate: Coordinate) -> np.ndarray:
+        """
+        :param coordinate: location to measure from
+        :return: (n,) euclidean distances from the location to every location of the array, in UE units
+        """
+        return np.linalg.norm(self.array - (coordinate.x, coordinate.y, coordinate.z), axis=1)
+
+    def nearest(self, coordinate: Coordinate) -> tuple[int, float] or None:
+        """
+        :param coordinate: location to measure from
+        :return: index of the nearest location of the array and its distance, or None if the array is empty
+        """
+        if len(self.array) == 0:
+            return None
+        distances = self.distancesTo(coordinate)
+        index = int(np.argmin(distances))
+        return index, float(distances[index])
+
+    def pathLength(self) -> float:
+        """
+        :return: length of the path going through all the locations in order, in UE units
+        """
+        return float(np.linalg.norm(np.diff(self.array, axis=0), axis=1).sum())
+
+    def __len__(self):
+        return len(self.array)
+
+    def __getitem__(self, index):
+        if isinstance(index, (int, np.integer)):
+            x, y, z = self.array[index].tolist()  # Python floats, not numpy scalars
+            return Coordinate(x, y, z)
+        return CoordinateArray(self.array[index])  # Slice or mask
+
+    def __iter__(self):
+        for x, y, z in self.array.tolist():
+            yield Coordinate(x, y, z)
+
+    def __eq__(self, other):
+        if not isinstance(other, CoordinateArray):
+            return NotImplemented
+        return np.array_equal(self.array, other.array)
+
+    def __repr__(self):
+        return f"CoordinateArray({len(self.array)} locations)"
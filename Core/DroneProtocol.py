@@ -0,0 +1,429 @@
+import json
+import re
+
+from Core.BinaryCodec import decodePushedStates, decodeReplies, isBinary
+from Core.Coordinate import Coordinate
+from Core.DroneState import DroneState
+from Core.Target import Target
+
+# Messages exchanged with the UE engine, and their retransmission. Shared by the threaded (PublicDroneControl) and the asyncio (AsyncDroneControl) clients.
+
+# Names of the commands the UE engine replies to. Replies are in the form '<command>:<payload>' or '<command>#<requestId>:<payload>'
+REPLY_COMMANDS = ('getDroneState', 'getDistanceToCameraDirection', 'getCameraTarget', 'SpawnXActors', 'GetTargetsOfPoints', 'GetTargetOfPoint',
+                  'DestroyActors', 'turnTowards', 'goto', 'turnCameraXDeg', 'hello')
+_REPLY_PATTERN = re.compile(r'(' + '|'.join(REPLY_COMMANDS) + r')(?:#(\d+))?:(.*)', re.DOTALL)
+
+# Drone state pushed by the UE engine to the telemetry port, in the form 'droneStateStream#<sequence>:<getDroneState payload>',
+# or 'droneStateStream#<sequence>@<droneId>:<getDroneState payload>' for the drones other than the default one
+_TELEMETRY_PATTERN = re.compile(r'droneStateStream#(\d+)(?:@(\d+))?:(.*)', re.DOTALL)
+
+# Id of the drone of the map. Messages for other drones carry a top-level "droneId", see PublicDroneControl.createFleet.
+# Messages for the default drone do not, so they are the same as before drones had ids
+DEFAULT_DRONE_ID = 0
+
+MAX_ACTORS_TO_SPAWN = 150
+
+# Separator of the hit results in the payload of a GetTargetsOfPoints reply (hit results contain spaces, and replies are separated by new lines)
+HIT_RESULTS_SEPARATOR = ';'
+
+# Commands which can safely be sent again if their reply is lost (destroying an actor twice destroys it once, and hello has no side effect)
+IDEMPOTENT_COMMANDS = frozenset({'getDroneState', 'getDistanceToCameraDirection', 'getCameraTarget', 'GetTargetOfPoint', 'GetTargetsOfPoints',
+                                 'DestroyActors', 'hello'})
+
+# Default time to wait for a reply, in seconds, before the request is retransmitted (idempotent commands) or given up on.
+# Blocking controls only reply once the movement is complete, so they get a much longer timeout
+DEFAULT_TIMEOUTS = {
+    'getDroneState': 0.5,
+    'getDistanceToCameraDirection': 0.5,
+    'getCameraTarget': 0.5,
+    'GetTargetOfPoint': 0.5,
+    'GetTargetsOfPoints': 0.5,
+    'DestroyActors': 0.5,
+    'SpawnXActors': 10,
+    'turnTowards': 60,
+    'turnCameraXDeg': 60,
+    'goto': 600,
+    'hello': 0.5,
+}
+DEFAULT_MAX_RETRIES = 3
+
+
+def parseReply(message: str) -> tuple[str, int or None, str] or None:
+    """
+    This function is used to split a reply received from the UE engine into its parts
+    :param message: The reply as a string
+    :return: tuple of (command, request id or None if the reply carries no id, payload) or None if the reply is not recognized
+    """
+    match = _REPLY_PATTERN.search(message)
+    if match is None:
+        return None
+    command, requestId, payload = match.groups()
+    return command, (int(requestId) if requestId is not None else None), payload
+
+
+def parseReplies(message: str) -> list[tuple[str, int or None, str]]:
+    """
+    This function is used to split a datagram received from the UE engine into its replies.
+    The replies to the queries of a batch may be sent in one datagram, one reply per line
+    :param message: The datagram as a string
+    :return: list of (command, request id or None, payload) of the recognized replies
+    """
+    replies = (parseReply(line) for line in message.split('\n'))
+    return [reply for reply in replies if reply is not None]
+
+
+def parseTelemetry(message: str) -> tuple[int, int, str] or None:
+    """
+    This function is used to split a drone state pushed by the UE engine into its parts
+    :param message: The pushed message as a string
+    :return: tuple of (drone id, sequence number, payload) or None if the message is not recognized
+    """
+    match = _TELEMETRY_PATTERN.search(message)
+    if match is None:
+        return None
+    sequence, droneId, payload = match.groups()
+    return (int(droneId) if droneId is not None else DEFAULT_DRONE_ID), int(sequence), payload
+
+
+def parseHitResult(hitResultMsg: str) -> Target or None:
+    """
+    This function is used to parse the hit result message received from the UE engine into a Target object
+    :param hitResultMsg: message received from the UE engine as a result of a hit test as a string
+    :return: Target object containing the display name, class name, and location of the hit target or None if no target is detected
+    """
+    if hitResultMsg == 'None':
+        return None
+
+    parts = hitResultMsg.split()  # Splitting the message by spaces to get each part
+
+    # Extract DisplayName and ClassName directly
+    display_name = parts[0].split('=')[1]
+    class_name = parts[1].split('=')[1]
+
+    # Parse the X, Y, Z values from the rest of the string
+    x = float(parts[2].split('=')[2])
+    y = float(parts[3].split('=')[1])
+    z = float(parts[4].split('=')[1])
+
+    return Target(display_name, class_name, Coordinate(x, y, z))
+
+
+def parseHitResults(payload: str) -> list[Target or None]:
+    """
+    This function is used to parse the reply of a GetTargetsOfPoints request: the hit results of all the points, separated by HIT_RESULTS_SEPARATOR
+    :param payload: payload of the reply as a string
+    :return: list of Target (or None if nothing was hit), in the order of the points of the request
+    """
+    if payload == '':
+        return []
+    return [parseHitResult(hitResult) for hitResult in payload.split(HIT_RESULTS_SEPARATOR)]
+
+
+def _validate_target_format(input_string: str) -> bool:
+    """
+    This function is used to validate the format of the target string received from the UE engine
+    :param input_string: The string to validate
+    :return: True if the string is in the correct format, False otherwise
+    """
+    try:
+        # Attempt to parse the JSON string
+        jsonData = json.loads(input_string)
+
+        # Check for the presence and type of each required key
+        if isinstance(jsonData.get("collisionCount"), int) and \
+                isinstance(jsonData.get("positionXVal"), float) and \
+                isinstance(jsonData.get("positionYVal"), float) and \
+                isinstance(jsonData.get("positionZVal"), float):
+            return True
+        else:
+            return False
+    except json.JSONDecodeError:
+        # If JSON decoding fails, the string is not in valid JSON format
+        return False
+
+
+def encodeJson(body: dict) -> bytes:
+    """
+    :param body: JSON body of a message to the UE engine
+    :return: the message encoded as a JSON string
+    """
+    return json.dumps(body).encode('utf-8')
+
+
+def decodeDatagram(data: bytes) -> list[tuple[str, int or None, object]]:
+    """
+    This function is used to decode a datagram received from the UE engine, whether it is JSON/text or binary encoded
+    :param data: the datagram
+    :return: list of (command, request id or None, value) of its replies. The value is already parsed (DroneState, Target, list of Coordinate...),
+             or the exception raised while parsing it
+    """
+    if isBinary(data):
+        return decodeReplies(data)
+    return [(command, requestId, parsePayload(command, payload)) for command, requestId, payload in parseReplies(data.decode('utf-8'))]
+
+
+def decodeTelemetry(data: bytes) -> list[tuple[int, int, DroneState]]:
+    """
+    This function is used to decode the drone states pushed by the UE engine, whether they are JSON/text or binary encoded
+    :param data: the datagram. A binary datagram may hold the states of several drones
+    :return: list of (drone id, sequence number, DroneState), empty if the datagram is not recognized
+    """
+    if isBinary(data):
+        return decodePushedStates(data)
+    telemetry = parseTelemetry(data.decode('utf-8'))
+    if telemetry is None:
+        return []
+    droneId, sequence, payload = telemetry
+    return [(droneId, sequence, parseDroneState(payload))]
+
+
+def parsePayload(command: str, payload: str):
+    """
+    :param command: command of the reply
+    :param payload: payload of the reply as a string
+    :return: the parsed payload, or the exception raised while parsing it (so it is raised to the caller waiting for the reply)
+    """
+    try:
+        if command == 'getDroneState':
+            return parseDroneState(payload)
+        if command == 'getDistanceToCameraDirection':
+            return float(payload)
+        if command in ('getCameraTarget', 'GetTargetOfPoint'):
+            return parseHitResult(payload)
+        if command == 'GetTargetsOfPoints':
+            return parseHitResults(payload)
+        if command == 'DestroyActors':
+            return [int(index) for index in payload.split(',')] if payload else []
+        if command == 'SpawnXActors':
+            return parseSpawnedActors(payload)
+        if command == 'hello':
+            return int(payload)
+        return payload
+    except Exception as e:
+        return e
+
+
+#  Retransmission ------------------------------------------------------------
+
+def requestAttempts(command: str, requestId: int, requestTracker, linkStats, timeouts: dict, maxRetries: int):
+    """
+    Retransmission policy of a request, shared by DroneTransport.call and AsyncDroneTransport.call: idempotent commands are sent again (with the same
+    request id) while their reply is not received, up to maxRetries times, and the timeout doubles after every attempt. Other commands are sent once.
+    The caller sends the request and waits for its reply once per attempt, and stops iterating as soon as the reply is received:
+
+        for attempt, timeout in requestAttempts(command, requestId, requestTracker, linkStats, timeouts, maxRetries):
+            send(msg)
+            ...  # Wait up to timeout seconds for the reply, and return it if received
+
+    :param command: name of the command the reply will be prefixed with
+    :param requestId: id of the request, registered in requestTracker
+    :param requestTracker: RequestTracker the request is registered in
+    :param linkStats: LinkStats counting the sent, retransmitted and lost requests
+    :param timeouts: time to wait for a reply per command name, in seconds (None waits forever)
+    :param maxRetries: number of retransmissions of idempotent commands
+    :return: generator of (attempt number, time to wait for the reply in seconds or None)
+    :raises TimeoutError: when the reply of the last attempt was not received in time. Late replies will be dropped
+    """
+    timeout = timeouts.get(command)
+    attempts = 1 + (maxRetries if command in IDEMPOTENT_COMMANDS else 0)
+    for attempt in range(attempts):
+        if attempt == 0:
+            linkStats.recordSent()
+        else:
+            linkStats.recordRetry()
+        yield attempt, (timeout * 2 ** attempt if timeout is not None else None)
+
+    requestTracker.fail(requestId, TimeoutError(command))  # Late replies will be dropped
+    linkStats.recordLost(command)
+    raise TimeoutError(f"No reply from UE engine to {command} after {attempts} attempt(s)")
+
+
+def batchAttempts(requests: list, requestTracker, linkStats, timeouts: dict, maxRetries: int):
+    """
+    Retransmission policy of the queries of a batch, shared by DroneTransport.callBatch and AsyncDroneTransport.callBatch: the queries whose reply was
+    lost are sent again together, following the rules of requestAttempts. The caller sends the batch and waits for the replies once per attempt
+    :param requests: list of (command, body, request id, Future) of the queries, registered in requestTracker
+    :param requestTracker: RequestTracker the queries are registered in
+    :param linkStats: LinkStats counting the sent, retransmitted and lost requests
+    :param timeouts: time to wait for a reply per command name, in seconds (None waits forever)
+    :param maxRetries: number of retransmissions of idempotent queries
+    :return: generator of (attempt number, bodies of the queries to send tagged with their requestId, Futures of their replies, time to wait for the
+             replies in seconds or None). The first attempt is always yielded, even without queries, so the controls are sent.
+             Queries without a reply after their last attempt hold a TimeoutError
+    """
+    pending = list(requests)
+    for attempt in range(1 + maxRetries):
+        for _ in pending:
+            if attempt == 0:
+                linkStats.recordSent()
+            else:
+                linkStats.recordRetry()
+        waits = [timeouts.get(command) for command, _, _, _ in pending]
+        timeout = None if None in waits else max(waits, default=0) * 2 ** attempt
+        yield attempt, [{**body, "requestId": requestId} for _, body, requestId, _ in pending], [future for _, _, _, future in pending], timeout
+        if not pending:  # Controls only
+            return
+
+        for _, _, _, future in pending:
+            if future.done():
+                linkStats.recordReply(None)  # Replies of a batch are waited for together, so their RTT is not sampled
+        pending = [entry for entry in pending if not entry[3].done()]
+
+        lost = [entry for entry in pending if entry[0] not in IDEMPOTENT_COMMANDS or attempt == maxRetries]
+        for command, _, requestId, _ in lost:
+            requestTracker.fail(requestId, TimeoutError(f"No reply from UE engine to {command} after {attempt + 1} attempt(s)"))
+            linkStats.recordLost(command)
+        pending = [entry for entry in pending if entry not in lost]
+        if not pending:
+            return
+
+#  End Retransmission --------------------------------------------------------
+
+#  Request bodies ------------------------------------------------------------
+
+def withDroneId(body: dict, droneId: int) -> dict:
+    """
+    :param body: JSON body of a message, or of a batch (the drone id of a batch applies to all its controls and queries)
+    :param droneId: id of the drone the message is for
+    :return: the body, tagged with the drone id unless it is the default drone
+    """
+    if droneId == DEFAULT_DRONE_ID:
+        return body
+    return {**body, "droneId": droneId}
+
+
+def controlsBody(controls: dict) -> dict:
+    """
+    :param controls: control axes and their amounts, e.g. {"upAmount": 1}
+    :return: JSON body of a control message
+    """
+    return {"controls": controls}
+
+
+def batchBody(controls: dict, queries: list[dict]) -> dict:
+    """
+    :param controls: merged control axes and their amounts, may be empty
+    :param queries: bodies of the queries, each tagged with its requestId
+    :return: JSON body of a batch message. A batch without queries is a regular control message
+    """
+    body = {}
+    if controls:
+        body["controls"] = controls
+    if queries:
+        body["queries"] = queries
+    return body
+
+
+def turnTowardsBody(x: float, y: float, z: float, speed: float) -> dict:
+    return {"controls": {"turnTowards": {"turnTowardsXVal": x, "turnTowardsYVal": y, "turnTowardsZVal": z, "turnTowardsSpeed": speed}}}
+
+
+def gotoBody(x: float, y: float, z: float, speed: float, turnWithMove: bool) -> dict:
+    return {"controls": {"goto": {"gotoXVal": x, "gotoYVal": y, "gotoZVal": z, "gotoSpeed": speed, "turnWithMove": bool(turnWithMove)}}}
+
+
+def turnCameraBody(degrees: float, speedMultiplier: float) -> dict:
+    """
+    :param degrees: number of degrees to turn, clamped to the range of -89 to 89
+    :param speedMultiplier: speed at which to turn (multiplier of default speed)
+    :return: JSON body of a turnCameraXDeg message
+    """
+    degrees = max(-89, min(89, degrees))
+    return {"controls": {"turnCameraXDeg": {"degrees": degrees, "speedMultiplier": speedMultiplier}}}
+
+
+def getTargetOfPointBody(coordinateX: float, coordinateY: float) -> dict:
+    return {"GetTargetOfPoint": {"xVal": float(coordinateX), "yVal": float(coordinateY)}}
+
+
+def getTargetsOfPointsBody(points) -> dict:
+    """
+    :param points: list of (normalized X, normalized Y) coordinates on screen
+    :return: JSON body of a GetTargetsOfPoints message, hit testing all the points at once
+    """
+    return {"GetTargetsOfPoints": [{"xVal": float(x), "yVal": float(y)} for x, y in points]}
+
+
+def spawnActorsBody(numOfActorsToSpawn: int) -> dict:
+    return {"SpawnXActors": min(numOfActorsToSpawn, MAX_ACTORS_TO_SPAWN)}
+
+
+def destroyActorBody(index: int) -> dict:
+    return {"DestroyActor": index}
+
+
+def destroyActorsBody(indices: list[int]) -> dict:
+    """
+    :param indices: indices of the spawned actors to destroy
+    :return: JSON body of a DestroyActors message, destroying all the actors at once. The UE engine replies with the indices of the actors destroyed,
+             separated by commas
+    """
+    return {"DestroyActors": [int(index) for index in indices]}
+
+
+def subscribeDroneStateBody(rateHz: float, port: int) -> dict:
+    """
+    :param rateHz: number of drone states the UE engine should push per second. 0 stops the stream
+    :param port: port the drone states should be pushed to
+    :return: JSON body of a subscribeDroneState message
+    """
+    return {"subscribeDroneState": {"rateHz": rateHz, "port": port}}
+
+
+def helloBody(versions: tuple) -> dict:
+    """
+    :param versions: binary protocol versions supported by the client
+    :return: JSON body of the hello message starting the binary protocol negotiation
+    """
+    return {"hello": list(versions)}
+
+
+def droneGradeBody(grade: float) -> dict:
+    return {"droneGrade": grade}
+
+
+def daytimeChangeBody(addDegrees: float) -> dict:
+    return {"DaytimeChangeRequested": addDegrees}
+
+
+#  End Request bodies --------------------------------------------------------
+
+#  Reply payloads ------------------------------------------------------------
+
+def parseDroneState(payload: str) -> DroneState:
+    """
+    :param payload: reply payload of getDroneState, a JSON object with the position and collision count of the drone
+    :return: DroneState
+    """
+    json_message = json.loads(payload)
+    return DroneState(
+        Coordinate(json_message["positionXVal"], json_message["positionYVal"], json_message["positionZVal"]),
+        json_message["collisionCount"]
+    )
+
+
+def parseSpawnedActors(payload: str) -> list[Coordinate]:
+    """
+    :param payload: reply payload of SpawnXActors, a JSON object with the keys '<i>-XLoc', '<i>-YLoc' and '<i>-ZLoc' for every actor
+    :return: list of the locations of the spawned actors, ordered by their index
+    """
+    actorLocationsStringJson = json.loads(payload)
+    coordinates = []
+    for i in range(len(actorLocationsStringJson) // 3):
+        x = actorLocationsStringJson[f"{i}-XLoc"]
+        y = actorLocationsStringJson[f"{i}-YLoc"]
+        z = actorLocationsStringJson[f"{i}-ZLoc"]
+        coordinates.append(Coordinate(x, y, z))
+    return coordinates
+
+
+def checkDone(payload: str, errorMessage: str) -> None:
+    """
+    :param payload: reply payload of a blocking control (goto, turnTowards, turnCameraXDeg)
+    :param errorMessage: message of the exception raised if the control failed
+    :return: None if the UE engine replied 'Done'
+    """
+    if payload != 'Done':
+        raise Exception(f"{errorMessage}: {payload}")
+
+#  End Reply payloads --------------------------------------------------------
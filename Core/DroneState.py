@@ -1,7 +1,40 @@
-from Core.Coordinate import Coordinate
+from Core.Coordinate import DEFAULT_TOLERANCE, Coordinate
 
 
 class DroneState:
+    """
+    Immutable state of the drone: its location and the number of collisions since the start of the simulation
+    """
+    __slots__ = ('location', 'collisionCount')
+
     def __init__(self, location: Coordinate, collisionCount: int):
-        self.location = location
-        self.collisionCount = collisionCount
+        object.__setattr__(self, 'location', location)
+        object.__setattr__(self, 'collisionCount', collisionCount)
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"DroneState is immutable, cannot set {name}")
+
+    def __delattr__(self, name):
+        raise AttributeError(f"DroneState is immutable, cannot delete {name}")
+
+    def __reduce__(self):
+        return DroneState, (self.location, self.collisionCount)
+
+    def __eq__(self, other):
+        if not isinstance(other, DroneState):
+            return NotImplemented
+        return self.location == other.location and self.collisionCount == other.collisionCount
+
+    def __hash__(self):
+        return hash((self.location, self.collisionCount))
+
+    def __repr__(self):
+        return f"DroneState({self.location!r}, {self.collisionCount})"
+
+    def isClose(self, other: 'DroneState', tolerance: float = DEFAULT_TOLERANCE) -> bool:
+        """
+        :param other: another state
+        :param tolerance: maximal difference of each coordinate of the locations, in UE units
+        :return: True if both states have the same collision count, and the same location up to the tolerance
+        """
+        return self.collisionCount == other.collisionCount and self.location.isClose(other.location, tolerance)
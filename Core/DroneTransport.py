@@ -0,0 +1,197 @@
+import concurrent.futures
+import logging
+import socket
+import threading
+import time
+from concurrent.futures import Future, wait
+
+from Core.BinaryCodec import PROTOCOL_VERSION, SUPPORTED_VERSIONS, encodeBinary
+from Core.DroneProtocol import (DEFAULT_DRONE_ID, DEFAULT_MAX_RETRIES, DEFAULT_TIMEOUTS, batchAttempts, batchBody, decodeDatagram, decodeTelemetry,
+                                encodeJson, helloBody, requestAttempts, withDroneId)
+from Core.LatestValueCache import LatestValueCache
+from Core.LinkStats import LinkStats
+from Core.RequestTracker import RequestTracker
+
+_logger = logging.getLogger(__name__)
+
+
+class DroneTransport:
+    """
+    Class owning the UDP sockets to the UE engine, shared by the PublicDroneControl of every drone (or RL episode) driven by the process.
+    All the drones send through one socket and receive their replies on one socket: every request gets a request id unique to the transport,
+    so replies are routed to the request (and so to the drone) that sent it, whatever the drone. Pushed drone states carry the id of their drone,
+    and are routed to the cache and listeners of that drone.
+    """
+
+    def __init__(self, ip, port, timeouts: dict = None, maxRetries: int = DEFAULT_MAX_RETRIES):
+        """
+        :param ip: IP address of the UE engine
+        :param port: port number of the UE engine receiver socket (+1 is used for the sender socket)
+        :param timeouts: time to wait for a reply per command name, in seconds (None waits forever). Overrides the defaults of DEFAULT_TIMEOUTS
+        :param maxRetries: number of retransmissions of idempotent queries whose reply was not received in time.
+                           The timeout doubles after every retransmission
+        """
+        self.udp_socketRecv = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.udp_socketRecv.bind((ip, port))
+        self.udp_socketSend = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.ip_portSend = (ip, port + 1)
+
+        self._requestTracker = RequestTracker()  # Correlates replies with in-flight requests by their request id
+        self._timeouts = {**DEFAULT_TIMEOUTS, **(timeouts or {})}
+        self._maxRetries = maxRetries
+        self._encode = encodeJson  # Encoding of the messages to the UE engine, see negotiateBinaryProtocol
+        self.linkStats = LinkStats()  # Counters of sent, lost and retransmitted requests and round trip times, of all the drones
+
+        self.listener_thread = threading.Thread(target=self._listen)
+        self.listener_thread.daemon = True
+        self.listener_thread.start()
+
+        # Drone states pushed by the UE engine, see PublicDroneControl.subscribeDroneState. The socket and its listener are only created once subscribed
+        self.ip = ip
+        self.telemetryPort = port + 2
+        self.udp_socketTelemetry = None
+        self.telemetry_thread = None
+        self._lock = threading.Lock()  # To ensure thread-safe creation of the telemetry socket and of the per drone caches
+        self._droneStateCaches: dict[int, LatestValueCache] = {}
+        self._droneStateListeners: dict[int, list] = {}  # Drone id -> functions called with every new pushed DroneState of the drone
+
+    def _listen(self):
+        while True:
+            data, _ = self.udp_socketRecv.recvfrom(65535)
+            try:
+                replies = decodeDatagram(data)  # A batch may be answered with several replies in one datagram
+            except Exception as e:  # Malformed datagram, dropped so the listener keeps running
+                _logger.warning(f"Dropped a malformed datagram from the UE engine: {e!r}")
+                continue
+            for reply in replies:
+                if not self._requestTracker.resolve(*reply):
+                    self.linkStats.recordStale()  # Stale and duplicate replies are dropped by the tracker
+
+    def _listenTelemetry(self):
+        while True:
+            data, _ = self.udp_socketTelemetry.recvfrom(65535)
+            try:
+                states = decodeTelemetry(data)  # One datagram may hold the states of several drones
+            except Exception as e:  # Malformed datagram, dropped so the telemetry of the other datagrams keeps flowing
+                _logger.warning(f"Dropped a malformed drone state from the UE engine: {e!r}")
+                continue
+            for droneId, sequence, state in states:
+                if self.droneStateCache(droneId).publish(state, sequence):  # Only written by this thread
+                    for listener in self._droneStateListeners.get(droneId, ()):
+                        try:
+                            listener(state)
+                        except Exception:  # A failing listener must not stop the telemetry of the other listeners and drones
+                            _logger.exception(f"Drone state listener {listener!r} of drone {droneId} failed")
+
+    #  Telemetry -----------------------------------------------------------------
+
+    def startTelemetry(self, port: int = None) -> int:
+        """
+        Open the socket receiving the pushed drone states, if not already open
+        :param port: port to receive the drone states on (default is the port of the receiver socket + 2). Ignored if already open
+        :return: port the drone states are received on
+        """
+        with self._lock:
+            if self.udp_socketTelemetry is None:
+                self.telemetryPort = port or self.telemetryPort
+                self.udp_socketTelemetry = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+                self.udp_socketTelemetry.bind((self.ip, self.telemetryPort))
+                self.telemetry_thread = threading.Thread(target=self._listenTelemetry)
+                self.telemetry_thread.daemon = True
+                self.telemetry_thread.start()
+            return self.telemetryPort
+
+    def droneStateCache(self, droneId: int = DEFAULT_DRONE_ID) -> LatestValueCache:
+        """
+        :param droneId: id of the drone
+        :return: cache of the newest drone state pushed for the drone
+        """
+        cache = self._droneStateCaches.get(droneId)
+        if cache is None:
+            with self._lock:
+                cache = self._droneStateCaches.setdefault(droneId, LatestValueCache())
+        return cache
+
+    def addDroneStateListener(self, droneId: int, listener) -> None:
+        """
+        :param droneId: id of the drone
+        :param listener: function called with every new DroneState pushed for the drone, from the telemetry thread
+        :return: None
+        """
+        with self._lock:
+            # Replaced, not modified, so the telemetry thread iterates without a lock
+            self._droneStateListeners = {**self._droneStateListeners, droneId: self._droneStateListeners.get(droneId, []) + [listener]}
+
+    def removeDroneStateListener(self, droneId: int, listener) -> None:
+        with self._lock:
+            listeners = [registered for registered in self._droneStateListeners.get(droneId, []) if registered is not listener]
+            self._droneStateListeners = {**self._droneStateListeners, droneId: listeners}
+
+    #  End Telemetry -------------------------------------------------------------
+
+    #  Requests ------------------------------------------------------------------
+
+    def send(self, body: dict, droneId: int = DEFAULT_DRONE_ID) -> None:
+        """
+        This function is used to send a message to the UE engine
+        :param body: JSON body of the message to send to UE engine, encoded as JSON or binary (see negotiateBinaryProtocol)
+        :param droneId: id of the drone the message is for
+        :return: None
+        """
+        self.udp_socketSend.sendto(self._encode(withDroneId(body, droneId)), self.ip_portSend)  # Send the message to the UE engine
+
+    def call(self, command: str, body: dict, droneId: int = DEFAULT_DRONE_ID):
+        """
+        This function is used to send a request and block until its reply is received.
+        If no reply is received within the timeout of the command, idempotent queries are retransmitted (with the same request id) with exponential backoff.
+        :param command: name of the command the reply will be prefixed with
+        :param body: JSON body of the request
+        :param droneId: id of the drone the request is for
+        :return: the parsed reply payload
+        :raises TimeoutError: if no reply was received after all attempts
+        """
+        requestId, future = self._requestTracker.register(command)
+        msg = {**body, "requestId": requestId}
+        for attempt, timeout in requestAttempts(command, requestId, self._requestTracker, self.linkStats, self._timeouts, self._maxRetries):
+            sentTime = time.monotonic()
+            self.send(msg, droneId)
+            try:
+                payload = future.result(timeout)
+            except concurrent.futures.TimeoutError:  # Not the builtin TimeoutError before Python 3.11
+                continue
+            self.linkStats.recordReply(time.monotonic() - sentTime if attempt == 0 else None)  # RTT of retransmitted requests is ambiguous
+            return payload
+
+    def callBatch(self, controls: dict, queries: list[tuple[str, dict]], droneId: int = DEFAULT_DRONE_ID) -> list[Future]:
+        """
+        This function is used to send controls and several queries in one message, and block until all the replies are received.
+        Queries whose reply was lost are retransmitted together (controls are only sent once), following the same rules as call
+        :param controls: merged control axes and their amounts
+        :param queries: list of (command, body) of the queries
+        :param droneId: id of the drone the controls and queries are for
+        :return: Futures holding the parsed reply payloads, aligned with queries. Queries without a reply hold a TimeoutError
+        """
+        requests = [(command, body, *self._requestTracker.register(command)) for command, body in queries]
+        for attempt, queryBodies, replies, timeout in batchAttempts(requests, self._requestTracker, self.linkStats, self._timeouts, self._maxRetries):
+            self.send(batchBody(controls if attempt == 0 else {}, queryBodies), droneId)  # Controls are only sent once
+            wait(replies, timeout)
+        return [future for _, _, _, future in requests]
+
+    def negotiateBinaryProtocol(self) -> bool:
+        """
+        This function is used to switch the messages to the UE engine to the compact binary encoding of Core.BinaryCodec, if the UE engine supports it.
+        A binary 'hello' listing the supported versions is sent, and the UE engine replies with the version it chose.
+        If there is no reply (the UE engine only understands JSON), JSON is kept. Should be called before other threads start sending
+        :return: True if the binary encoding is used from now on, False otherwise
+        """
+        self._encode = encodeBinary
+        try:
+            version = self.call('hello', helloBody(SUPPORTED_VERSIONS))
+        except (TimeoutError, concurrent.futures.TimeoutError):
+            version = None
+        if version != PROTOCOL_VERSION:
+            self._encode = encodeJson
+            return False
+        return True
+
+    #  End Requests --------------------------------------------------------------
@@ -0,0 +1,63 @@
+import time
+from typing import Any, NamedTuple
+
+
+class Sample(NamedTuple):
+    value: Any
+    sequence: int  # Sequence number given by the producer
+    timestamp: float  # time.monotonic() at which the sample was published
+
+
+# A sample whose sequence number is this much lower than the current one is not a reordered datagram: the producer restarted (UE engine
+# restarted, its sequence numbers starting again from 0) or its sequence numbers wrapped around
+DEFAULT_RESTART_GAP = 1000
+# A sample older than the current one is not a reordered datagram either if the current one was published this many seconds ago, whatever the gap
+DEFAULT_RESTART_AGE = 1.0
+
+
+class LatestValueCache:
+    """
+    Cache holding only the newest sample of a stream (e.g. the drone state pushed by the UE engine).
+    There must be a single writer thread. Readers never block: the newest sample is held in one attribute which is replaced as a whole,
+    and replacing an attribute is atomic in Python, so readers always see a complete sample without taking a lock.
+    """
+
+    def __init__(self, restartGap: int = DEFAULT_RESTART_GAP, restartAge: float = DEFAULT_RESTART_AGE):
+        """
+        :param restartGap: see DEFAULT_RESTART_GAP
+        :param restartAge: see DEFAULT_RESTART_AGE
+        """
+        self._latest: Sample or None = None
+        self.restartGap = restartGap
+        self.restartAge = restartAge
+        self.outOfOrder = 0  # Number of samples dropped because a newer one was already published
+        self.restarts = 0  # Number of times the sequence numbers started again from a lower value
+
+    def publish(self, value, sequence: int) -> bool:
+        """
+        Publish a new sample. Must only be called from the writer thread
+        :param value: value of the sample
+        :param sequence: sequence number of the sample. Samples older than the current one (reordered datagrams) are dropped,
+                         unless the producer restarted its sequence numbers (see DEFAULT_RESTART_GAP and DEFAULT_RESTART_AGE)
+        :return: True if the sample was published, False if it was dropped
+        """
+        latest = self._latest
+        now = time.monotonic()
+        if latest is not None and sequence <= latest.sequence:
+            if latest.sequence - sequence < self.restartGap and now - latest.timestamp < self.restartAge:
+                self.outOfOrder += 1
+                return False
+            self.restarts += 1
+        self._latest = Sample(value, sequence, now)
+        return True
+
+    def read(self, maxAge: float = None) -> Sample or None:
+        """
+        Read the newest sample in O(1), from any thread
+        :param maxAge: if given, samples older than this number of seconds are ignored
+        :return: the newest Sample, or None if there is none (or it is older than maxAge)
+        """
+        latest = self._latest
+        if latest is None or (maxAge is not None and time.monotonic() - latest.timestamp > maxAge):
+            return None
+        return latest
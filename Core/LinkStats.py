@@ -0,0 +1,99 @@
+import bisect
+import threading
+
+# Upper bounds (in milliseconds) of the buckets of the round trip time histogram. The last bucket holds everything above the last bound
+RTT_BUCKETS_MS = (0.5, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+
+class LinkStats:
+    """
+    Class to count what happens to the requests sent to the UE engine over UDP, to monitor the quality of the link:
+    requests sent, replies received, retransmissions, requests lost (no reply after all attempts), stale or duplicate replies dropped,
+    and a histogram of the round trip times.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()  # To ensure thread-safe operations
+        self.sent = 0
+        self.received = 0
+        self.retries = 0
+        self.lost = 0
+        self.stale = 0
+        self.lostByCommand: dict[str, int] = {}
+        self.rttHistogram = [0] * (len(RTT_BUCKETS_MS) + 1)
+        self._rttSum = 0.0
+        self._rttCount = 0
+
+    def recordSent(self) -> None:
+        with self._lock:
+            self.sent += 1
+
+    def recordRetry(self) -> None:
+        with self._lock:
+            self.sent += 1
+            self.retries += 1
+
+    def recordReply(self, rtt: float or None) -> None:
+        """
+        :param rtt: round trip time in seconds, or None if the request was retransmitted (the reply cannot be matched to one transmission)
+        :return: None
+        """
+        with self._lock:
+            self.received += 1
+            if rtt is not None:
+                self.rttHistogram[bisect.bisect_left(RTT_BUCKETS_MS, rtt * 1000)] += 1
+                self._rttSum += rtt
+                self._rttCount += 1
+
+    def recordLost(self, command: str) -> None:
+        with self._lock:
+            self.lost += 1
+            self.lostByCommand[command] = self.lostByCommand.get(command, 0) + 1
+
+    def recordStale(self) -> None:
+        with self._lock:
+            self.stale += 1
+
+    def rttPercentile(self, percentile: float) -> float or None:
+        """
+        :param percentile: percentile to estimate, between 0 and 100
+        :return: upper bound (in milliseconds) of the histogram bucket holding the percentile, inf if it is in the last bucket, or None if no RTT was recorded
+        """
+        with self._lock:
+            total = sum(self.rttHistogram)
+            if total == 0:
+                return None
+            threshold = total * percentile / 100
+            cumulative = 0
+            for bound, count in zip(RTT_BUCKETS_MS + (float('inf'),), self.rttHistogram):
+                cumulative += count
+                if cumulative >= threshold:
+                    return bound
+            return float('inf')
+
+    def snapshot(self) -> dict:
+        """
+        :return: copy of all the counters as a dictionary
+        """
+        with self._lock:
+            return {
+                "sent": self.sent,
+                "received": self.received,
+                "retries": self.retries,
+                "lost": self.lost,
+                "stale": self.stale,
+                "lostByCommand": dict(self.lostByCommand),
+                "rttMeanMs": self._rttSum / self._rttCount * 1000 if self._rttCount else None,
+                "rttHistogramMs": dict(zip([f"<={bound}" for bound in RTT_BUCKETS_MS] + [f">{RTT_BUCKETS_MS[-1]}"], self.rttHistogram)),
+            }
+
+    def summary(self) -> str:
+        """
+        :return: one line description of the link quality, for logging
+        """
+        snapshot = self.snapshot()
+        rttMean = f"{snapshot['rttMeanMs']:.2f}ms" if snapshot['rttMeanMs'] is not None else "n/a"
+        rttP99 = self.rttPercentile(99)
+        rttP99 = f"<={rttP99}ms" if rttP99 is not None else "n/a"
+        return (f"Link stats: sent={snapshot['sent']} received={snapshot['received']} retries={snapshot['retries']} lost={snapshot['lost']} "
+                f"stale={snapshot['stale']} rttMean={rttMean} rttP99={rttP99}")
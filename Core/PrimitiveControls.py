@@ -0,0 +1,96 @@
+import abc
+
+
+class PrimitiveControls(abc.ABC):
+    """
+    The primitive controls of the drone. Each control is a single axis amount sent with _sendControls,
+    which is implemented by PublicDroneControl (sent right away) and CommandBatch (merged into one message).
+    """
+
+    @abc.abstractmethod
+    def _sendControls(self, controls: dict) -> None:
+        pass
+
+    #  Primitive Controls -------------------------------------------------------
+
+    def moveDroneUp(self, speedMultiplier: float) -> None:
+        """
+        This function is used to move the drone up
+        :param speedMultiplier: speed at which to move the drone (multiplier of default speed)
+        :return: None
+        """
+        self._sendControls({"upAmount": speedMultiplier})
+
+    def moveDroneDown(self, speedMultiplier: float) -> None:
+        """
+        This function is used to move the drone down
+        :param speedMultiplier: speed at which to move the drone (multiplier of default speed)
+        :return: None
+        """
+        self._sendControls({"upAmount": -speedMultiplier})
+
+    def moveDroneForward(self, speedMultiplier: float) -> None:
+        """
+        This function is used to move the drone forward
+        :param speedMultiplier: speed at which to move the drone (multiplier of default speed)
+        :return: None
+        """
+        self._sendControls({"pitchForwardAmount": speedMultiplier})
+
+    def moveDroneBackward(self, speedMultiplier: float) -> None:
+        """
+        This function is used to move the drone backward
+        :param speedMultiplier: speed at which to move the drone (multiplier of default speed)
+        :return: None
+        """
+        self._sendControls({"pitchForwardAmount": -speedMultiplier})
+
+    def moveDroneRight(self, speedMultiplier: float) -> None:
+        """
+        This function is used to move the drone right
+        :param speedMultiplier: speed at which to move the drone (multiplier of default speed)
+        :return: None
+        """
+        self._sendControls({"rollRightAmount": speedMultiplier})
+
+    def moveDroneLeft(self, speedMultiplier: float) -> None:
+        """
+        This function is used to move the drone left
+        :param speedMultiplier: speed at which to move the drone (multiplier of default speed)
+        :return: None
+        """
+        self._sendControls({"rollRightAmount": -speedMultiplier})
+
+    def rotateDroneRight(self, speedMultiplier: float) -> None:
+        """
+        This function is used to rotate the drone right
+        :param speedMultiplier: speed at which to rotate the drone (multiplier of default speed)
+        :return: None
+        """
+        self._sendControls({"yawRightAmount": speedMultiplier})
+
+    def rotateDroneLeft(self, speedMultiplier: float) -> None:
+        """
+        This function is used to rotate the drone left
+        :param speedMultiplier: speed at which to rotate the drone (multiplier of default speed)
+        :return: None
+        """
+        self._sendControls({"yawRightAmount": -speedMultiplier})
+
+    def rotateCameraDown(self, speedMultiplier: float) -> None:
+        """
+        This function is used to rotate the camera down
+        :param speedMultiplier: speed at which to rotate the camera (multiplier of default speed)
+        :return: None
+        """
+        self._sendControls({"cameraDownAmount": speedMultiplier})
+
+    def rotateCameraUp(self, speedMultiplier: float) -> None:
+        """
+        This function is used to rotate the camera up
+        :param speedMultiplier: speed at which to rotate the camera (multiplier of default speed)
+        :return: None
+        """
+        self._sendControls({"cameraDownAmount": -speedMultiplier})
+
+    #  End Primitive Controls ---------------------------------------------------
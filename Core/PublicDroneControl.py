@@ -1,224 +1,112 @@
-import json
-import socket
-import threading
-from queue import Queue
+from concurrent.futures import Future
 
+from Core.CommandBatch import CommandBatch
+from Core.ActorIndex import ActorIndex
 from Core.Coordinate import Coordinate
+from Core.DroneProtocol import (DEFAULT_DRONE_ID, DEFAULT_MAX_RETRIES, checkDone, controlsBody, daytimeChangeBody, destroyActorBody, destroyActorsBody,
+                                droneGradeBody, getTargetOfPointBody, getTargetsOfPointsBody, gotoBody, spawnActorsBody, subscribeDroneStateBody,
+                                turnCameraBody, turnTowardsBody)
 from Core.DroneState import DroneState
+from Core.DroneTransport import DroneTransport
+from Core.PrimitiveControls import PrimitiveControls
 from Core.Target import Target
 
 
-def _extractMessageFromPrefix(prefix, message) -> str or None:
-    """
-    This function is used to extract the message part of a string after a given prefix
-    :param prefix: The prefix to search for
-    :param message: The message to extract from
-    :return: The message part of the string after the prefix or None if the prefix is not found
-    """
-    # Split the message at the prefix and get the remainder
-    parts = message.split(prefix, 1)  # The second argument '1' ensures splitting is done only once
-    if len(parts) > 1:
-        return parts[1]  # Return the part after the prefix
-    return None  # Return None if the prefix is not found
-
-
-def parseHitResult(hitResultMsg: str) -> Target or None:
-    """
-    This function is used to parse the hit result message received from the UE engine into a Target object
-    :param hitResultMsg: message received from the UE engine as a result of a hit test as a string
-    :return: Target object containing the display name, class name, and location of the hit target or None if no target is detected
-    """
-    if hitResultMsg == 'None':
-        return None
-
-    parts = hitResultMsg.split()  # Splitting the message by spaces to get each part
-
-    # Extract DisplayName and ClassName directly
-    display_name = parts[0].split('=')[1]
-    class_name = parts[1].split('=')[1]
-
-    # Parse the X, Y, Z values from the rest of the string
-    x = float(parts[2].split('=')[2])
-    y = float(parts[3].split('=')[1])
-    z = float(parts[4].split('=')[1])
-
-    return Target(display_name, class_name, Coordinate(x, y, z))
-
-
-def _validate_target_format(input_string: str) -> bool:
-    """
-    This function is used to validate the format of the target string received from the UE engine
-    :param input_string: The string to validate
-    :return: True if the string is in the correct format, False otherwise
-    """
-    try:
-        # Attempt to parse the JSON string
-        jsonData = json.loads(input_string)
-
-        # Check for the presence and type of each required key
-        if isinstance(jsonData.get("collisionCount"), int) and \
-                isinstance(jsonData.get("positionXVal"), float) and \
-                isinstance(jsonData.get("positionYVal"), float) and \
-                isinstance(jsonData.get("positionZVal"), float):
-            return True
-        else:
-            return False
-    except json.JSONDecodeError:
-        # If JSON decoding fails, the string is not in valid JSON format
-        return False
-
-
-class PublicDroneControl:
-    def __init__(self, ip, port):
+class PublicDroneControl(PrimitiveControls):
+    def __init__(self, ip, port, timeouts: dict = None, maxRetries: int = DEFAULT_MAX_RETRIES, droneId: int = DEFAULT_DRONE_ID,
+                 transport: DroneTransport = None):
         """
         This function is used to initialize the PublicDroneControl object
         :param ip: IP address of the UE engine
         :param port: port number of the UE engine receiver socket (+1 is used for the sender socket)
-        """
-        self.udp_socketRecv = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-        self.udp_socketRecv.bind((ip, port))
-        self.udp_socketSend = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-        self.ip_portSend = (ip, port + 1)
-
-        self.message_queues = {
-            'getDroneState': Queue(),
-            'getDistanceToCameraDirection': Queue(),
-            'getCameraTarget': Queue(),
-            'SpawnXActors': Queue(),
-            'GetTargetOfPoint': Queue(),
-            'turnTowards': Queue(),
-            'goto': Queue(),
-            'turnCameraXDeg': Queue()
-        }
-
-        self.listener_thread = threading.Thread(target=self._listen)
-        self.listener_thread.daemon = True
-        self.listener_thread.start()
+        :param timeouts: time to wait for a reply per command name, in seconds (None waits forever). Overrides the defaults of DEFAULT_TIMEOUTS
+        :param maxRetries: number of retransmissions of idempotent queries whose reply was not received in time.
+                           The timeout doubles after every retransmission
+        :param droneId: id of the drone controlled, 0 being the drone of the map. Other drones are created by the UE engine on their first message
+        :param transport: sockets shared with the PublicDroneControl of other drones (see createFleet). If None, the object opens its own sockets,
+                          and ip, port, timeouts and maxRetries are used to open them
+        """
+        self.droneId = droneId
+        self.transport = transport if transport is not None else DroneTransport(ip, port, timeouts, maxRetries)
+        self.linkStats = self.transport.linkStats  # Counters of sent, lost and retransmitted requests and round trip times, shared by the fleet
+        self.droneStateCache = self.transport.droneStateCache(droneId)  # Newest drone state pushed by the UE engine, see subscribeDroneState
 
         self.spawnedActors = []
+        self.actorIndex = ActorIndex()  # Spawned actors not destroyed yet, to verify the targets of hit tests
 
-    def _listen(self):
-        while True:
-            data, _ = self.udp_socketRecv.recvfrom(4096)
-            message = data.decode('utf-8')
-            if 'getDroneState:' in message:
-                self.message_queues['getDroneState'].put(extractMessageFromPrefix('getDroneState:', message))
-            elif 'getDistanceToCameraDirection:' in message:
-                self.message_queues['getDistanceToCameraDirection'].put(extractMessageFromPrefix('getDistanceToCameraDirection:', message))
-            elif 'getCameraTarget:' in message:
-                self.message_queues['getCameraTarget'].put(extractMessageFromPrefix('getCameraTarget:', message))
-            elif 'SpawnXActors:' in message:
-                self.message_queues['SpawnXActors'].put(extractMessageFromPrefix('SpawnXActors:', message))
-            elif 'GetTargetOfPoint:' in message:
-                self.message_queues['GetTargetOfPoint'].put(extractMessageFromPrefix('GetTargetOfPoint:', message))
-            elif 'turnTowards:' in message:
-                self.message_queues['turnTowards'].put(extractMessageFromPrefix('turnTowards:', message))
-            elif 'goto:' in message:
-                self.message_queues['goto'].put(extractMessageFromPrefix('goto:', message))
-            elif 'turnCameraXDeg:' in message:
-                self.message_queues['turnCameraXDeg'].put(extractMessageFromPrefix('turnCameraXDeg:', message))
-
-    def _send(self, msg: str) -> None:
-        """
-        This function is used to send a message to the UE engine
-        :param msg: message to send to UE engine
-        :return: None
-        """
-        self.udp_socketSend.sendto(msg.encode('utf-8'), self.ip_portSend)  # Send the message to the UE engine
-
-    #  Primitive Controls -------------------------------------------------------
-
-    def moveDroneUp(self, speedMultiplier: float) -> None:
+    @classmethod
+    def createFleet(cls, ip, port, droneIds, timeouts: dict = None, maxRetries: int = DEFAULT_MAX_RETRIES) -> list['PublicDroneControl']:
         """
-        This function is used to move the drone up
-        :param speedMultiplier: speed at which to move the drone (multiplier of default speed)
-        :return: None
+        This function is used to control several drones (e.g. one per parallel RL episode) from one process, over one pair of sockets.
+        Every request has a request id unique to the shared sockets, so the replies are routed to the drone which sent the request,
+        and the drones can be used concurrently from different threads
+        :param ip: IP address of the UE engine
+        :param port: port number of the UE engine receiver socket (+1 is used for the sender socket)
+        :param droneIds: ids of the drones to control, or number of drones (ids 0 to n - 1)
+        :param timeouts: see __init__
+        :param maxRetries: see __init__
+        :return: list of PublicDroneControl, one per drone id
         """
-        msg = '{"controls": {"upAmount": ' + str(speedMultiplier) + '}}'
-        self._send(msg)
+        if isinstance(droneIds, int):
+            droneIds = range(droneIds)
+        transport = DroneTransport(ip, port, timeouts, maxRetries)
+        return [cls(ip, port, droneId=droneId, transport=transport) for droneId in droneIds]
 
-    def moveDroneDown(self, speedMultiplier: float) -> None:
+    def _send(self, body: dict) -> None:
         """
-        This function is used to move the drone down
-        :param speedMultiplier: speed at which to move the drone (multiplier of default speed)
+        This function is used to send a message to the UE engine, for the drone of this object
+        :param body: JSON body of the message to send to UE engine, encoded as JSON or binary (see negotiateBinaryProtocol)
         :return: None
         """
-        msg = '{"controls": {"upAmount": ' + str(-speedMultiplier) + '}}'
-        self._send(msg)
+        self.transport.send(body, self.droneId)
 
-    def moveDroneForward(self, speedMultiplier: float) -> None:
+    def _call(self, command: str, body: dict):
         """
-        This function is used to move the drone forward
-        :param speedMultiplier: speed at which to move the drone (multiplier of default speed)
-        :return: None
+        This function is used to send a request for the drone of this object and block until its reply is received (see DroneTransport.call)
+        :param command: name of the command the reply will be prefixed with
+        :param body: JSON body of the request
+        :return: the parsed reply payload
+        :raises TimeoutError: if no reply was received after all attempts
         """
-        msg = '{"controls": {"pitchForwardAmount": ' + str(speedMultiplier) + '}}'
-        self._send(msg)
+        return self.transport.call(command, body, self.droneId)
 
-    def moveDroneBackward(self, speedMultiplier: float) -> None:
+    def _callBatch(self, controls: dict, queries: list[tuple[str, dict]]) -> list[Future]:
         """
-        This function is used to move the drone backward
-        :param speedMultiplier: speed at which to move the drone (multiplier of default speed)
-        :return: None
+        This function is used to send controls and several queries for the drone of this object in one message (see DroneTransport.callBatch)
+        :param controls: merged control axes and their amounts
+        :param queries: list of (command, body) of the queries
+        :return: Futures holding the parsed reply payloads, aligned with queries. Queries without a reply hold a TimeoutError
         """
-        msg = '{"controls": {"pitchForwardAmount": ' + str(-speedMultiplier) + '}}'
-        self._send(msg)
+        return self.transport.callBatch(controls, queries, self.droneId)
 
-    def moveDroneRight(self, speedMultiplier: float) -> None:
+    def negotiateBinaryProtocol(self) -> bool:
         """
-        This function is used to move the drone right
-        :param speedMultiplier: speed at which to move the drone (multiplier of default speed)
-        :return: None
+        This function is used to switch the messages to the UE engine to the compact binary encoding of Core.BinaryCodec, if the UE engine supports it.
+        The encoding is shared by all the drones of a fleet. Should be called before other threads start sending
+        :return: True if the binary encoding is used from now on, False otherwise
         """
-        msg = '{"controls": {"rollRightAmount": ' + str(speedMultiplier) + '}}'
-        self._send(msg)
+        return self.transport.negotiateBinaryProtocol()
 
-    def moveDroneLeft(self, speedMultiplier: float) -> None:
+    def batch(self) -> CommandBatch:
         """
-        This function is used to move the drone left
-        :param speedMultiplier: speed at which to move the drone (multiplier of default speed)
-        :return: None
-        """
-        msg = '{"controls": {"rollRightAmount": ' + str(-speedMultiplier) + '}}'
-        self._send(msg)
+        This function is used to merge several controls and queries into one message, e.g. all the controls of one tick:
 
-    def rotateDroneRight(self, speedMultiplier: float) -> None:
-        """
-        This function is used to rotate the drone right
-        :param speedMultiplier: speed at which to rotate the drone (multiplier of default speed)
-        :return: None
-        """
-        msg = '{"controls": {"yawRightAmount": ' + str(speedMultiplier) + '}}'
-        self._send(msg)
-
-    def rotateDroneLeft(self, speedMultiplier: float) -> None:
-        """
-        This function is used to rotate the drone left
-        :param speedMultiplier: speed at which to rotate the drone (multiplier of default speed)
-        :return: None
-        """
-        msg = '{"controls": {"yawRightAmount": ' + str(-speedMultiplier) + '}}'
-        self._send(msg)
+            with publicDroneControl.batch() as batch:
+                batch.moveDroneForward(1)
+                batch.rotateDroneLeft(0.3)
+                state = batch.getDroneState()
 
-    def rotateCameraDown(self, speedMultiplier: float) -> None:
-        """
-        This function is used to rotate the camera down
-        :param speedMultiplier: speed at which to rotate the camera (multiplier of default speed)
-        :return: None
+        :return: CommandBatch, sent when the with block ends
         """
-        msg = '{"controls": {"cameraDownAmount": ' + str(speedMultiplier) + '}}'
-        self._send(msg)
+        return CommandBatch(self)
 
-    def rotateCameraUp(self, speedMultiplier: float) -> None:
+    def _sendControls(self, controls: dict) -> None:
         """
-        This function is used to rotate the camera up
-        :param speedMultiplier: speed at which to rotate the camera (multiplier of default speed)
+        This function is used to send control axes which do not expect a reply from the UE engine
+        :param controls: control axes and their amounts, e.g. {"upAmount": 1}
         :return: None
         """
-        msg = '{"controls": {"cameraDownAmount": ' + str(-speedMultiplier) + '}}'
-        self._send(msg)
-
-    #  End Primitive Controls ---------------------------------------------------
+        self._send(controlsBody(controls))
 
     #  Advanced Controls --------------------------------------------------------
 
@@ -227,8 +115,7 @@ class PublicDroneControl:
         This function is used to hover the drone
         :return: None
         """
-        msg = '{"controls": {"hover": "true"}}'
-        self._send(msg)
+        self._sendControls({"hover": "true"})
 
     def rotateDroneXDegreesAtSpeed(self, degrees: float, speed: float = 90) -> None:
         """
@@ -237,8 +124,7 @@ class PublicDroneControl:
         :param speed: speed at which to rotate (in degrees per second)
         :return: None
         """
-        msg = '{"controls": {"rotateXDegrees": ' + str(degrees) + ', "rotationSpeed": ' + str(speed) + '}}'
-        self._send(msg)
+        self._sendControls({"rotateXDegrees": degrees, "rotationSpeed": speed})
 
     def rotateDroneTowardsLocation(self, x: float, y: float, z: float, speed: float = 90) -> None:
         """
@@ -249,14 +135,8 @@ class PublicDroneControl:
         :param speed: speed at which to rotate (in degrees per second)
         :return: None
         """
-        msg = '{"controls": {"turnTowards": {"turnTowardsXVal": ' + str(x) + ', "turnTowardsYVal": ' + str(y) + ', "turnTowardsZVal": ' + str(
-            z) + ', "turnTowardsSpeed": ' + str(speed) + '}}}'
-        self._send(msg)
-        message = self.message_queues['turnTowards'].get()  # This will block until an item is available
-        if message == 'Done':
-            return
-        else:
-            raise Exception(f"Error in turning towards location: {message}")
+        message = self._call('turnTowards', turnTowardsBody(x, y, z, speed))  # Blocks until the reply is received or the command times out
+        checkDone(message, "Error in turning towards location")
 
     def moveDroneToLocation(self, x: float, y: float, z: float, speed: float = 2, turnWithMove: bool = True) -> None:
         """
@@ -268,20 +148,8 @@ class PublicDroneControl:
         :param turnWithMove: boolean value, if true, drone will turn while moving to face the target location
         :return: None
         """
-        if turnWithMove:  # turnWithMove is a boolean value, convert it to lowercase string
-            turnWithMove = "true"
-        else:
-            turnWithMove = "false"
-
-        msg = ('{"controls": {"goto": {"gotoXVal": ' + str(x) + ', "gotoYVal": ' + str(y) + ', "gotoZVal": ' + str(z) + ', "gotoSpeed": ' +
-               str(speed) + ', "turnWithMove": ' + turnWithMove + '}}}')
-        self._send(msg)
-
-        message = self.message_queues['goto'].get()  # This will block until an item is available
-        if message == 'Done':
-            return
-        else:
-            raise Exception(f"Error in moving to location: {message}")
+        message = self._call('goto', gotoBody(x, y, z, speed, turnWithMove))  # Blocks until the reply is received or the command times out
+        checkDone(message, "Error in moving to location")
 
     def turnCameraXDegreesAtSpeed(self, degrees: float, speedMultiplier: float = 45) -> None:
         """
@@ -290,19 +158,8 @@ class PublicDroneControl:
         :param speedMultiplier: speed at which to turn (multiplier of default speed)
         :return: None
         """
-        if degrees > 89:
-            degrees = 89
-        elif degrees < -89:
-            degrees = -89
-
-        msg = '{"controls": {"turnCameraXDeg": {"degrees": ' + str(degrees) + ', "speedMultiplier": ' + str(speedMultiplier) + '}}}'
-        self._send(msg)
-
-        message = self.message_queues['turnCameraXDeg'].get()  # This will block until an item is available
-        if message == 'Done':
-            return
-        else:
-            raise Exception(f"Error in turning camera: {message}")
+        message = self._call('turnCameraXDeg', turnCameraBody(degrees, speedMultiplier))  # Blocks until the reply is received or the command times out
+        checkDone(message, "Error in turning camera")
 
     #  End Advanced Controls ----------------------------------------------------
 
@@ -314,14 +171,42 @@ class PublicDroneControl:
         The state includes the location of the drone (in UE grid coordinates) and the number of collisions up to that point
         :return: DroneState
         """
-        msg = '{"getDroneState": "true"}'
-        self._send(msg)
-        message = self.message_queues['getDroneState'].get()  # This will block until an item is available
-        json_message = json.loads(message)
-        return DroneState(
-            Coordinate(json_message["positionXVal"], json_message["positionYVal"], json_message["positionZVal"]),
-            json_message["collisionCount"]
-        )
+        return self._call('getDroneState', {"getDroneState": "true"})  # Blocks until the reply is received or the command times out
+
+    def subscribeDroneState(self, rateHz: float = 100, port: int = None) -> None:
+        """
+        This function is used to ask the UE engine to push the state of the drone at a fixed rate, instead of it being requested every time.
+        The newest state is kept in droneStateCache and can be read with getLatestDroneState without any network traffic
+        :param rateHz: number of drone states to push per second. 0 stops the stream
+        :param port: port to receive the drone states on (default is the port of the receiver socket + 2). Ignored if already subscribed by a drone of the fleet
+        :return: None
+        """
+        telemetryPort = self.transport.startTelemetry(port)  # Shared by all the drones of a fleet
+        self._send(subscribeDroneStateBody(rateHz, telemetryPort))
+
+    def addDroneStateListener(self, listener) -> None:
+        """
+        This function is used to be notified of every new drone state pushed by the UE engine (see subscribeDroneState), instead of polling it
+        :param listener: function called with the new DroneState, from the telemetry thread. It must return quickly, e.g. by queuing an event
+        :return: None
+        """
+        self.transport.addDroneStateListener(self.droneId, listener)
+
+    def removeDroneStateListener(self, listener) -> None:
+        self.transport.removeDroneStateListener(self.droneId, listener)
+
+    def getLatestDroneState(self, maxAge: float = None) -> DroneState:
+        """
+        This function is used to get the newest drone state pushed by the UE engine (see subscribeDroneState), in O(1) and without network traffic.
+        If no state was pushed (not subscribed, or the UE engine does not support it) or the newest one is older than maxAge,
+        the state is requested with getDroneState instead
+        :param maxAge: maximal age of the pushed state in seconds, None to accept any age
+        :return: DroneState
+        """
+        sample = self.droneStateCache.read(maxAge)
+        if sample is not None:
+            return sample.value
+        return self.getDroneState()
 
     def sendDroneGrade(self, grade: float) -> None:
         """
@@ -329,20 +214,16 @@ class PublicDroneControl:
         :param grade: grade of the drone (double)
         :return: None
         """
-        msg = '{"droneGrade": ' + str(grade) + '}'
-        self._send(msg)
+        self._send(droneGradeBody(grade))
 
     def getDistanceToCameraDirection(self) -> float:
         """
         This function is used to get the distance to the nearest object in the direction of where the camera is facing
         :return: distance to nearest object in direction of camera in meters
         """
-        msg = '{"getDistanceToCameraDirection": "true"}'
-        self._send(msg)
-
         # Receiving distance from UE in UE units, e.g. centimeters. Have to convert to meters
-        message = self.message_queues['getDistanceToCameraDirection'].get()  # This will block until an item is available
-        return float(message) / 100  # Convert to meters
+        distance = self._call('getDistanceToCameraDirection', {"getDistanceToCameraDirection": "true"})  # Blocks until the reply is received
+        return distance / 100  # Convert to meters
 
     def getCameraTarget(self) -> Target or None:
         """
@@ -352,11 +233,8 @@ class PublicDroneControl:
                         Class name of target,
                         Location of target (in X, Y, Z coordinates in UE units)
         """
-        msg = '{"getCameraTarget": "true"}'
-        self._send(msg)
-        message = self.message_queues['getCameraTarget'].get()  # This will block until an item is available
         # Received string in the form: 'DisplayName=Cube ClassName=StaticMeshActor Location=X=19410.000 Y=33114.466 Z=98.913' or 'None' if no target is detected
-        return parseHitResult(message)
+        return self._call('getCameraTarget', {"getCameraTarget": "true"})  # Blocks until the reply is received or the command times out
 
     def getTargetOfPoint(self, coordinateX: float, coordinateY: float) -> Target or None:
         """
@@ -370,11 +248,20 @@ class PublicDroneControl:
                         Class name of target,
                         Location of target (in X, Y, Z coordinates in UE units)
         """
-        msg = ('{"GetTargetOfPoint": {"xVal": ' + str(coordinateX) + ', "yVal": ' + str(coordinateY) + '}}')
-        self._send(msg)
-        targetOfPointString = self.message_queues['GetTargetOfPoint'].get()  # Blocks until an item is available
         # Received string in the form: 'DisplayName=Cube ClassName=StaticMeshActor Location=X=19410.000 Y=33114.466 Z=98.913' or 'None' if no target is detected
-        return parseHitResult(targetOfPointString)
+        return self._call('GetTargetOfPoint', getTargetOfPointBody(coordinateX, coordinateY))  # Blocks until the reply is received
+
+    def getTargetsOfPoints(self, points) -> list[Target or None]:
+        """
+        This function is used to hit test several points on screen in a single round trip, e.g. the centers of all the objects detected in a frame.
+        Same as calling getTargetOfPoint for every point, but all the points are sent in one message and answered in one reply
+        :param points: list of (normalized X, normalized Y) coordinates in 2D space of the simulation (on screen)
+        :return: list of Target (or None if nothing was hit), aligned with points
+        """
+        points = list(points)
+        if not points:
+            return []
+        return self._call('GetTargetsOfPoints', getTargetsOfPointsBody(points))  # Blocks until the reply is received
 
     #  End Drone Vision ---------------------------------------------------------
 
@@ -385,8 +272,7 @@ class PublicDroneControl:
         This function is used to request a change in the time of day in the simulation.
         :param addDegrees: add this number of degrees to the current positioning of the sun (direction of the light)
         """
-        msg = '{"DaytimeChangeRequested": ' + str(addDegrees) + '}'
-        self._send(msg)
+        self._send(daytimeChangeBody(addDegrees))
 
     def spawnXActors(self, numOfActorsToSpawn: int) -> list[Coordinate] or None:
         """
@@ -396,24 +282,10 @@ class PublicDroneControl:
         :param numOfActorsToSpawn: The number of actors which will be spawned randomly (max value is 150)
         :return: Returns the list locations (x, y, z coordinates) of the spawned actors.
         """
-
-        if numOfActorsToSpawn > 150:
-            numOfActorsToSpawn = 150
-        msg = '{"SpawnXActors": ' + str(numOfActorsToSpawn) + '}'
-        self._send(msg)
-        print("Sent message to spawn actors")
-        actorLocationsString = self.message_queues['SpawnXActors'].get()  # Blocks until response is received
-        actorLocationsStringJson = json.loads(actorLocationsString)
-
-        # Parse the JSON data into a list of tuples
-        coordinates = []
-        for i in range(len(actorLocationsStringJson) // 3):
-            x = actorLocationsStringJson[f"{i}-XLoc"]
-            y = actorLocationsStringJson[f"{i}-YLoc"]
-            z = actorLocationsStringJson[f"{i}-ZLoc"]
-            coordinates.append(Coordinate(x, y, z))
+        coordinates = self._call('SpawnXActors', spawnActorsBody(numOfActorsToSpawn))  # Blocks until response is received. At most 150 actors are spawned
 
         self.spawnedActors = coordinates
+        self.actorIndex = ActorIndex(coordinates)
         return coordinates
 
     #  End Map Controls ---------------------------------------------------------
@@ -428,15 +300,13 @@ class PublicDroneControl:
         """
         target = self.getCameraTarget()
 
-        if target is None:
+        index = self.actorIndex.indexOfTarget(target)  # Get the index of the actor hit, if not destroyed yet
+        if index is None:
             return False
 
-        if target.position in self.spawnedActors:
-            index = self.spawnedActors.index(target.position)  # Get the index of the actor in the list
-            msg = '{"DestroyActor": ' + str(index) + '}'
-            self._send(msg)
-            return True
-        return False
+        self._send(destroyActorBody(index))
+        self.actorIndex.remove(index)
+        return True
 
     def verifyAndDestroyActorFromPoint(self, normalizedX, normalizedY) -> bool:
         """
@@ -446,14 +316,42 @@ class PublicDroneControl:
         """
         target = self.getTargetOfPoint(normalizedX, normalizedY)
 
-        if target is None:
+        index = self.actorIndex.indexOfTarget(target)  # Get the index of the actor hit, if not destroyed yet
+        if index is None:
             return False
 
-        if target.position in self.spawnedActors:
-            index = self.spawnedActors.index(target.position)  # Get the index of the actor in the list
-            msg = '{"DestroyActor": ' + str(index) + '}'
-            self._send(msg)
-            return True
-        return False
+        self._send(destroyActorBody(index))
+        self.actorIndex.remove(index)
+        return True
+
+    def destroyActors(self, indices: list[int]) -> list[int]:
+        """
+        Method to remove several spawned actors from the simulation in one message, and wait for the UE engine to confirm it.
+        The message is retransmitted if the confirmation is lost. Destroyed actors are removed from actorIndex
+        :param indices: indices of the spawned actors to destroy
+        :return: indices of the actors the UE engine confirmed destroyed
+        """
+        if not indices:
+            return []
+        destroyed = self._call('DestroyActors', destroyActorsBody(indices))  # Blocks until the confirmation is received
+        for index in destroyed:
+            self.actorIndex.remove(index)
+        return destroyed
+
+    def verifyAndDestroyActorsFromPoints(self, points) -> list[bool]:
+        """
+        Method to verify the targets of several points on screen at once (see getTargetsOfPoints), and remove all the verified actors from the simulation
+        in one message (see destroyActors). An actor hit by several points is only verified (and destroyed) for the first of them
+
+        :param points: list of (normalized X, normalized Y) coordinates on screen
+        :return: list aligned with points, True for the points whose target was verified and confirmed destroyed, false otherwise
+        """
+        hitIndices = []
+        for target in self.getTargetsOfPoints(points):
+            index = self.actorIndex.indexOfTarget(target)  # Get the index of the actor hit, if not destroyed yet
+            hitIndices.append(index if index not in hitIndices else None)  # Points hitting the same actor are not verified twice
+
+        destroyed = set(self.destroyActors([index for index in hitIndices if index is not None]))
+        return [index in destroyed for index in hitIndices]
 
     #  End Simulation Methods ---------------------------------------------------
@@ -0,0 +1,82 @@
+import itertools
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+
+
+class RequestTracker:
+    """
+    Class to correlate the replies received from the UE engine with the requests that were sent to it.
+    Every request is given a unique sequence id and a Future. When a reply arrives, the Future of the matching request is resolved.
+    Replies which do not match any in-flight request (stale or duplicate datagrams) are dropped.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()  # To ensure thread-safe operations
+        self._sequence = itertools.count(1)  # Request ids start at 1
+        self._pending: dict[int, tuple[str, Future]] = {}  # requestId -> (command, future)
+        self._pendingByCommand: dict[str, OrderedDict] = {}  # command -> requestIds in the order they were sent
+
+    def register(self, command: str) -> tuple[int, Future]:
+        """
+        Register a new in-flight request
+        :param command: name of the command the reply will be prefixed with (e.g. 'getDroneState')
+        :return: tuple of the request id and the Future which will hold the reply payload
+        """
+        future = Future()
+        future.set_running_or_notify_cancel()
+        with self._lock:
+            requestId = next(self._sequence)
+            self._pending[requestId] = (command, future)
+            self._pendingByCommand.setdefault(command, OrderedDict())[requestId] = None
+        return requestId, future
+
+    def resolve(self, command: str, requestId: int or None, payload) -> bool:
+        """
+        Resolve the Future of the request matching the reply
+        :param command: name of the command the reply was prefixed with
+        :param requestId: id echoed by the UE engine, or None if the reply carries no id.
+                          Replies without an id are matched to the oldest in-flight request of the same command
+        :param payload: the reply payload to set as the result of the Future. If it is an exception, it is set as the exception of the Future
+        :return: True if a request was resolved, False if the reply was stale or a duplicate and has been dropped
+        """
+        with self._lock:
+            if requestId is None:
+                waiting = self._pendingByCommand.get(command)
+                requestId = next(iter(waiting)) if waiting else None
+
+            entry = self._pending.get(requestId)
+            if entry is None or entry[0] != command:
+                return False
+
+            del self._pending[requestId]
+            del self._pendingByCommand[command][requestId]
+
+        if isinstance(payload, Exception):
+            entry[1].set_exception(payload)
+        else:
+            entry[1].set_result(payload)
+        return True
+
+    def fail(self, requestId: int, exception: BaseException) -> None:
+        """
+        Remove an in-flight request and set an exception on its Future. Late replies to it will be dropped
+        :param requestId: id of the request to fail
+        :param exception: exception to set on the Future
+        :return: None
+        """
+        with self._lock:
+            entry = self._pending.pop(requestId, None)
+            if entry is None:
+                return
+            del self._pendingByCommand[entry[0]][requestId]
+
+        if not entry[1].done():
+            entry[1].set_exception(exception)
+
+    def inFlight(self) -> int:
+        """
+        :return: number of requests currently waiting for a reply
+        """
+        with self._lock:
+            return len(self._pending)
@@ -0,0 +1,198 @@
+import os
+import struct
+import sys
+import time
+from multiprocessing import resource_tracker, shared_memory
+from typing import NamedTuple
+
+import numpy as np
+
+# Layout of the shared memory block, all integers little endian:
+#   ring header (64 bytes):  magic "FRNG", version u32, slots u32, height u32, width u32, channels u32, latest sequence u64
+#   per slot header (64 bytes each): seqlock counter u64, frame sequence u64, timestamp f64 (time.monotonic() of the producer)
+#   per slot frame (height * width * channels bytes each): uint8 image, HWC, BGR for 3 channels
+# Slot of the frame with sequence s (starting at 1) is s % slots. The producer makes the seqlock counter odd while it writes a slot,
+# and even again once done, so readers can detect a frame which was overwritten while they were reading it.
+MAGIC = b'FRNG'
+VERSION = 1
+_RING_HEADER = struct.Struct('<4s5IQ')
+_RING_HEADER_SIZE = 64
+_SLOT_HEADER = struct.Struct('<QQd')
+_SLOT_HEADER_SIZE = 64
+_LATEST_SEQUENCE_OFFSET = 24
+_POLL_INTERVAL = 0.0005  # Seconds between two checks for a new frame. There is no cross-process notification, readers poll the latest sequence
+# When the slot of the newest frame is being overwritten by the producer, readers retry this many times only yielding the CPU (time.sleep(0)),
+# then sleep _POLL_INTERVAL between retries so a reader does not burn a core while a large frame is copied
+_OVERWRITTEN_SLOT_SPINS = 10
+_MAX_OVERWRITTEN_SLOT_RETRIES = 1000  # Retries on overwritten slots before read gives up and returns None, as on a timeout
+
+
+class Frame(NamedTuple):
+    image: np.ndarray  # Read-only view on the shared memory, valid until the producer writes slots more frames
+    sequence: int  # Sequence number of the frame, starting at 1
+    timestamp: float  # time.monotonic() at which the producer wrote the frame
+    slot: int
+    counter: int  # Seqlock counter of the slot when the frame was read, see SharedFrameRing.isValid
+
+
+class SharedFrameRing:
+    """
+    Ring buffer of video frames in shared memory, to pass the images of the simulation from a single producer (the UE engine, or a capture
+    process) to any number of consumer processes without copying them. Consumers get numpy views on the shared memory.
+
+    A view is only valid until the producer wraps around to its slot, after `slots - 1` newer frames. Consumers which keep a frame longer than
+    that must copy it, or check isValid once done with it and drop the results computed from it if it was overwritten.
+    """
+
+    def __init__(self, name: str, create: bool = False, height: int = None, width: int = None, channels: int = 3, slots: int = 4):
+        """
+        :param name: name of the shared memory block (shm://name as a source of runYoloDetection)
+        :param create: True to create the block (producer), False to attach to an existing one (consumers)
+        :param height: height of the frames in pixels, only used with create
+        :param width: width of the frames in pixels, only used with create
+        :param channels: number of channels of the frames, only used with create
+        :param slots: number of frames the ring holds, only used with create
+        """
+        self.name = name
+        self.isProducer = create
+        if create:
+            if height is None or width is None:
+                raise Exception("height and width are required to create a shared frame ring")
+            if slots < 2:
+                raise Exception(f"A shared frame ring needs at least 2 slots, got {slots}")
+            self.slots, self.height, self.width, self.channels = slots, height, width, channels
+            self._shm = shared_memory.SharedMemory(name=name, create=True, size=self._size())
+            _RING_HEADER.pack_into(self._shm.buf, 0, MAGIC, VERSION, slots, height, width, channels, 0)
+            for slot in range(slots):
+                _SLOT_HEADER.pack_into(self._shm.buf, self._slotHeaderOffset(slot), 0, 0, 0.0)
+        else:
+            self._shm = self._attach(name)
+            magic, version, self.slots, self.height, self.width, self.channels, _ = _RING_HEADER.unpack_from(self._shm.buf, 0)
+            if magic != MAGIC or version != VERSION:
+                raise Exception(f"Shared memory {name} is not a version {VERSION} frame ring (magic {magic}, version {version})")
+
+        self.frameShape = (self.height, self.width, self.channels) if self.channels > 1 else (self.height, self.width)
+        self.frameSize = self.height * self.width * self.channels
+        self._images = [np.ndarray(self.frameShape, dtype=np.uint8, buffer=self._shm.buf, offset=self._frameOffset(slot)) for slot in range(self.slots)]
+        if not create:
+            for image in self._images:
+                image.flags.writeable = False
+        self._sequence = self.latestSequence()
+
+    @staticmethod
+    def _attach(name: str) -> shared_memory.SharedMemory:
+        # Before Python 3.13 attaching registers the block in the resource tracker, which would destroy it when this consumer exits,
+        # although it belongs to the producer. (A consumer started by multiprocessing shares the tracker of its parent, which then warns about
+        # the block being unregistered twice when the producer unlinks it; the warning is harmless)
+        if sys.version_info >= (3, 13):
+            return shared_memory.SharedMemory(name=name, track=False)
+        shm = shared_memory.SharedMemory(name=name)
+        if os.name == 'posix':
+            resource_tracker.unregister(shm._name, 'shared_memory')
+        return shm
+
+    def _size(self) -> int:
+        return _RING_HEADER_SIZE + self.slots * (_SLOT_HEADER_SIZE + self.height * self.width * self.channels)
+
+    def _slotHeaderOffset(self, slot: int) -> int:
+        return _RING_HEADER_SIZE + slot * _SLOT_HEADER_SIZE
+
+    def _frameOffset(self, slot: int) -> int:
+        return _RING_HEADER_SIZE + self.slots * _SLOT_HEADER_SIZE + slot * self.height * self.width * self.channels
+
+    def close(self) -> None:
+        """
+        Detach from the shared memory. The frames returned by read must have been released, their views cannot be used anymore
+        :return: None
+        """
+        self._images = []
+        self._shm.close()
+
+    def unlink(self) -> None:
+        """
+        Destroy the shared memory block, once every process closed it. Only called by the producer
+        :return: None
+        """
+        self._shm.unlink()
+
+    #  Producer ------------------------------------------------------------------
+
+    def write(self, image: np.ndarray, timestamp: float = None) -> int:
+        """
+        Copy a frame into the next slot of the ring. Must only be called by the producer
+        :param image: frame of shape frameShape, uint8
+        :param timestamp: time.monotonic() at which the frame was captured, now if None
+        :return: sequence number of the frame
+        """
+        if image.shape != self.frameShape:
+            raise Exception(f"Frame of shape {image.shape} does not fit in the ring of {self.name} ({self.frameShape})")
+        sequence = self._sequence + 1
+        slot = sequence % self.slots
+        headerOffset = self._slotHeaderOffset(slot)
+        counter = _SLOT_HEADER.unpack_from(self._shm.buf, headerOffset)[0]
+
+        _SLOT_HEADER.pack_into(self._shm.buf, headerOffset, counter + 1, sequence, 0.0)  # Odd: slot being written
+        np.copyto(self._images[slot], image)
+        _SLOT_HEADER.pack_into(self._shm.buf, headerOffset, counter + 2, sequence, time.monotonic() if timestamp is None else timestamp)
+        struct.pack_into('<Q', self._shm.buf, _LATEST_SEQUENCE_OFFSET, sequence)  # Published only once the slot is complete
+
+        self._sequence = sequence
+        return sequence
+
+    #  End Producer --------------------------------------------------------------
+
+    #  Consumers -----------------------------------------------------------------
+
+    def latestSequence(self) -> int:
+        """
+        :return: sequence number of the newest complete frame, 0 if no frame was written yet
+        """
+        return struct.unpack_from('<Q', self._shm.buf, _LATEST_SEQUENCE_OFFSET)[0]
+
+    def read(self, lastSequence: int = 0, timeout: float = None) -> Frame or None:
+        """
+        Get the newest frame, without copying it. Frames between lastSequence and the newest one are skipped
+        :param lastSequence: sequence number of the last frame the consumer handled, to wait for a newer one
+        :param timeout: maximal number of seconds to wait for a frame newer than lastSequence, None waits forever
+        :return: the newest Frame, or None if no newer frame was written before the timeout, or if the producer kept overwriting the slot of
+                 the newest frame for _MAX_OVERWRITTEN_SLOT_RETRIES retries
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        retries = 0
+        while True:
+            sequence = self.latestSequence()
+            if sequence > lastSequence:
+                slot = sequence % self.slots
+                counter, slotSequence, timestamp = _SLOT_HEADER.unpack_from(self._shm.buf, self._slotHeaderOffset(slot))
+                if counter % 2 == 0 and slotSequence == sequence:
+                    return Frame(self._images[slot], sequence, timestamp, slot, counter)
+                retries += 1  # The producer is already overwriting the slot: let it write, then read the next newest frame
+                if retries >= _MAX_OVERWRITTEN_SLOT_RETRIES:
+                    return None
+                delay = 0 if retries <= _OVERWRITTEN_SLOT_SPINS else _POLL_INTERVAL
+            else:
+                delay = _POLL_INTERVAL
+            if deadline is not None and time.monotonic() >= deadline:
+                return None
+            time.sleep(delay)
+
+    def readSequence(self, sequence: int) -> Frame or None:
+        """
+        Get a given frame, without copying it, e.g. a frame another process was told to handle
+        :param sequence: sequence number of the frame
+        :return: the Frame, or None if it was not written yet or was already overwritten by a newer frame
+        """
+        slot = sequence % self.slots
+        counter, slotSequence, timestamp = _SLOT_HEADER.unpack_from(self._shm.buf, self._slotHeaderOffset(slot))
+        if counter % 2 != 0 or slotSequence != sequence:
+            return None
+        return Frame(self._images[slot], sequence, timestamp, slot, counter)
+
+    def isValid(self, frame: Frame) -> bool:
+        """
+        :param frame: frame returned by read
+        :return: True if the frame was not overwritten since it was read, so the data read from its view is consistent
+        """
+        return _SLOT_HEADER.unpack_from(self._shm.buf, self._slotHeaderOffset(frame.slot))[0] == frame.counter
+
+    #  End Consumers -------------------------------------------------------------
@@ -1,8 +1,41 @@
-from Core.Coordinate import Coordinate
+from Core.Coordinate import DEFAULT_TOLERANCE, Coordinate
 
 
 class Target:
+    """
+    Immutable result of a hit test: the object seen by the camera and its location
+    """
+    __slots__ = ('displayName', 'className', 'position')
+
     def __init__(self, displayName: str, className: str, position: Coordinate):
-        self.displayName = displayName
-        self.className = className
-        self.position = position
+        object.__setattr__(self, 'displayName', displayName)
+        object.__setattr__(self, 'className', className)
+        object.__setattr__(self, 'position', position)
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"Target is immutable, cannot set {name}")
+
+    def __delattr__(self, name):
+        raise AttributeError(f"Target is immutable, cannot delete {name}")
+
+    def __reduce__(self):
+        return Target, (self.displayName, self.className, self.position)
+
+    def __eq__(self, other):
+        if not isinstance(other, Target):
+            return NotImplemented
+        return self.displayName == other.displayName and self.className == other.className and self.position == other.position
+
+    def __hash__(self):
+        return hash((self.displayName, self.className, self.position))
+
+    def __repr__(self):
+        return f"Target({self.displayName!r}, {self.className!r}, {self.position!r})"
+
+    def isClose(self, other: 'Target', tolerance: float = DEFAULT_TOLERANCE) -> bool:
+        """
+        :param other: another target
+        :param tolerance: maximal difference of each coordinate of the positions, in UE units
+        :return: True if both are the same object, at the same position up to the tolerance
+        """
+        return self.displayName == other.displayName and self.className == other.className and self.position.isClose(other.position, tolerance)
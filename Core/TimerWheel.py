@@ -0,0 +1,110 @@
+import itertools
+import time
+
+
+class TimerWheel:
+    """
+    Hashed timing wheel, scheduling callbacks at a given time with a precision of one tick. Scheduling and cancelling are O(1), and advancing
+    only visits the slots of the ticks that elapsed. Periodic timers are rescheduled from their deadline, not from the time they fired,
+    so they do not drift.
+    Not thread-safe: the wheel is owned by an event loop thread, which waits for timeUntilNextTimer (or an event) and then calls advance.
+    """
+
+    def __init__(self, tickDuration: float = 0.01, slots: int = 512, now: float = None):
+        """
+        :param tickDuration: precision of the timers, in seconds
+        :param slots: number of slots of the wheel. Timers further than slots * tickDuration away wait for several turns of the wheel
+        :param now: time.monotonic() to start the wheel at, now if None
+        """
+        self.tickDuration = tickDuration
+        self._slots = [dict() for _ in range(slots)]  # Timer id -> (deadline, callback, period), per slot
+        self._timers = {}  # Timer id -> slot index, of the scheduled timers
+        self._ids = itertools.count(1)
+        self._start = time.monotonic() if now is None else now
+        self._tick = 0  # Next tick to process
+        self._firing = set()  # Ids of the due timers whose callbacks advance did not call yet, so a callback can cancel them
+
+    def _tickOf(self, deadline: float) -> int:
+        return max(self._tick, int((deadline - self._start) / self.tickDuration))
+
+    def _insert(self, timerId: int, deadline: float, callback, period: float or None) -> None:
+        slot = self._tickOf(deadline) % len(self._slots)
+        self._slots[slot][timerId] = (deadline, callback, period)
+        self._timers[timerId] = slot
+
+    def schedule(self, delay: float, callback, period: float = None, now: float = None) -> int:
+        """
+        :param delay: number of seconds before the callback is called
+        :param callback: function called without arguments by advance
+        :param period: if given, the callback is called again every period seconds after the first time, until cancelled
+        :param now: current time.monotonic(), now if None
+        :return: id of the timer, to cancel it
+        """
+        if period is not None and period <= 0:
+            raise Exception(f"Period of a timer must be positive, got {period}")
+        timerId = next(self._ids)
+        self._insert(timerId, (time.monotonic() if now is None else now) + delay, callback, period)
+        return timerId
+
+    def cancel(self, timerId: int) -> bool:
+        """
+        :param timerId: id returned by schedule
+        :return: True if the timer was cancelled, False if it already fired (and was not periodic) or was already cancelled
+        """
+        firing = timerId in self._firing
+        self._firing.discard(timerId)
+        slot = self._timers.pop(timerId, None)
+        if slot is not None:
+            del self._slots[slot][timerId]
+        return firing or slot is not None
+
+    def __len__(self):
+        return len(self._timers)
+
+    def timeUntilNextTimer(self, now: float = None) -> float or None:
+        """
+        :param now: current time.monotonic(), now if None
+        :return: number of seconds until the next timer is due (0 if one is overdue), or None if no timer is scheduled
+        """
+        if not self._timers:
+            return None
+        now = time.monotonic() if now is None else now
+        for tick in range(self._tick, self._tick + len(self._slots)):  # Only the slots of the next turn of the wheel
+            deadlines = [deadline for deadline, _, _ in self._slots[tick % len(self._slots)].values()
+                         if self._tickOf(deadline) == tick]
+            if deadlines:
+                return max(0.0, min(deadlines) - now)
+        nextDeadline = min(deadline for slot in self._slots for deadline, _, _ in slot.values())  # All timers are more than a turn away
+        return max(0.0, nextDeadline - now)
+
+    def advance(self, now: float = None) -> int:
+        """
+        Call the callbacks of all the timers due by now, in the order of their deadlines
+        :param now: current time.monotonic(), now if None
+        :return: number of callbacks called
+        """
+        now = time.monotonic() if now is None else now
+        lastTick = int((now - self._start) / self.tickDuration)
+        due = []
+        while self._tick <= lastTick:
+            slot = self._slots[self._tick % len(self._slots)]
+            for timerId, (deadline, callback, period) in list(slot.items()):
+                if deadline <= now:
+                    del slot[timerId]
+                    del self._timers[timerId]
+                    due.append((deadline, timerId, callback, period))
+            if self._tick == lastTick:
+                break  # Timers of the current tick which are not due yet stay in it
+            self._tick += 1
+
+        self._firing.update(timerId for _, timerId, _, _ in due)
+        called = 0
+        for deadline, timerId, callback, period in sorted(due, key=lambda timer: timer[0]):
+            if timerId not in self._firing:
+                continue  # Cancelled by a callback called before
+            self._firing.discard(timerId)
+            if period is not None:
+                self._insert(timerId, deadline + period, callback, period)  # Same id, so it can still be cancelled
+            callback()
+            called += 1
+        return called
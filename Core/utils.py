@@ -4,6 +4,8 @@ from pathlib import Path
 from Core.PublicDroneControl import PublicDroneControl
 from Core.SimulationParams import SimulationParams
 
+TELEMETRY_RATE_HZ = 100  # Number of drone states pushed by the UE engine per second
+
 
 def loadSimParams():
     # Constructing the path to the log file -->
@@ -20,3 +22,4 @@ def loadSimParams():
 def initSimulation(simParams: SimulationParams, publicDroneControl: PublicDroneControl):
     publicDroneControl.spawnXActors(simParams.numOfPeople)  # Spawn actors
     publicDroneControl.requestDaytimeChange(simParams.sunAngle)  # Change sun angle
+    publicDroneControl.subscribeDroneState(rateHz=TELEMETRY_RATE_HZ)  # Have the drone state pushed, so grading does not have to poll for it
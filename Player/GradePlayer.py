@@ -43,6 +43,7 @@ class GradePlayer(threading.Thread):
             self.logger.exception(f"Error in GradePlayer: {e}")
         finally:
             self.logger.info(f"Grade thread ended. Final points: {self.points}")
+            self.logger.info(self.publicDroneControl.linkStats.summary())
             self.stop()  # Stop the thread after the duration
 
     def add_points(self, numOfPointsToAdd):
@@ -73,7 +74,11 @@ class GradePlayer(threading.Thread):
         Function to handle the collision of the drone with physical objects
         :return: None
         """
-        state: DroneState = self.publicDroneControl.getDroneState()
+        try:
+            state: DroneState = self.publicDroneControl.getLatestDroneState(maxAge=0.1)  # Pushed state, polled only if the stream stopped
+        except TimeoutError as e:  # Lost datagrams are retried by PublicDroneControl, skip this iteration if all attempts were lost
+            self.logger.warning(f"Drone state not received: {e}")
+            return
         if state is not None and state.collisionCount != 0:
             self.points -= self.pointsDeductedForCollision
             self.logger.info(f"Collision detected. Points deducted: {self.pointsDeductedForCollision}")
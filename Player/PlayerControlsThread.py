@@ -26,38 +26,44 @@ class PlayerControlThread(threading.Thread):
         try:
             self.logger.info("Listening for keyboard input...")
             while not self._stop_event.is_set():
-                if keyboard.is_pressed('w'):
-                    self.publicDroneControl.moveDroneForward(1)
-                    self.logger.info("Moving forward")
-                if keyboard.is_pressed('s'):
-                    self.publicDroneControl.moveDroneBackward(1)
-                    self.logger.info("Moving backward")
-                if keyboard.is_pressed('a'):
-                    self.publicDroneControl.moveDroneLeft(1)
-                    self.logger.info("Moving left")
-                if keyboard.is_pressed('d'):
-                    self.publicDroneControl.moveDroneRight(1)
-                    self.logger.info("Moving right")
-                if keyboard.is_pressed('r'):
-                    self.publicDroneControl.rotateCameraUp(0.3)
-                    self.logger.info("Rotating camera up")
-                if keyboard.is_pressed('f'):
-                    self.publicDroneControl.rotateCameraDown(0.3)
-                    self.logger.info("Rotating camera down")
-                if keyboard.is_pressed('q'):
-                    self.publicDroneControl.rotateDroneLeft(0.3)
-                    self.logger.info("Rotating drone left")
-                if keyboard.is_pressed('e'):
-                    self.publicDroneControl.rotateDroneRight(0.3)
-                    self.logger.info("Rotating drone right")
-                if keyboard.is_pressed('left shift'):
-                    self.publicDroneControl.moveDroneUp(1)
-                    self.logger.info("Moving up")
-                if keyboard.is_pressed('left ctrl'):
-                    self.publicDroneControl.moveDroneDown(1)
-                    self.logger.info("Moving down")
+                with self.publicDroneControl.batch() as batch:  # All the keys held during this tick are sent in one message
+                    if keyboard.is_pressed('w'):
+                        batch.moveDroneForward(1)
+                        self.logger.info("Moving forward")
+                    if keyboard.is_pressed('s'):
+                        batch.moveDroneBackward(1)
+                        self.logger.info("Moving backward")
+                    if keyboard.is_pressed('a'):
+                        batch.moveDroneLeft(1)
+                        self.logger.info("Moving left")
+                    if keyboard.is_pressed('d'):
+                        batch.moveDroneRight(1)
+                        self.logger.info("Moving right")
+                    if keyboard.is_pressed('r'):
+                        batch.rotateCameraUp(0.3)
+                        self.logger.info("Rotating camera up")
+                    if keyboard.is_pressed('f'):
+                        batch.rotateCameraDown(0.3)
+                        self.logger.info("Rotating camera down")
+                    if keyboard.is_pressed('q'):
+                        batch.rotateDroneLeft(0.3)
+                        self.logger.info("Rotating drone left")
+                    if keyboard.is_pressed('e'):
+                        batch.rotateDroneRight(0.3)
+                        self.logger.info("Rotating drone right")
+                    if keyboard.is_pressed('left shift'):
+                        batch.moveDroneUp(1)
+                        self.logger.info("Moving up")
+                    if keyboard.is_pressed('left ctrl'):
+                        batch.moveDroneDown(1)
+                        self.logger.info("Moving down")
                 if keyboard.is_pressed('space'):
-                    if self.publicDroneControl.verifyAndDestroyActorFromCamera():
+                    try:
+                        verified = self.publicDroneControl.verifyAndDestroyActorFromCamera()
+                    except TimeoutError as e:
+                        self.logger.warning(f"Camera target not received: {e}")
+                        verified = False
+                    if verified:
                         self.logger.info(f"Actor detected by player, adding points... current points: {self.gradePlayer.get_points() + self.gradePlayer.addPointsForRecognition}")
                         self.gradePlayer.add_points(self.gradePlayer.addPointsForRecognition)
                     else:
@@ -0,0 +1,43 @@
+import random
+
+
+class NetworkConditions:
+    """
+    Impairments applied by the simulator to the datagrams it receives and sends, to reproduce a real network link:
+    fixed latency, random jitter on top of it (which also reorders datagrams) and random loss.
+    """
+
+    def __init__(self, latencyMs: float = 0.0, jitterMs: float = 0.0, loss: float = 0.0, seed: int = None):
+        """
+        :param latencyMs: one way delay added to every datagram sent, in milliseconds
+        :param jitterMs: maximal random delay added on top of the latency, in milliseconds
+        :param loss: probability of a datagram to be dropped, in each direction, between 0 and 1
+        :param seed: seed of the random generator, for reproducible runs
+        """
+        if not 0 <= loss <= 1:
+            raise Exception(f"Loss must be between 0 and 1, got {loss}")
+        if latencyMs < 0 or jitterMs < 0:
+            raise Exception(f"Latency and jitter must be positive, got {latencyMs}ms and {jitterMs}ms")
+        self.latencyMs = latencyMs
+        self.jitterMs = jitterMs
+        self.loss = loss
+        self._random = random.Random(seed)
+        self.dropped = 0
+
+    def isLost(self) -> bool:
+        """
+        :return: True if the next datagram should be dropped
+        """
+        lost = self.loss > 0 and self._random.random() < self.loss
+        if lost:
+            self.dropped += 1
+        return lost
+
+    def delay(self) -> float:
+        """
+        :return: delay of the next datagram, in seconds
+        """
+        return (self.latencyMs + self._random.uniform(0, self.jitterMs)) / 1000
+
+    def __str__(self):
+        return f"latency={self.latencyMs}ms jitter={self.jitterMs}ms loss={self.loss * 100:.1f}%"
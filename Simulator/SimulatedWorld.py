@@ -0,0 +1,269 @@
+import math
+import random
+
+from Core.Coordinate import Coordinate
+from Core.DroneState import DroneState
+from Core.Target import Target
+
+# All distances are in UE units (centimeters), angles in degrees, times in seconds
+GROUND_Z = 0.0
+ACTOR_HEIGHT = 180.0  # Actors stand on the ground, their location is their center
+ACTOR_RADIUS = 50.0  # Hit tests hit an actor when the ray reaches the ground closer than this to it
+MAX_HIT_DISTANCE = 100000.0  # Distance returned by getDistanceToCameraDirection when the camera looks at the sky
+
+# Speeds of the primitive controls, multiplied by the amount of the control
+MOVE_SPEED = 500.0  # cm/s, forward/backward and right/left
+CLIMB_SPEED = 300.0  # cm/s
+YAW_SPEED = 90.0  # deg/s
+CAMERA_SPEED = 45.0  # deg/s
+CONTROL_HOLD_TIME = 0.1  # A primitive control moves the drone for this long, unless repeated (the player sends them every 10ms while a key is held)
+
+
+class SimulatedWorld:
+    """
+    Simple kinematic model of the UE world: a drone with a camera flying over flat ground, and the spawned actors standing on it.
+    The world is only advanced by step(), by the thread owning it; it is not thread-safe.
+
+    Conventions of the UE engine are followed: x is forward at yaw 0, y is right, z is up, yaw turns from x towards y, and the camera pitch is
+    positive when looking down.
+    """
+
+    def __init__(self, bounds: tuple[float, float, float, float] = (-5000, -5500, 5500, 8000), horizontalFov: float = 90, aspectRatio: float = 16 / 9,
+                 startLocation: Coordinate = Coordinate(0.0, 0.0, 300.0), seed: int = None):
+        """
+        :param bounds: (minX, minY, maxX, maxY) of the area the actors are spawned in
+        :param horizontalFov: horizontal field of view of the camera, in degrees
+        :param aspectRatio: width / height of the camera image
+        :param startLocation: initial location of the drone
+        :param seed: seed of the random generator placing the actors, for reproducible runs
+        """
+        self.bounds = bounds
+        self.horizontalFov = horizontalFov
+        self.aspectRatio = aspectRatio
+        self._random = random.Random(seed)
+
+        self.x, self.y, self.z = float(startLocation.x), float(startLocation.y), float(startLocation.z)
+        self.yaw = 0.0
+        self.cameraPitch = 0.0
+        self.collisionCount = 0
+        self._onGround = False
+
+        self.spawnedActors: list[Coordinate] = []
+        self.destroyedActors: set[int] = set()
+
+        self._controls = {}  # Primitive control axis -> (amount, time at which the control is released)
+        self._rotation = None  # (degrees left to turn, speed) of rotateXDegrees
+        self._motions = {}  # Blocking control -> motion in progress, see startMotion
+
+    #  Drone state ---------------------------------------------------------------
+
+    def droneState(self) -> DroneState:
+        return DroneState(Coordinate(self.x, self.y, self.z), self.collisionCount)
+
+    def _forward(self) -> tuple[float, float]:
+        yaw = math.radians(self.yaw)
+        return math.cos(yaw), math.sin(yaw)
+
+    #  End Drone state -----------------------------------------------------------
+
+    #  Controls ------------------------------------------------------------------
+
+    def applyControls(self, controls: dict, now: float) -> None:
+        """
+        Apply the primitive controls of a control message (blocking controls are started with startMotion)
+        :param controls: "controls" object of the message body
+        :param now: current time
+        :return: None
+        """
+        if "hover" in controls:
+            self._controls = {}
+            self._rotation = None
+        if "rotateXDegrees" in controls:
+            self._rotation = (float(controls["rotateXDegrees"]), float(controls.get("rotationSpeed", YAW_SPEED)))
+        for axis in ('upAmount', 'pitchForwardAmount', 'rollRightAmount', 'yawRightAmount', 'cameraDownAmount'):
+            if axis in controls:
+                self._controls[axis] = (float(controls[axis]), now + CONTROL_HOLD_TIME)
+
+    def startMotion(self, command: str, controls: dict, reply) -> object or None:
+        """
+        Start a blocking control. A motion of the same kind already in progress is replaced
+        :param command: goto, turnTowards or turnCameraXDeg
+        :param controls: "controls" object of the message body
+        :param reply: any object, returned by step() once the motion is done
+        :return: reply of the replaced motion, or None
+        """
+        replaced = self._motions.pop(command, None)
+        if command == 'goto':
+            goto = controls["goto"]
+            target = (float(goto["gotoXVal"]), float(goto["gotoYVal"]), float(goto["gotoZVal"]))
+            self._motions[command] = (target, float(goto["gotoSpeed"]) * 100, bool(goto["turnWithMove"]), reply)
+        elif command == 'turnTowards':
+            turnTowards = controls["turnTowards"]
+            target = (float(turnTowards["turnTowardsXVal"]), float(turnTowards["turnTowardsYVal"]))
+            self._motions[command] = (target, float(turnTowards["turnTowardsSpeed"]), reply)
+        elif command == 'turnCameraXDeg':
+            turnCamera = controls["turnCameraXDeg"]
+            self._motions[command] = (max(-89.0, min(89.0, float(turnCamera["degrees"]))), float(turnCamera["speedMultiplier"]), reply)
+        else:
+            raise Exception(f"Unknown blocking control: {command}")
+        return None if replaced is None else replaced[-1]
+
+    #  End Controls --------------------------------------------------------------
+
+    #  Kinematics ----------------------------------------------------------------
+
+    def step(self, dt: float, now: float) -> list:
+        """
+        Advance the world by dt seconds
+        :param dt: time elapsed since the last step
+        :param now: current time, to release the primitive controls which were not repeated
+        :return: replies of the blocking controls which finished during the step
+        """
+        finished = []
+        self._controls = {axis: control for axis, control in self._controls.items() if control[1] > now}
+        amount = lambda axis: self._controls.get(axis, (0.0, 0.0))[0]
+
+        forwardX, forwardY = self._forward()
+        forward, right = amount('pitchForwardAmount') * MOVE_SPEED * dt, amount('rollRightAmount') * MOVE_SPEED * dt
+        self.x += forward * forwardX - right * forwardY
+        self.y += forward * forwardY + right * forwardX
+        self.z += amount('upAmount') * CLIMB_SPEED * dt
+        self.yaw += amount('yawRightAmount') * YAW_SPEED * dt
+        self.cameraPitch = max(-89.0, min(89.0, self.cameraPitch + amount('cameraDownAmount') * CAMERA_SPEED * dt))
+
+        if self._rotation is not None:
+            left, speed = self._rotation
+            turn = math.copysign(min(abs(left), abs(speed) * dt), left)
+            self.yaw += turn
+            self._rotation = (left - turn, speed) if abs(left - turn) > 1e-9 else None
+
+        if 'goto' in self._motions:
+            (targetX, targetY, targetZ), speed, turnWithMove, reply = self._motions['goto']
+            dx, dy, dz = targetX - self.x, targetY - self.y, targetZ - self.z
+            distance = math.sqrt(dx * dx + dy * dy + dz * dz)
+            if turnWithMove and dx * dx + dy * dy > 1e-6:
+                self.yaw = math.degrees(math.atan2(dy, dx))
+            if distance <= speed * dt or speed <= 0:
+                self.x, self.y, self.z = targetX, targetY, targetZ
+                finished.append(self._motions.pop('goto')[-1])
+            else:
+                ratio = speed * dt / distance
+                self.x, self.y, self.z = self.x + dx * ratio, self.y + dy * ratio, self.z + dz * ratio
+
+        if 'turnTowards' in self._motions:
+            (targetX, targetY), speed, reply = self._motions['turnTowards']
+            left = (math.degrees(math.atan2(targetY - self.y, targetX - self.x)) - self.yaw + 180) % 360 - 180
+            if abs(left) <= speed * dt or speed <= 0:
+                self.yaw += left
+                finished.append(self._motions.pop('turnTowards')[-1])
+            else:
+                self.yaw += math.copysign(speed * dt, left)
+
+        if 'turnCameraXDeg' in self._motions:
+            target, speed, reply = self._motions['turnCameraXDeg']
+            left = target - self.cameraPitch
+            if abs(left) <= speed * dt or speed <= 0:
+                self.cameraPitch = target
+                finished.append(self._motions.pop('turnCameraXDeg')[-1])
+            else:
+                self.cameraPitch += math.copysign(speed * dt, left)
+
+        self.yaw = (self.yaw + 180) % 360 - 180
+        self._checkCollision()
+        return finished
+
+    def _checkCollision(self) -> None:
+        # A collision is counted each time the drone hits the ground, not while it stays on it
+        onGround = self.z <= GROUND_Z
+        if onGround:
+            self.z = GROUND_Z
+            if not self._onGround:
+                self.collisionCount += 1
+        self._onGround = onGround
+
+    #  End Kinematics ------------------------------------------------------------
+
+    #  Actors --------------------------------------------------------------------
+
+    def spawnActors(self, count: int) -> list[Coordinate]:
+        """
+        Replace the actors by count new ones at random locations in bounds. Locations are whole numbers, so they survive the round trip
+        through the text and binary encodings exactly, like the locations sent by the UE engine
+        :param count: number of actors to spawn
+        :return: locations of the spawned actors
+        """
+        minX, minY, maxX, maxY = self.bounds
+        self.spawnedActors = [Coordinate(float(self._random.randint(int(minX), int(maxX))), float(self._random.randint(int(minY), int(maxY))),
+                                         GROUND_Z + ACTOR_HEIGHT / 2) for _ in range(count)]
+        self.destroyedActors = set()
+        return self.spawnedActors
+
+    def destroyActor(self, index: int) -> bool:
+        """
+        :param index: index of the actor in spawnedActors
+        :return: True if the actor exists (destroying an already destroyed actor succeeds again), False otherwise
+        """
+        if 0 <= index < len(self.spawnedActors):
+            self.destroyedActors.add(index)
+            return True
+        return False
+
+    #  End Actors ----------------------------------------------------------------
+
+    #  Hit tests -----------------------------------------------------------------
+
+    def _ray(self, normalizedX: float, normalizedY: float) -> tuple[float, float, float]:
+        """
+        :param normalizedX: normalized X coordinate on screen, 0 is the left edge
+        :param normalizedY: normalized Y coordinate on screen, 0 is the top edge
+        :return: direction of the ray from the camera through the point on screen
+        """
+        tanHalfFov = math.tan(math.radians(self.horizontalFov / 2))
+        screenRight = (2 * normalizedX - 1) * tanHalfFov
+        screenUp = (1 - 2 * normalizedY) * tanHalfFov / self.aspectRatio
+
+        pitch, yaw = math.radians(self.cameraPitch), math.radians(self.yaw)
+        # Camera axes: forward is pitched down by cameraPitch, up is perpendicular to it
+        forward = (math.cos(pitch) * math.cos(yaw), math.cos(pitch) * math.sin(yaw), -math.sin(pitch))
+        right = (-math.sin(yaw), math.cos(yaw), 0.0)
+        up = (math.sin(pitch) * math.cos(yaw), math.sin(pitch) * math.sin(yaw), math.cos(pitch))
+        return tuple(f + screenRight * r + screenUp * u for f, r, u in zip(forward, right, up))
+
+    def _groundHit(self, normalizedX: float, normalizedY: float) -> tuple[float, tuple[float, float, float]] or None:
+        dx, dy, dz = self._ray(normalizedX, normalizedY)
+        if dz >= 0:
+            return None  # Looking at the sky
+        t = (GROUND_Z - self.z) / dz
+        length = math.sqrt(dx * dx + dy * dy + dz * dz)
+        return t * length, (self.x + t * dx, self.y + t * dy, GROUND_Z)
+
+    def hitTest(self, normalizedX: float = 0.5, normalizedY: float = 0.5) -> Target or None:
+        """
+        :param normalizedX: normalized X coordinate on screen
+        :param normalizedY: normalized Y coordinate on screen
+        :return: the actor seen at the point on screen, the ground if no actor is there, or None if the point is in the sky
+        """
+        hit = self._groundHit(normalizedX, normalizedY)
+        if hit is None:
+            return None
+        _, (hitX, hitY, hitZ) = hit
+
+        nearest, nearestDistance = None, ACTOR_RADIUS
+        for i, actor in enumerate(self.spawnedActors):
+            if i in self.destroyedActors:
+                continue
+            distance = math.hypot(actor.x - hitX, actor.y - hitY)
+            if distance <= nearestDistance:
+                nearest, nearestDistance = i, distance
+        if nearest is not None:
+            return Target(f"BP_Person_C_{nearest}", "BP_Person_C", self.spawnedActors[nearest])
+        return Target("Landscape", "Landscape", Coordinate(hitX, hitY, hitZ))
+
+    def distanceToCameraDirection(self) -> float:
+        """
+        :return: distance to the ground in the direction of the camera in UE units, MAX_HIT_DISTANCE if the camera looks at the sky
+        """
+        hit = self._groundHit(0.5, 0.5)
+        return MAX_HIT_DISTANCE if hit is None else min(hit[0], MAX_HIT_DISTANCE)
+
+    #  End Hit tests -------------------------------------------------------------
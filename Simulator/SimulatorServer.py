@@ -0,0 +1,139 @@
+import heapq
+import itertools
+import time
+
+from Core.DroneProtocol import DEFAULT_DRONE_ID
+from Simulator.NetworkConditions import NetworkConditions
+from Simulator.SimulatedWorld import SimulatedWorld
+from Simulator.UEStandIn import UEStandIn
+
+BLOCKING_CONTROLS = ('goto', 'turnTowards', 'turnCameraXDeg')
+
+
+class SimulatorServer(UEStandIn):
+    """
+    Headless simulator of the UE engine, to run and benchmark the client stack (PublicDroneControl, GradeAI, DummyAlgoThread, PlayerControlsThread)
+    without Unreal Engine. It speaks the same UDP protocol as UEStandIn, but the requests act on a SimulatedWorld advanced in real time:
+    blocking controls (goto, turnTowards, turnCameraXDeg) are only answered once the drone or camera got there, and hit tests see the spawned actors.
+    Every datagram received or sent goes through the NetworkConditions (latency, jitter and loss).
+    Every drone id gets its own SimulatedWorld, created on its first message, so each drone of a fleet (see PublicDroneControl.createFleet) runs an
+    independent episode, e.g. for parallel RL experience collection.
+    """
+
+    def __init__(self, ip: str = "127.0.0.1", port: int = 3001, world: SimulatedWorld = None, networkConditions: NetworkConditions = None,
+                 tickRateHz: float = 100, binarySupported: bool = True, worldFactory=None):
+        """
+        :param ip: IP address the client is listening on
+        :param port: port number of the client receiver socket (the simulator receives on port + 1)
+        :param world: world to simulate, a default SimulatedWorld if None
+        :param networkConditions: impairments of the link, a perfect link if None
+        :param tickRateHz: number of times per second the world is advanced
+        :param binarySupported: False to behave like a UE build which only understands JSON
+        :param worldFactory: function of a drone id returning the world of that drone, called on the first message of the drone (other than the
+                             default drone, whose world is world). If None, the worlds have the bounds and camera of world
+        """
+        UEStandIn.__init__(self, ip, port, binarySupported)
+        self.world = world if world is not None else SimulatedWorld()
+        self.worlds = {DEFAULT_DRONE_ID: self.world}  # Drone id -> world of the drone
+        self._worldFactory = worldFactory
+        self.networkConditions = networkConditions if networkConditions is not None else NetworkConditions()
+        self.droneState = self.world.droneState()
+        self._tickPeriod = 1 / tickRateHz
+        self._lastStep = time.monotonic()
+        self._outgoing = []  # Heap of (time to send, counter, datagram, address) of the delayed datagrams
+        self._counter = itertools.count()  # Breaks ties in the heap, datagrams are not comparable
+
+    def _handleDatagram(self, data: bytes) -> None:
+        if self.networkConditions.isLost():
+            return
+        UEStandIn._handleDatagram(self, data)
+
+    def _sendDatagram(self, datagram: bytes, address: tuple) -> None:
+        if self.networkConditions.isLost():
+            return
+        heapq.heappush(self._outgoing, (time.monotonic() + self.networkConditions.delay(), next(self._counter), datagram, address))
+        self._flushOutgoing()
+
+    def _flushOutgoing(self) -> None:
+        now = time.monotonic()
+        while self._outgoing and self._outgoing[0][0] <= now:
+            _, _, datagram, address = heapq.heappop(self._outgoing)
+            self.udp_socket.sendto(datagram, address)
+
+    def _timeUntilNextTick(self) -> float:
+        timeout = min(UEStandIn._timeUntilNextTick(self), max(0.0, self._lastStep + self._tickPeriod - time.monotonic()))
+        if self._outgoing:
+            timeout = min(timeout, max(0.0, self._outgoing[0][0] - time.monotonic()))
+        return timeout
+
+    def worldOf(self, droneId: int) -> SimulatedWorld:
+        """
+        :param droneId: id of a drone
+        :return: world of the drone, created on its first message
+        """
+        world = self.worlds.get(droneId)
+        if world is None:
+            if self._worldFactory is not None:
+                world = self._worldFactory(droneId)
+            else:
+                world = SimulatedWorld(self.world.bounds, self.world.horizontalFov, self.world.aspectRatio)
+            self.worlds[droneId] = world
+            self.droneStates[droneId] = world.droneState()
+        return world
+
+    def _tick(self) -> None:
+        now = time.monotonic()
+        if now - self._lastStep >= self._tickPeriod:
+            for droneId, world in self.worlds.items():
+                finished = world.step(now - self._lastStep, now)
+                for reply, binary in finished:
+                    self._sendReplies([reply], binary)
+                self.droneStates[droneId] = world.droneState()
+            self._lastStep = now
+        UEStandIn._tick(self)
+        self._flushOutgoing()
+
+    def handle(self, body: dict, binary: bool) -> tuple[str, object] or None:
+        """
+        Apply a request to the simulated world
+        :param body: JSON body of the request
+        :param binary: True if the request was binary encoded
+        :return: tuple of (command, value) of the reply, or None if the request has no reply, or is answered once its motion is done
+        """
+        now = time.monotonic()
+        droneId = body.get("droneId", DEFAULT_DRONE_ID)
+        world = self.worldOf(droneId)
+        controls = body.get("controls", {})
+        for command in BLOCKING_CONTROLS:
+            if command in controls:
+                replaced = world.startMotion(command, controls, ((command, 'Done', body.get("requestId")), binary))
+                if replaced is not None:
+                    self._sendReplies([(command, 'Interrupted', replaced[0][2])], replaced[1])
+                return None
+        if controls:
+            world.applyControls(controls, now)
+            return None
+
+        if "getDroneState" in body:
+            return 'getDroneState', world.droneState()
+        if "getDistanceToCameraDirection" in body:
+            return 'getDistanceToCameraDirection', world.distanceToCameraDirection()
+        if "getCameraTarget" in body:
+            return 'getCameraTarget', world.hitTest()
+        if "GetTargetOfPoint" in body:
+            point = body["GetTargetOfPoint"]
+            return 'GetTargetOfPoint', world.hitTest(point["xVal"], point["yVal"])
+        if "GetTargetsOfPoints" in body:
+            return 'GetTargetsOfPoints', [world.hitTest(point["xVal"], point["yVal"]) for point in body["GetTargetsOfPoints"]]
+        if "SpawnXActors" in body:
+            spawnedActors = world.spawnActors(body["SpawnXActors"])
+            if droneId == DEFAULT_DRONE_ID:
+                self.spawnedActors = spawnedActors
+                self.destroyedActors = world.destroyedActors
+            return 'SpawnXActors', spawnedActors
+        if "DestroyActor" in body:
+            world.destroyActor(body["DestroyActor"])
+            return None
+        if "DestroyActors" in body:
+            return 'DestroyActors', [index for index in body["DestroyActors"] if world.destroyActor(index)]
+        return UEStandIn.handle(self, body, binary)  # Subscriptions, hello, and messages without reply
@@ -0,0 +1,274 @@
+import json
+import socket
+import threading
+import time
+
+from Core.BinaryCodec import SUPPORTED_VERSIONS, decodeRequests, encodeReply, encodeTelemetry, isBinary
+from Core.DroneProtocol import DEFAULT_DRONE_ID, HIT_RESULTS_SEPARATOR
+from Core.Coordinate import Coordinate
+from Core.DroneState import DroneState
+from Core.Target import Target
+
+
+def formatDroneState(state: DroneState) -> str:
+    """
+    :param state: DroneState
+    :return: JSON payload of a getDroneState reply, as sent by the UE engine
+    """
+    return json.dumps({"collisionCount": state.collisionCount, "positionXVal": float(state.location.x), "positionYVal": float(state.location.y),
+                       "positionZVal": float(state.location.z)})
+
+
+def formatHitResult(target: Target or None) -> str:
+    """
+    :param target: Target that was hit, or None
+    :return: payload of a hit test reply, as sent by the UE engine
+    """
+    if target is None:
+        return 'None'
+    position = target.position
+    return f"DisplayName={target.displayName} ClassName={target.className} Location=X={position.x:.3f} Y={position.y:.3f} Z={position.z:.3f}"
+
+
+def formatSpawnedActors(locations: list[Coordinate]) -> str:
+    """
+    :param locations: locations of the spawned actors
+    :return: JSON payload of a SpawnXActors reply, as sent by the UE engine
+    """
+    payload = {}
+    for i, location in enumerate(locations):
+        payload[f"{i}-XLoc"], payload[f"{i}-YLoc"], payload[f"{i}-ZLoc"] = float(location.x), float(location.y), float(location.z)
+    return json.dumps(payload)
+
+
+def formatReplyValue(command: str, value) -> str:
+    """
+    :param command: command of the reply
+    :param value: value of the reply (same types as Core.BinaryCodec.encodeReply)
+    :return: the value as the text payload of a JSON/text reply
+    """
+    if command == 'getDroneState':
+        return formatDroneState(value)
+    if command in ('getCameraTarget', 'GetTargetOfPoint'):
+        return formatHitResult(value)
+    if command == 'GetTargetsOfPoints':
+        return HIT_RESULTS_SEPARATOR.join(formatHitResult(target) for target in value)
+    if command == 'SpawnXActors':
+        return formatSpawnedActors(value)
+    if command == 'DestroyActors':
+        return ','.join(str(index) for index in value)
+    return str(value)
+
+
+class UEStandIn(threading.Thread):
+    """
+    Pure-Python stand-in for the UE engine, speaking the same UDP protocol as PublicDroneControl, in JSON/text and in binary (Core.BinaryCodec).
+    It receives on port + 1 and replies to port, exactly like the UE engine, so PublicDroneControl("127.0.0.1", port) can be used against it without
+    Unreal Engine running. Replies are encoded the same way as the request they answer.
+    The world is static: the drone moves instantly to its goto target, and hit tests never hit anything (see SimulatorServer for a simulated world).
+    Messages carrying a droneId act on that drone, created on its first message; the others act on the default drone.
+    """
+
+    def __init__(self, ip: str = "127.0.0.1", port: int = 3001, binarySupported: bool = True):
+        """
+        :param ip: IP address the client is listening on
+        :param port: port number of the client receiver socket (the stand-in receives on port + 1)
+        :param binarySupported: False to behave like a UE build which only understands JSON (binary messages are ignored)
+        """
+        threading.Thread.__init__(self)
+        self.daemon = True
+        self._stop_event = threading.Event()
+
+        self.udp_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.udp_socket.bind((ip, port + 1))
+        self.ip = ip
+        self.ip_portReply = (ip, port)
+        self.binarySupported = binarySupported
+
+        self.droneStates: dict[int, DroneState] = {DEFAULT_DRONE_ID: DroneState(Coordinate(0.0, 0.0, 0.0), 0)}  # Drone id -> state of the drone
+        self.spawnedActors: list[Coordinate] = []
+        self.destroyedActors: set[int] = set()
+        self.receivedMessages = 0
+
+        # Drone state streams, see PublicDroneControl.subscribeDroneState. Drone id -> {"address", "period", "binary", "sequence", "nextTime"}
+        self._telemetrySubscriptions: dict[int, dict] = {}
+
+    @property
+    def droneState(self) -> DroneState:
+        """
+        State of the default drone
+        """
+        return self.droneStates[DEFAULT_DRONE_ID]
+
+    @droneState.setter
+    def droneState(self, state: DroneState) -> None:
+        self.droneStates[DEFAULT_DRONE_ID] = state
+
+    def stop(self):
+        """
+        Method to be called when the thread should be stopped (stop itself)
+        :return:
+        """
+        self._stop_event.set()
+
+    def stopped(self):
+        """
+        Check if the thread has been stopped
+        :return:
+        """
+        return self._stop_event.is_set()
+
+    def run(self):
+        """
+        Method to be executed by the thread: answer the requests until stopped
+        :return:
+        """
+        while not self.stopped():
+            self.udp_socket.settimeout(self._timeUntilNextTick())
+            try:
+                data, _ = self.udp_socket.recvfrom(65535)
+            except (socket.timeout, BlockingIOError):  # A timeout of 0 makes the socket non-blocking
+                data = None
+            if data is not None:
+                self.receivedMessages += 1
+                self._handleDatagram(data)
+            self._tick()
+        self.udp_socket.close()
+
+    def _tick(self) -> None:
+        """
+        Called after every received datagram, and at least every _timeUntilNextTick seconds
+        :return: None
+        """
+        self._pushTelemetry()
+
+    def _timeUntilNextTick(self) -> float:
+        if not self._telemetrySubscriptions:
+            return 0.1  # Wake up regularly to check if the thread was stopped
+        nextTime = min(subscription["nextTime"] for subscription in self._telemetrySubscriptions.values())
+        return min(0.1, max(0.0, nextTime - time.monotonic()))
+
+    def _sendDatagram(self, datagram: bytes, address: tuple) -> None:
+        self.udp_socket.sendto(datagram, address)
+
+    def _handleDatagram(self, data: bytes) -> None:
+        binary = isBinary(data)
+        if binary and not self.binarySupported:
+            return
+        bodies = decodeRequests(data) if binary else self._decodeJson(data)
+
+        replies = []
+        for body in bodies:
+            reply = self.handle(body, binary)
+            if reply is not None:
+                replies.append((*reply, body.get("requestId")))
+        self._sendReplies(replies, binary)
+
+    def _sendReplies(self, replies: list[tuple[str, object, int or None]], binary: bool) -> None:
+        """
+        Send replies to the client in one datagram
+        :param replies: list of (command, value, requestId) of the replies
+        :param binary: True to binary encode the replies, False to send them as text
+        :return: None
+        """
+        if not replies:
+            return
+        if binary:
+            datagram = b''.join(encodeReply(command, requestId or 0, value) for command, value, requestId in replies)
+        else:
+            datagram = '\n'.join(f"{command}{'' if requestId is None else f'#{requestId}'}:{formatReplyValue(command, value)}"
+                                 for command, value, requestId in replies).encode('utf-8')
+        self._sendDatagram(datagram, self.ip_portReply)
+
+    @staticmethod
+    def _decodeJson(data: bytes) -> list[dict]:
+        body = json.loads(data.decode('utf-8'))
+        if "queries" not in body:
+            return [body]
+        bodies = [{"controls": body["controls"]}] if body.get("controls") else []
+        bodies += body["queries"]
+        if "droneId" in body:  # The drone id of a batch applies to all its controls and queries
+            bodies = [{**sub, "droneId": body["droneId"]} for sub in bodies]
+        return bodies
+
+    def _droneStateOf(self, droneId: int) -> DroneState:
+        """
+        :param droneId: id of a drone
+        :return: state of the drone, created at the origin on its first message
+        """
+        if droneId not in self.droneStates:
+            self.droneStates[droneId] = DroneState(Coordinate(0.0, 0.0, 0.0), 0)
+        return self.droneStates[droneId]
+
+    def handle(self, body: dict, binary: bool) -> tuple[str, object] or None:
+        """
+        Apply a request to the state of the stand-in
+        :param body: JSON body of the request
+        :param binary: True if the request was binary encoded
+        :return: tuple of (command, value) of the reply, or None if the request has no reply (yet)
+        """
+        droneId = body.get("droneId", DEFAULT_DRONE_ID)
+        droneState = self._droneStateOf(droneId)
+        controls = body.get("controls", {})
+        if "goto" in controls:
+            goto = controls["goto"]
+            self.droneStates[droneId] = DroneState(Coordinate(goto["gotoXVal"], goto["gotoYVal"], goto["gotoZVal"]), droneState.collisionCount)
+            return 'goto', 'Done'
+        if "turnTowards" in controls:
+            return 'turnTowards', 'Done'
+        if "turnCameraXDeg" in controls:
+            return 'turnCameraXDeg', 'Done'
+        if "getDroneState" in body:
+            return 'getDroneState', droneState
+        if "getDistanceToCameraDirection" in body:
+            return 'getDistanceToCameraDirection', droneState.location.z
+        if "getCameraTarget" in body:
+            return 'getCameraTarget', None
+        if "GetTargetOfPoint" in body:
+            return 'GetTargetOfPoint', None
+        if "GetTargetsOfPoints" in body:
+            return 'GetTargetsOfPoints', [None] * len(body["GetTargetsOfPoints"])
+        if "SpawnXActors" in body:
+            self.spawnedActors = [Coordinate(float(100 * i), float(100 * i), 0.0) for i in range(body["SpawnXActors"])]
+            self.destroyedActors = set()
+            return 'SpawnXActors', self.spawnedActors
+        if "DestroyActor" in body:
+            self.destroyedActors.add(body["DestroyActor"])
+        if "DestroyActors" in body:
+            destroyed = [index for index in body["DestroyActors"] if 0 <= index < len(self.spawnedActors)]
+            self.destroyedActors.update(destroyed)
+            return 'DestroyActors', destroyed
+        if "subscribeDroneState" in body:
+            subscription = body["subscribeDroneState"]
+            if subscription["rateHz"] > 0:
+                sequence = self._telemetrySubscriptions.get(droneId, {}).get("sequence", 0)
+                self._telemetrySubscriptions[droneId] = {"address": (self.ip, subscription["port"]), "period": 1 / subscription["rateHz"],
+                                                         "binary": binary, "sequence": sequence, "nextTime": 0.0}
+            else:
+                self._telemetrySubscriptions.pop(droneId, None)
+        if "hello" in body:
+            common = set(body["hello"]) & set(SUPPORTED_VERSIONS)
+            return 'hello', max(common) if common else 0
+        return None
+
+    def _pushTelemetry(self) -> None:
+        """
+        Push the state of every subscribed drone whose period elapsed. Binary states pushed to the same address are sent in one datagram
+        :return: None
+        """
+        now = time.monotonic()
+        binaryDatagrams = {}  # Address -> binary messages of the states pushed to it
+        for droneId, subscription in self._telemetrySubscriptions.items():
+            if now < subscription["nextTime"]:
+                continue
+            subscription["nextTime"] = now + subscription["period"]
+            subscription["sequence"] += 1
+            state = self._droneStateOf(droneId)
+            if subscription["binary"]:
+                binaryDatagrams.setdefault(subscription["address"], []).append(encodeTelemetry(subscription["sequence"], state, droneId))
+            else:
+                droneTag = '' if droneId == DEFAULT_DRONE_ID else f'@{droneId}'
+                datagram = f"droneStateStream#{subscription['sequence']}{droneTag}:{formatDroneState(state)}".encode('utf-8')
+                self._sendDatagram(datagram, subscription["address"])
+        for address, messages in binaryDatagrams.items():
+            self._sendDatagram(b''.join(messages), address)
@@ -0,0 +1,34 @@
+import argparse
+import time
+
+from Simulator.NetworkConditions import NetworkConditions
+from Simulator.SimulatedWorld import SimulatedWorld
+from Simulator.SimulatorServer import SimulatorServer
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Headless simulator of the UE engine, run _MainAI or _MainPlayer against it")
+    parser.add_argument('--ip', type=str, default="127.0.0.1", help="IP address of the client")
+    parser.add_argument('--port', type=int, default=3001, help="port of the client receiver socket (the simulator receives on port + 1)")
+    parser.add_argument('--latency-ms', type=float, default=0.0, help="one way latency added to every reply")
+    parser.add_argument('--jitter-ms', type=float, default=0.0, help="maximal random delay added on top of the latency")
+    parser.add_argument('--loss', type=float, default=0.0, help="probability of a datagram to be dropped, in each direction (0 to 1)")
+    parser.add_argument('--tick-rate', type=float, default=100, help="number of times per second the world is advanced")
+    parser.add_argument('--seed', type=int, default=None, help="seed of the random generators, for reproducible runs")
+    parser.add_argument('--json-only', action='store_true', help="behave like a UE build without the binary protocol")
+    args = parser.parse_args()
+
+    networkConditions = NetworkConditions(latencyMs=args.latency_ms, jitterMs=args.jitter_ms, loss=args.loss, seed=args.seed)
+    simulator = SimulatorServer(args.ip, args.port, world=SimulatedWorld(seed=args.seed), networkConditions=networkConditions,
+                                tickRateHz=args.tick_rate, binarySupported=not args.json_only)
+    simulator.start()
+    print(f"Simulator listening on {args.ip}:{args.port + 1}, replying to {args.ip}:{args.port} ({networkConditions})")
+
+    try:
+        while simulator.is_alive():
+            time.sleep(1)
+    except KeyboardInterrupt:
+        print("Received KeyboardInterrupt. Stopping the simulator...")
+    finally:
+        simulator.stop()
+        simulator.join()
+        print(f"Simulator stopped: received {simulator.receivedMessages} datagrams, dropped {networkConditions.dropped}")
@@ -0,0 +1,171 @@
+import collections
+import threading
+import time
+
+from AI.FrameBroker import DROP_NEWEST, DROP_OLDEST
+
+# Policies of a StageQueue, applied when an item arrives while the queue is full
+BLOCK = 'block'  # Wait for room, every item is processed (image and video files)
+STAGE_POLICIES = (DROP_OLDEST, DROP_NEWEST, BLOCK)
+
+_END = object()  # Marks the end of the stream, passed down the stages and never dropped
+
+
+class StageQueue:
+    """
+    Bounded queue between two stages of a DetectionPipeline. When the producing stage is faster than the consuming one, items are dropped
+    according to the policy instead of piling up, so a frame never waits behind stale frames.
+    """
+
+    def __init__(self, maxItems: int = 1, policy: str = DROP_OLDEST):
+        """
+        :param maxItems: size of the queue
+        :param policy: policy when the queue is full, one of STAGE_POLICIES
+        """
+        if policy not in STAGE_POLICIES:
+            raise Exception(f"Unknown stage queue policy: {policy}, expected one of {STAGE_POLICIES}")
+        if maxItems < 1:
+            raise Exception(f"Queue size must be at least 1, got {maxItems}")
+        self.maxItems = maxItems
+        self.policy = policy
+        self._items = collections.deque()
+        self._condition = threading.Condition()
+        self._closed = False
+        self.dropped = 0
+
+    def put(self, item) -> None:
+        with self._condition:
+            if item is _END:
+                self._items.append(item)  # Past the bound, the end of the stream is always delivered
+                self._condition.notify_all()
+                return
+            if self.policy == BLOCK:
+                self._condition.wait_for(lambda: len(self._items) < self.maxItems or self._closed)
+            elif len(self._items) >= self.maxItems:
+                self.dropped += 1
+                if self.policy == DROP_NEWEST:
+                    return
+                self._items.popleft()
+            if self._closed:
+                return
+            self._items.append(item)
+            self._condition.notify_all()
+
+    def get(self):
+        """
+        Wait for the next item
+        :return: the oldest queued item, or _END once the stream ended or the queue was closed
+        """
+        with self._condition:
+            self._condition.wait_for(lambda: self._items or self._closed)
+            if not self._items:
+                return _END
+            item = self._items.popleft()
+            self._condition.notify_all()  # Room for a blocked producer
+            return item
+
+    def close(self) -> None:
+        """
+        Drop the queued items, and wake up the stages waiting on the queue
+        :return: None
+        """
+        with self._condition:
+            self._closed = True
+            self._items.clear()
+            self._condition.notify_all()
+
+
+class DetectionPipeline:
+    """
+    Runs the stages of the detection (e.g. preprocess, inference, postprocess) each on its own worker thread, connected by bounded StageQueues,
+    while the calling thread captures the frames. Preprocessing of frame N+1 overlaps the inference of frame N (torch and cv2 release the GIL),
+    so the throughput is that of the slowest stage rather than of the sum of the stages, and the small queues keep the latency of a frame
+    close to the sum of the stages.
+
+        pipeline = DetectionPipeline([('preprocess', preprocess), ('inference', infer), ('postprocess', postprocess)])
+        pipeline.run(frames)
+    """
+
+    def __init__(self, stages: list, queueSize: int = 1, policy: str = DROP_OLDEST, stop_check=None):
+        """
+        :param stages: (name, function) of the stages, in order. A function receives the item returned by the previous stage (the captured item
+                       for the first one), and may return None to drop it
+        :param queueSize: size of the queue in front of every stage
+        :param policy: policy of the queues when full, one of STAGE_POLICIES
+        :param stop_check: function returning True when the pipeline should stop, checked between captured items
+        """
+        if not stages:
+            raise Exception("A detection pipeline needs at least one stage")
+        self.stages = list(stages)
+        self.stop_check = stop_check
+        self.queues = [StageQueue(queueSize, policy) for _ in self.stages]  # queues[i] feeds stages[i]
+        self.captured = 0
+        self.processed = {name: 0 for name, _ in self.stages}  # Items processed by every stage
+        self.busy = {name: 0.0 for name, _ in self.stages}  # Seconds spent in every stage
+        self._error = None
+
+    def _work(self, index: int) -> None:
+        name, function = self.stages[index]
+        inputs = self.queues[index]
+        outputs = self.queues[index + 1] if index + 1 < len(self.queues) else None
+        while True:
+            item = inputs.get()
+            if item is _END:
+                break
+            start = time.perf_counter()
+            try:
+                item = function(item)
+            except Exception as e:
+                self._error = self._error or e
+                self.stop()
+                return
+            self.busy[name] += time.perf_counter() - start
+            self.processed[name] += 1
+            if item is not None and outputs is not None:
+                outputs.put(item)
+        if outputs is not None:
+            outputs.put(_END)
+
+    def run(self, source) -> None:
+        """
+        Capture the items of source in the calling thread and feed them to the stages, until source is exhausted or stop_check returns True.
+        Returns once every stage has processed its last item
+        :param source: iterable of the captured items (e.g. frames of a dataloader)
+        :return: None. An exception raised by a stage is raised again here
+        """
+        workers = [threading.Thread(target=self._work, args=(i,), name=f'detection-{name}', daemon=True) for i, (name, _) in enumerate(self.stages)]
+        for worker in workers:
+            worker.start()
+        try:
+            for item in source:
+                if self._error is not None or (self.stop_check and self.stop_check()):
+                    break
+                self.captured += 1
+                self.queues[0].put(item)
+        finally:
+            self.queues[0].put(_END)
+            for worker in workers:
+                worker.join()
+        if self._error is not None:
+            raise self._error
+
+    def stop(self) -> None:
+        """
+        Drop the queued items and stop the stages after their current item
+        :return: None
+        """
+        for queue in self.queues:
+            queue.close()
+
+    def dropped(self) -> int:
+        """
+        :return: number of items dropped by the queues since the start
+        """
+        return sum(queue.dropped for queue in self.queues)
+
+    def summary(self) -> str:
+        """
+        :return: average time per item of every stage, and the number of dropped items
+        """
+        stages = ', '.join(f'{name} {self.busy[name] / max(1, self.processed[name]) * 1E3:.1f}ms' for name, _ in self.stages)
+        return f'{stages} per frame, {self.captured} frames captured, {self.dropped()} dropped'
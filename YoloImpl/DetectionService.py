@@ -0,0 +1,247 @@
+import multiprocessing
+import os
+import queue
+import threading
+from pathlib import Path
+
+import cv2
+import numpy as np
+import torch
+
+from AI.DetectionBatch import DetectionBatch
+from AI.ThreadSafeResults import ThreadSafeResults
+from Core.SharedFrameRing import SharedFrameRing
+from YoloImpl.models.common import DetectMultiBackend
+from YoloImpl.utils.augmentations import letterbox
+from YoloImpl.utils.general import check_img_size, non_max_suppression, scale_boxes, xyxy2xywh
+from YoloImpl.utils.torch_utils import select_device
+
+ROOT = Path(__file__).resolve().parents[0]  # YOLOv5 root directory
+_ATTACH_RETRY_PERIOD = 0.1  # Seconds between two attempts to attach to the frame ring, created by the producer with its first frame
+_RESULT_POLL_TIMEOUT = 0.05  # Seconds to wait for a result when every worker is busy, so stop is checked regularly
+_WORKER_JOIN_TIMEOUT = 5.0  # Seconds given to a worker to exit before it is terminated
+
+# Messages of the worker processes on the results queue
+_MESSAGE_READY = 'ready'  # (_MESSAGE_READY, worker index, None): model loaded
+_MESSAGE_RESULT = 'result'  # (_MESSAGE_RESULT, worker index, (sequence, timestamp, DetectionBatch or None if the frame was overwritten))
+_MESSAGE_ERROR = 'error'  # (_MESSAGE_ERROR, worker index, error message): the worker failed and exited
+
+
+class DetectionService(threading.Thread):
+    """
+    Out-of-process Yolo detection: N worker processes, each holding its own DetectMultiBackend, detect objects on the frames of a
+    SharedFrameRing (written by FrameBroker with sharedMemoryName, or by the UE engine), so PyTorch inference and OpenCV preprocessing neither
+    hold the GIL of the control threads (GradeAI, the UDP listener, the logger) nor share their cores.
+    This thread dispatches the newest frame to every idle worker by its sequence number only (the workers read the pixels from the shared
+    memory, without copies), and publishes the DetectionBatch results in latest_results, as YoloDetection does.
+    Each worker uses intra_op_threads PyTorch threads, so workers * intra_op_threads should not exceed the cores left to the control threads.
+    """
+
+    def __init__(self, latest_results: ThreadSafeResults, ring_name: str, weights=ROOT / 'yolov5s.pt', workers: int = 2,
+                 intra_op_threads: int = None, **options):
+        """
+        :param latest_results: results of the detection on the latest frame
+        :param ring_name: name of the SharedFrameRing of the frames
+        :param weights: model path
+        :param workers: number of worker processes
+        :param intra_op_threads: PyTorch threads of every worker, None to share the cores of the host evenly between the workers
+        :param options: detection options of runYoloDetection: data, imgsz, conf_thres, iou_thres, max_det, device, classes, agnostic_nms, half, dnn
+        """
+        threading.Thread.__init__(self)
+        self.daemon = True
+        self._stop_event = threading.Event()
+        self._start_event = threading.Event()  # Event to track if the thread has started
+        if workers < 1:
+            raise Exception(f"A detection service needs at least 1 worker, got {workers}")
+        self.latest_results: ThreadSafeResults = latest_results
+        self.ring_name = ring_name
+        self.workers = workers
+        self.intra_op_threads = intra_op_threads or max(1, (os.cpu_count() or 1) // workers)
+        self.options = dict(options, weights=str(weights))
+
+        context = multiprocessing.get_context('spawn')  # A forked process would inherit the threads and locks of torch and of the control threads
+        self._tasks = context.Queue()  # Sequence numbers of the frames to detect, None stops a worker
+        self._results = context.Queue()
+        self._processes = [context.Process(target=_runWorker, args=(index, self.ring_name, self.intra_op_threads, self.options, self._tasks,
+                                                                    self._results), name=f'detection-worker-{index}', daemon=True)
+                           for index in range(workers)]
+        self._idle = 0  # Workers ready and waiting for a frame
+        self._sequence = 0  # Sequence number of the last frame dispatched
+        self._publishedSequence = 0  # Sequence number of the frame of the last published results
+
+        self.framesDispatched = 0
+        self.framesSkipped = 0  # Frames written to the ring while every worker was busy, never detected
+        self.framesOverwritten = 0  # Frames overwritten by the producer before their worker was done reading them
+        self.resultsStale = 0  # Results of a frame older than the last published one (workers finish out of order), dropped
+
+    def stop(self):
+        """
+        Method to be called when the thread should be stopped (stop itself)
+        :return:
+        """
+        self._stop_event.set()
+
+    def stopped(self):
+        """
+        Check if the thread has been stopped
+        :return:
+        """
+        return self._stop_event.is_set()
+
+    def has_started(self):
+        """
+        Check if the thread has been started.
+        """
+        return self._start_event.is_set()
+
+    def is_running(self):
+        """
+        More explicit method to check if the thread is currently running.
+        """
+        return self.is_alive() and not self.stopped()
+
+    def run(self):
+        """
+        Method to be executed by the thread: start the workers, then dispatch frames and publish results until stopped
+        :return:
+        """
+        self._start_event.set()
+        for process in self._processes:
+            process.start()
+        ring = None
+        try:
+            while not self.stopped():
+                if ring is None:
+                    ring = self._attach()
+                    continue
+                if self._idle > 0:
+                    frame = ring.read(self._sequence, timeout=_RESULT_POLL_TIMEOUT)
+                    if frame is not None:
+                        self.framesSkipped += max(0, frame.sequence - self._sequence - 1)
+                        self._sequence = frame.sequence
+                        self._tasks.put(frame.sequence)
+                        self._idle -= 1
+                        self.framesDispatched += 1
+                self._collect(block=self._idle == 0)
+        finally:
+            self._stopWorkers()
+            if ring is not None:
+                ring.close()
+
+    def _attach(self) -> SharedFrameRing or None:
+        try:
+            return SharedFrameRing(self.ring_name)
+        except FileNotFoundError:  # Not created by the producer yet
+            self._stop_event.wait(_ATTACH_RETRY_PERIOD)
+            self._collect(block=False)  # Workers loading their model
+            return None
+
+    def _collect(self, block: bool) -> None:
+        """
+        Handle the messages of the workers
+        :param block: True to wait for a message (every worker is busy), False to only handle those already received
+        :return: None
+        """
+        timeout = _RESULT_POLL_TIMEOUT if block else None
+        while True:
+            try:
+                kind, index, payload = self._results.get(timeout=timeout) if block else self._results.get_nowait()
+            except queue.Empty:
+                return
+            block = False  # Then only drain the messages already received
+            if kind == _MESSAGE_ERROR:
+                self.stop()
+                raise Exception(f"Detection worker {index} failed: {payload}")
+            self._idle += 1
+            if kind == _MESSAGE_RESULT:
+                sequence, timestamp, results = payload
+                if results is None:
+                    self.framesOverwritten += 1
+                elif sequence < self._publishedSequence:
+                    self.resultsStale += 1
+                else:
+                    self._publishedSequence = sequence
+                    self.latest_results.update_results(results, frameTimestamp=timestamp)
+
+    def _stopWorkers(self) -> None:
+        for _ in self._processes:
+            self._tasks.put(None)
+        for process in self._processes:
+            if process.pid is None:
+                continue
+            process.join(timeout=_WORKER_JOIN_TIMEOUT)
+            if process.is_alive():
+                process.terminate()
+
+
+def _runWorker(index: int, ring_name: str, intra_op_threads: int, options: dict, tasks, results) -> None:
+    # Entry point of a worker process: load the model, then detect the frames whose sequence numbers are received on tasks
+    try:
+        torch.set_num_threads(intra_op_threads)
+        cv2.setNumThreads(1)  # The letterbox of one frame does not benefit from more, and would compete with the PyTorch threads
+
+        detector = _FrameDetector(**options)
+    except Exception as e:
+        results.put((_MESSAGE_ERROR, index, repr(e)))
+        return
+    results.put((_MESSAGE_READY, index, None))
+
+    ring = None
+    while True:
+        sequence = tasks.get()
+        if sequence is None:
+            break
+        try:
+            if ring is None:
+                ring = SharedFrameRing(ring_name)
+            frame = ring.readSequence(sequence)
+            batch = detector.detect(frame, ring) if frame is not None else None
+            results.put((_MESSAGE_RESULT, index, (sequence, frame.timestamp if frame is not None else 0.0, batch)))
+        except Exception as e:
+            results.put((_MESSAGE_ERROR, index, repr(e)))
+            break
+    if ring is not None:
+        ring.close()
+
+
+class _FrameDetector:
+    """
+    Model of a worker process, and the preprocessing and postprocessing of runYoloDetection for one frame of a SharedFrameRing
+    """
+
+    def __init__(self, weights, data=ROOT / 'data/coco128.yaml', imgsz=(640, 640), conf_thres=0.25, iou_thres=0.45, max_det=1000, device='cpu',
+                 classes=None, agnostic_nms=False, half=False, dnn=False):
+        self.model = DetectMultiBackend(weights, device=select_device(device), dnn=dnn, data=data, fp16=half)
+        self.imgsz = check_img_size(imgsz, s=self.model.stride)  # check image size
+        self.conf_thres, self.iou_thres, self.max_det = conf_thres, iou_thres, max_det
+        self.classes, self.agnostic_nms = classes, agnostic_nms
+        self.model.warmup(imgsz=(1, 3, *self.imgsz))  # warmup
+
+    def detect(self, frame, ring: SharedFrameRing) -> DetectionBatch or None:
+        """
+        :param frame: Frame of the ring, a view on the shared memory
+        :param ring: ring of the frame
+        :return: objects detected on the frame, or None if the producer overwrote the frame while it was being read
+        """
+        im0 = frame.image
+        im = letterbox(im0, self.imgsz, stride=self.model.stride, auto=self.model.pt)[0]  # padded resize
+        im = np.ascontiguousarray(im.transpose((2, 0, 1))[::-1])  # HWC to CHW, BGR to RGB, the only copy of the frame
+        if not ring.isValid(frame):
+            return None
+        shape0 = im0.shape
+
+        with torch.inference_mode():
+            im = torch.from_numpy(im).to(self.model.device)
+            im = im.half() if self.model.fp16 else im.float()  # uint8 to fp16/32
+            im /= 255  # 0 - 255 to 0.0 - 1.0
+            pred = self.model(im[None])
+            det = non_max_suppression(pred, self.conf_thres, self.iou_thres, self.classes, self.agnostic_nms, max_det=self.max_det)[0]
+            if not len(det):
+                return DetectionBatch.empty(self.model.names)
+            # In place updates of the inference tensors are only allowed within the inference mode
+            det[:, :4] = scale_boxes(im.shape[1:], det[:, :4], shape0).round()
+            det = det.cpu()
+            gn = torch.tensor(shape0)[[1, 0, 1, 0]]  # normalization gain whwh
+            xywhn = xyxy2xywh(det[:, :4]) / gn
+        return DetectionBatch.fromArrays(self.model.names, det[:, 5].numpy(), det[:, 4].numpy(), xywhn.numpy(), det[:, :4].numpy(),
+                                         frame.sequence, frame.timestamp)
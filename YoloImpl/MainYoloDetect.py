@@ -7,6 +7,7 @@ Usage - sources:
                                                      img.jpg                         # image
                                                      vid.mp4                         # video
                                                      screen                          # screenshot
+                                                     shm://name                      # shared memory frame ring (Core.SharedFrameRing)
                                                      path/                           # directory
                                                      list.txt                        # list of images
                                                      list.streams                    # list of streams
@@ -33,16 +34,21 @@ import csv
 import os
 import sys
 import threading
+import time
 from pathlib import Path
-from typing import List
 
 import torch
 from AI.ThreadSafeResults import ThreadSafeResults
 from ultralytics.utils.plotting import Annotator, colors, save_one_box
 
-from AI.YoloDetectionObject import YoloDetectionObject
+from AI.DetectionBatch import DetectionBatch
+from AI.DetectionTracker import DEFAULT_MAX_AGE, DetectionTracker
+from AI.FrameBroker import DROP_OLDEST
+from YoloImpl.DetectionPipeline import BLOCK, STAGE_POLICIES, DetectionPipeline
+from YoloImpl.TiledInference import TiledInference
 from YoloImpl.models.common import DetectMultiBackend
-from YoloImpl.utils.dataloaders import IMG_FORMATS, VID_FORMATS, LoadImages, LoadScreenshots, LoadStreams
+from YoloImpl.utils.dataloaders import (IMG_FORMATS, VID_FORMATS, LoadFrameSubscription, LoadImages, LoadScreenshots, LoadSharedMemory,
+                                        LoadStreams)
 from YoloImpl.utils.general import (LOGGER, Profile, check_file, check_img_size, check_imshow, check_requirements, colorstr, cv2,
                                     increment_path, non_max_suppression, print_args, scale_boxes, strip_optimizer, xyxy2xywh)
 from YoloImpl.utils.torch_utils import select_device, smart_inference_mode
@@ -53,7 +59,7 @@ def parse_opt(ROOT):
     parser.add_argument('--weights', nargs='+', type=str, default=ROOT / 'yolov5s.pt', help='model path or triton URL')
 
     # for images (not video feed) - parser.add_argument('--source', type=str, default=ROOT / 'data/images', help='file/dir/URL/glob/screen/0(webcam)')
-    parser.add_argument('--source', type=str, default=0, help='file/dir/URL/glob/screen/0(webcam)')
+    parser.add_argument('--source', type=str, default=0, help='file/dir/URL/glob/screen/shm://name/0(webcam)')
 
     parser.add_argument('--data', type=str, default=ROOT / 'data/coco128.yaml', help='(optional) dataset.yaml path')
     parser.add_argument('--imgsz', '--img', '--img-size', nargs='+', type=int, default=[640], help='inference size h,w')
@@ -81,6 +87,15 @@ def parse_opt(ROOT):
     parser.add_argument('--half', action='store_true', help='use FP16 half-precision inference')
     parser.add_argument('--dnn', action='store_true', help='use OpenCV DNN for ONNX inference')
     parser.add_argument('--vid-stride', type=int, default=1, help='video frame-rate stride')
+    parser.add_argument('--tile', action='store_true', help='slice the frames into overlapping tiles run at full resolution (small objects)')
+    parser.add_argument('--tile-size', type=int, default=640, help='size of the tiles, in pixels of the frame')
+    parser.add_argument('--tile-overlap', type=float, default=0.2, help='fraction of a tile shared with its neighbours')
+    parser.add_argument('--track', action='store_true', help='give the detections stable track ids across frames')
+    parser.add_argument('--keyframe-interval', type=int, default=1, help='run the detector every k frames, tracks are propagated in between')
+    parser.add_argument('--serial', action='store_true', help='run the detection stages in one thread instead of a pipeline')
+    parser.add_argument('--queue-size', type=int, default=1, help='size of the queues between the pipeline stages')
+    parser.add_argument('--drop-policy', choices=STAGE_POLICIES, default=None, help='policy of the full pipeline queues (default: '
+                                                                                    'block on files, drop-oldest on live sources)')
     opt = parser.parse_args()
     opt.imgsz *= 2 if len(opt.imgsz) == 1 else 1  # expand
     print_args(vars(opt))
@@ -95,6 +110,7 @@ def runYoloDetection(
         project,  # save results to project/name
         shared_results: ThreadSafeResults,
         stop_check=None,
+        frame_source=None,  # AI.FrameBroker.FrameSubscription to read the frames from, replaces source
         imgsz=(640, 640),  # inference size (height, width)
         conf_thres=0.25,  # confidence threshold
         iou_thres=0.45,  # NMS IOU threshold
@@ -119,13 +135,24 @@ def runYoloDetection(
         half=False,  # use FP16 half-precision inference
         dnn=False,  # use OpenCV DNN for ONNX inference
         vid_stride=1,  # video frame-rate stride
+        serial=False,  # run preprocess, inference and postprocess one after another in one thread instead of a DetectionPipeline
+        queue_size=1,  # size of the queues between the stages of the DetectionPipeline
+        drop_policy=None,  # policy of the full queues, one of STAGE_POLICIES, None for BLOCK on files and DROP_OLDEST on live sources
+        batcher=None,  # YoloImpl.MicroBatcher running the model shared with the detections of other streams, replaces weights
+        tile=False,  # tiled inference, for small objects (see YoloImpl.TiledInference)
+        tile_size=640,  # size of the tiles, in pixels of the frame
+        tile_overlap=0.2,  # fraction of a tile shared with its neighbours
+        track=False,  # give the detections stable track ids (see AI.DetectionTracker)
+        keyframe_interval=1,  # run the detector on one frame out of keyframe_interval, and propagate the tracks on the others
 ):
     source = str(source)
     save_img = not nosave and not source.endswith('.txt')  # save inference images
     is_file = Path(source).suffix[1:] in (IMG_FORMATS + VID_FORMATS)
     is_url = source.lower().startswith(('rtsp://', 'rtmp://', 'http://', 'https://'))
-    webcam = source.isnumeric() or source.endswith('.streams') or (is_url and not is_file)
-    screenshot = source.lower().startswith('screen')
+    broker = frame_source is not None
+    webcam = not broker and (source.isnumeric() or source.endswith('.streams') or (is_url and not is_file))
+    screenshot = not broker and source.lower().startswith('screen')
+    shared_memory = not broker and source.lower().startswith('shm://')
     if is_url and is_file:
         source = check_file(source)  # download
 
@@ -134,72 +161,129 @@ def runYoloDetection(
     (save_dir / 'labels' if save_txt else save_dir).mkdir(parents=True, exist_ok=True)  # make dir
 
     # Load model
-    device = select_device(device)
-    model = DetectMultiBackend(weights, device=device, dnn=dnn, data=data, fp16=half)
+    if batcher is not None:
+        model = batcher.model  # shared with the detections of the other streams
+    else:
+        device = select_device(device)
+        model = DetectMultiBackend(weights, device=device, dnn=dnn, data=data, fp16=half)
     stride, names, pt = model.stride, model.names, model.pt
     imgsz = check_img_size(imgsz, s=stride)  # check image size
+    auto = pt and batcher is None  # letterbox to exactly imgsz when batched, so the frames of all the streams have the same shape
+    tiler = None
+    if tile:  # slice the frames into tiles run at full resolution, for small objects
+        tiler = TiledInference(check_img_size(tile_size, s=stride), tile_overlap, conf_thres=conf_thres, iou_thres=iou_thres, classes=classes,
+                               agnostic_nms=agnostic_nms, max_det=max_det)
 
     # Dataloader
     bs = 1  # batch_size
-    if webcam:
+    if broker:
+        dataset = LoadFrameSubscription(frame_source, img_size=imgsz, stride=stride, auto=auto)
+    elif webcam:
         view_img = check_imshow(warn=True)
-        dataset = LoadStreams(source, img_size=imgsz, stride=stride, auto=pt, vid_stride=vid_stride)
+        dataset = LoadStreams(source, img_size=imgsz, stride=stride, auto=auto, vid_stride=vid_stride)
         bs = len(dataset)
     elif screenshot:
-        dataset = LoadScreenshots(source, img_size=imgsz, stride=stride, auto=pt)
+        dataset = LoadScreenshots(source, img_size=imgsz, stride=stride, auto=auto)
+    elif shared_memory:
+        dataset = LoadSharedMemory(source, img_size=imgsz, stride=stride, auto=auto)
     else:
-        dataset = LoadImages(source, img_size=imgsz, stride=stride, auto=pt, vid_stride=vid_stride)
+        dataset = LoadImages(source, img_size=imgsz, stride=stride, auto=auto, vid_stride=vid_stride)
     vid_path, vid_writer = [None] * bs, [None] * bs
+    if tiler is not None and bs > 1:
+        raise Exception(f"Tiled inference runs one stream at a time, got {bs} streams")
+    tracker = None
+    if keyframe_interval < 1:
+        raise Exception(f"Keyframe interval must be at least 1, got {keyframe_interval}")
+    if track or keyframe_interval > 1:  # stable track ids, and propagation of the tracks between keyframes
+        if bs > 1:
+            raise Exception(f"Tracking runs on one stream at a time, got {bs} streams")
+        tracker = DetectionTracker(maxAge=max(DEFAULT_MAX_AGE, 3 * keyframe_interval))
 
     # Run inference
-    model.warmup(imgsz=(1 if pt or model.triton else bs, 3, *imgsz))  # warmup
+    if batcher is None:  # the batcher warms up the shared model with a full batch
+        model.warmup(imgsz=(1 if pt or model.triton else bs, 3, *imgsz))  # warmup
     # Variable declaration
     seen, windows, dt = 0, [], (Profile(), Profile(), Profile())
-    all_coordinates = []  # List to store bounding box coordinates
-    # Loop over dataset
-    for path, im, im0s, vid_cap, s in dataset:
-        if stop_check and stop_check():
-            break
+
+    # Define the path for the CSV file
+    csv_path = save_dir / 'predictions.csv'
+
+    # Create or append to the CSV file
+    def write_to_csv(image_name, prediction, confidence):
+        data = {'Image Name': image_name, 'Prediction': prediction, 'Confidence': confidence}
+        with open(csv_path, mode='a', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=data.keys())
+            if not csv_path.is_file():
+                writer.writeheader()
+            writer.writerow(data)
+
+    def first_frame(im0s):  # the frame to tile or track, LoadStreams gives a list of the frames of its streams (a single stream then)
+        return im0s[0] if webcam else im0s
+
+    # Stages of the detection, run one after another (serial) or each on its own worker (DetectionPipeline). A frame is a dict, filled by the stages.
+    # The inference mode of torch is per thread, so every stage enters it
+    def capture():
+        for index, (path, im, im0s, vid_cap, s) in enumerate(dataset):  # Letterbox and HWC to CHW are done by the dataloader
+            if stop_check and stop_check():
+                break
+            frame_timestamp = time.monotonic()  # time at which the frame was received from the dataloader
+            frame = dataset.count if webcam else getattr(dataset, 'frame', 0)  # read now, the dataloader is ahead when pipelined
+            keyframe = index % keyframe_interval == 0  # other frames skip the detector, their tracks are propagated
+            yield {'path': path, 'im': im, 'im0s': im0s, 's': s, 'frame': frame, 'frame_timestamp': frame_timestamp, 'keyframe': keyframe}
+
+    @smart_inference_mode()
+    def preprocess(item):
+        if not item['keyframe']:
+            return item
         with dt[0]:
-            im = torch.from_numpy(im).to(model.device)
+            if tiler is not None:
+                item['im'], item['tiles'] = tiler.slice(first_frame(item['im0s']))  # batch of the tiles of the frame
+            im = torch.from_numpy(item['im']).to(model.device)
             im = im.half() if model.fp16 else im.float()  # uint8 to fp16/32
             im /= 255  # 0 - 255 to 0.0 - 1.0
             if len(im.shape) == 3:
                 im = im[None]  # expand for batch dim
+            item['im'] = im
+        return item
 
-        # Inference
+    @smart_inference_mode()
+    def infer(item):
+        if not item['keyframe']:
+            return item
         with dt[1]:
-            visualize = increment_path(save_dir / Path(path).stem, mkdir=True) if visualize else False
-            pred = model(im, augment=augment, visualize=visualize)
-
+            visualize_path = increment_path(save_dir / Path(item['path']).stem, mkdir=True) if visualize else False
+            if batcher is not None:
+                item['pred'] = batcher.infer(item['im'])  # run with the frames of the other streams
+            else:
+                item['pred'] = model(item['im'], augment=augment, visualize=visualize_path)
+        return item
+
+    @smart_inference_mode()
+    def postprocess(item):
+        nonlocal seen
+        if not item['keyframe']:
+            shared_results.update_results(tracker.predict(item['frame'], item['frame_timestamp']), frameTimestamp=item['frame_timestamp'])
+            return
         # NMS
         with dt[2]:
-            pred = non_max_suppression(pred, conf_thres, iou_thres, classes, agnostic_nms, max_det=max_det)
+            if tiler is not None:
+                pred = [tiler.merge(item['pred'], item['tiles'], first_frame(item['im0s']).shape)]  # already in pixels of im0
+            else:
+                pred = non_max_suppression(item['pred'], conf_thres, iou_thres, classes, agnostic_nms, max_det=max_det)
 
         # Second-stage classifier (optional)
         # pred = utils.general.apply_classifier(pred, classifier_model, im, im0s)
 
-        # Define the path for the CSV file
-        csv_path = save_dir / 'predictions.csv'
-
-        # Create or append to the CSV file
-        def write_to_csv(image_name, prediction, confidence):
-            data = {'Image Name': image_name, 'Prediction': prediction, 'Confidence': confidence}
-            with open(csv_path, mode='a', newline='') as f:
-                writer = csv.DictWriter(f, fieldnames=data.keys())
-                if not csv_path.is_file():
-                    writer.writeheader()
-                writer.writerow(data)
-
         # Process predictions
+        path, im, im0s, s, frame, frame_timestamp = item['path'], item['im'], item['im0s'], item['s'], item['frame'], item['frame_timestamp']
+        results = None  # Detections of the first image with detected objects
         for i, det in enumerate(pred):  # per image
             seen += 1
-            coordinates_and_labels_for_image = []  # List to store coordinates for the current image
             if webcam:  # batch_size >= 1
-                p, im0, frame = path[i], im0s[i].copy(), dataset.count
+                p, im0 = path[i], im0s[i]  # not drawn on, no need to copy (im0 may be a view on shared memory)
                 s += f'{i}: '
             else:
-                p, im0, frame = path, im0s.copy(), getattr(dataset, 'frame', 0)
+                p, im0 = path, im0s
 
             p = Path(p)  # to Path
             save_path = str(save_dir / p.name)  # im.jpg
@@ -210,45 +294,45 @@ def runYoloDetection(
             annotator = Annotator(im0, line_width=line_thickness, example=str(names))
             if len(det):
                 # Rescale boxes from img_size to im0 size
-                det[:, :4] = scale_boxes(im.shape[2:], det[:, :4], im0.shape).round()
+                if tiler is None:
+                    det[:, :4] = scale_boxes(im.shape[2:], det[:, :4], im0.shape).round()
 
                 # Print results
                 for c in det[:, 5].unique():
                     n = (det[:, 5] == c).sum()  # detections per class
                     s += f"{n} {names[int(c)]}{'s' * (n > 1)}, "  # add to string
 
-                # Write results
-                for *xyxy, conf, cls in reversed(det):
-                    c = int(cls)  # integer class
-                    label = f'{names[c]}'
-
-                    xywh = (xyxy2xywh(torch.tensor(xyxy).view(1, 4)) / gn).view(-1).tolist()  # Coordinates format:  x_center, y_center, width, height
-
-                    # xyxy = ((torch.tensor(xyxy).view(1, 4)) / gn).view(-1).tolist()  # Coordinates format:   (xmin, ymin, xmax, ymax)
+                # Write results, all boxes at once
+                if results is None:
+                    det_cpu = det.cpu()
+                    xywhn = xyxy2xywh(det_cpu[:, :4]) / gn  # Coordinates format:  x_center, y_center, width, height (normalized)
+                    results = DetectionBatch.fromArrays(names, det_cpu[:, 5].numpy(), det_cpu[:, 4].numpy(), xywhn.numpy(), det_cpu[:, :4].numpy(),
+                                                        frame, frame_timestamp)
 
-                    line = (label, *xywh, float(conf))  # Format: label, x_center, y_center, width, height, confidence
-
-                    printed_line = ('%s ' * len(line)).rstrip() % line
-                    coordinates_and_labels_for_image.append(printed_line)
-
-                    if save_crop:
-                        save_one_box(xyxy, imc, file=save_dir / 'crops' / names[c] / f'{p.stem}.jpg', BGR=True)
-
-                # Append the coordinates for the current image to the overall list
-                all_coordinates.append(coordinates_and_labels_for_image)
+                if save_crop:
+                    for *xyxy, conf, cls in reversed(det):
+                        save_one_box(xyxy, imc, file=save_dir / 'crops' / names[int(cls)] / f'{p.stem}.jpg', BGR=True)
 
         # LOGGER.info(f"{s}{'' if len(det) else '(no detections), '}{dt[1].dt * 1E3:.1f}ms")  # Print time (inference-only)
 
-        # Construct object detection results
-        retList: List[YoloDetectionObject] = []
-        if len(all_coordinates) != 0:
-            for i in range(len(all_coordinates[0])):
-                currDetection = all_coordinates[0][i].split(' ')
-                retList.append(YoloDetectionObject(currDetection))
-
         # Update shared_results with the latest detection results
-        all_coordinates.clear()
-        shared_results.update_results(retList)
+        results = results if results is not None else DetectionBatch.empty(names)
+        if tracker is not None:
+            results = tracker.update(results, first_frame(im0s).shape)
+        shared_results.update_results(results, frameTimestamp=frame_timestamp)
+
+    # Loop over dataset
+    if serial:
+        for item in capture():
+            postprocess(infer(preprocess(item)))
+    else:
+        if drop_policy is None:  # Every frame of image and video files is detected, live sources skip the frames the stages cannot keep up with
+            # (in keyframe mode the stages never drop, a dropped keyframe would skip the detector; live dataloaders skip frames themselves)
+            drop_policy = BLOCK if isinstance(dataset, LoadImages) or keyframe_interval > 1 else DROP_OLDEST
+        pipeline = DetectionPipeline([('preprocess', preprocess), ('inference', infer), ('postprocess', postprocess)],
+                                     queueSize=queue_size, policy=drop_policy, stop_check=stop_check)
+        pipeline.run(capture())
+        LOGGER.info(f'Detection pipeline: {pipeline.summary()}')
 
     if save_txt or save_img:
         s = f"\n{len(list(save_dir.glob('labels/*.txt')))} labels saved to {save_dir / 'labels'}" if save_txt else ''
@@ -261,12 +345,19 @@ class YoloDetection(threading.Thread):
     """
     This is a thread which is running the detection using YOLO
     """
-    def __init__(self, latest_results: ThreadSafeResults):
+    def __init__(self, latest_results: ThreadSafeResults, frame_source=None, batcher=None):
+        """
+        :param latest_results: results of the detection on the latest frame
+        :param frame_source: AI.FrameBroker.FrameSubscription to read the frames from, None to open the --source given on the command line
+        :param batcher: YoloImpl.MicroBatcher shared by the detections of several streams (e.g. one per drone), None to load a model
+        """
         # Initializing the thread without running it
         threading.Thread.__init__(self)
         self._stop_event = threading.Event()
         self._start_event = threading.Event()  # Event to track if the thread has started
         self.latest_results: ThreadSafeResults = latest_results
+        self.frame_source = frame_source
+        self.batcher = batcher
 
         # Finding folder root
         FILE = Path(__file__).resolve()
@@ -281,6 +372,8 @@ class YoloDetection(threading.Thread):
         :return: 
         """""
         self._stop_event.set()
+        if self.frame_source is not None:
+            self.frame_source.close()  # Wake up the detection waiting for a frame
 
     def stopped(self):
         """
@@ -310,4 +403,5 @@ class YoloDetection(threading.Thread):
         self._start_event.set()
         check_requirements(self.ROOT / 'requirements.txt', exclude=('tensorboard', 'thop'))
         opt = parse_opt(self.ROOT)
-        runYoloDetection(shared_results=self.latest_results, stop_check=self.stopped, **vars(opt))
+        runYoloDetection(shared_results=self.latest_results, stop_check=self.stopped, frame_source=self.frame_source, batcher=self.batcher,
+                         **vars(opt))
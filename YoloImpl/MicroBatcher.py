@@ -0,0 +1,167 @@
+import collections
+import threading
+import time
+from concurrent.futures import Future
+
+import torch
+
+from YoloImpl.models.common import DetectMultiBackend
+
+
+class MicroBatcher(threading.Thread):
+    """
+    Thread running the inference of a DetectMultiBackend shared by the detections of several streams (drones, cameras), in batches: frames
+    submitted at irregular times are collected until max_batch frames are waiting or the oldest one waited max_wait_ms, then run as one tensor
+    batch, and the predictions are scattered back to the streams. When many streams are active the model runs once for several frames, so
+    throughput per core goes up, and a frame never waits more than max_wait_ms for others.
+    Frames are only batched with frames of the same shape, so the streams should letterbox to a fixed size (auto=False), as runYoloDetection
+    does when given a batcher.
+
+        batcher = MicroBatcher(DetectMultiBackend(weights), max_batch=8, max_wait_ms=5, imgsz=(640, 640))
+        batcher.start()
+        pred = batcher.infer(im)  # From the detection thread of every stream, im of shape (1, 3, h, w)
+    """
+
+    def __init__(self, model: DetectMultiBackend, max_batch: int = 8, max_wait_ms: float = 5.0, augment=False, imgsz=None):
+        """
+        :param model: model shared by the streams. Must accept a dynamic batch size if max_batch > 1 (PyTorch, TorchScript, ONNX...)
+        :param max_batch: maximal number of frames run at once
+        :param max_wait_ms: maximal time a frame waits for other frames before its batch is run
+        :param augment: augmented inference
+        :param imgsz: (height, width) to warm up the model with a full batch, None to not warm it up
+        """
+        threading.Thread.__init__(self)
+        self.daemon = True
+        self._stop_event = threading.Event()
+        if max_batch < 1:
+            raise Exception(f"Batches must hold at least 1 frame, got {max_batch}")
+        self.model = model
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self.augment = augment
+        self.imgsz = imgsz
+        self._pending = collections.deque()  # (frames, Future, time.monotonic() of the submission), oldest first
+        self._condition = threading.Condition()
+
+        self.batches = 0
+        self.frames = 0
+
+    def stop(self):
+        """
+        Method to be called when the thread should be stopped (stop itself)
+        :return:
+        """
+        with self._condition:
+            self._stop_event.set()
+            self._condition.notify_all()
+
+    def stopped(self):
+        """
+        Check if the thread has been stopped
+        :return:
+        """
+        return self._stop_event.is_set()
+
+    def is_running(self):
+        """
+        More explicit method to check if the thread is currently running.
+        """
+        return self.is_alive() and not self.stopped()
+
+    def submit(self, im: torch.Tensor) -> Future:
+        """
+        :param im: preprocessed frames of one stream, of shape (n, 3, h, w), usually n = 1
+        :return: Future of the prediction of the model for these frames, as if the model was run on im alone
+        """
+        future = Future()
+        with self._condition:
+            if self.stopped():
+                raise Exception("Cannot submit frames to a stopped micro-batcher")
+            self._pending.append((im, future, time.monotonic()))
+            self._condition.notify_all()
+        return future
+
+    def infer(self, im: torch.Tensor, timeout: float = None):
+        """
+        Run the model on frames of one stream, batched with the frames of the other streams
+        :param im: preprocessed frames, of shape (n, 3, h, w)
+        :param timeout: maximal number of seconds to wait for the prediction, None waits forever
+        :return: prediction of the model for im
+        """
+        return self.submit(im).result(timeout=timeout)
+
+    def averageBatchSize(self) -> float:
+        return self.frames / self.batches if self.batches else 0.0
+
+    def _nextBatch(self) -> list:
+        """
+        Wait until a batch is due: max_batch frames of the shape of the oldest frame are waiting, or the oldest frame waited max_wait
+        :return: (frames, Future) of the batch, empty once stopped
+        """
+        with self._condition:
+            while True:
+                if self.stopped():
+                    return []
+                if self._pending:
+                    shape = self._pending[0][0].shape[1:]
+                    waiting = sum(len(im) for im, _, _ in self._pending if im.shape[1:] == shape)
+                    remaining = self._pending[0][2] + self.max_wait - time.monotonic()
+                    if waiting >= self.max_batch or remaining <= 0:
+                        break
+                    self._condition.wait(remaining)
+                else:
+                    self._condition.wait()
+
+            batch, kept, size = [], collections.deque(), 0
+            for im, future, submitted in self._pending:
+                if im.shape[1:] == shape and (not batch or size + len(im) <= self.max_batch):
+                    batch.append((im, future))
+                    size += len(im)
+                else:
+                    kept.append((im, future, submitted))
+            self._pending = kept
+            return batch
+
+    def run(self):
+        """
+        Method to be executed by the thread: run the batches of frames until stopped
+        :return:
+        """
+        if self.imgsz is not None:
+            self.model.warmup(imgsz=(self.max_batch, 3, *self.imgsz))  # warmup with a full batch
+        try:
+            while True:
+                batch = self._nextBatch()
+                if not batch:
+                    break
+                try:
+                    with torch.inference_mode():
+                        pred = self.model(torch.cat([im for im, _ in batch]) if len(batch) > 1 else batch[0][0], augment=self.augment)
+                except Exception as e:
+                    for _, future in batch:
+                        future.set_exception(e)
+                    continue
+                self.batches += 1
+                offset = 0
+                for im, future in batch:
+                    future.set_result(_scatter(pred, offset, offset + len(im)))
+                    offset += len(im)
+                self.frames += offset
+        finally:
+            with self._condition:
+                for _, future, _ in self._pending:
+                    future.set_exception(Exception("The micro-batcher was stopped"))
+                self._pending.clear()
+
+
+def _scatter(pred, start: int, end: int):
+    """
+    :param pred: output of DetectMultiBackend.forward for a batch: a tensor, or a list or tuple of tensors (and of lists of tensors, or None)
+                 whose first dimension is the batch
+    :return: same structure, with the rows start to end of the batch only
+    """
+    if isinstance(pred, (list, tuple)):
+        return type(pred)(_scatter(x, start, end) for x in pred)
+    if isinstance(pred, torch.Tensor):
+        return pred[start:end]
+    return pred
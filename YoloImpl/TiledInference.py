@@ -0,0 +1,128 @@
+import numpy as np
+import torch
+
+from YoloImpl.utils.augmentations import letterbox
+from YoloImpl.utils.general import clip_boxes, non_max_suppression
+
+
+def tileStarts(length: int, tile: int, overlap: float) -> list[int]:
+    """
+    :param length: size of the frame along one axis, in pixels
+    :param tile: size of the tiles along this axis
+    :param overlap: fraction of a tile shared with the next tile
+    :return: start of every tile, the last one aligned on the end of the frame so the tiles cover the whole frame
+    """
+    if length <= tile:
+        return [0]
+    step = max(1, int(tile * (1 - overlap)))
+    starts = list(range(0, length - tile, step))
+    return starts + [length - tile]
+
+
+class TiledInference:
+    """
+    Tiled (SAHI-style) inference, for objects of a few pixels such as people seen from the flight altitude of the drone: the frame is sliced
+    into overlapping tiles of the input size of the model, run at full resolution as one batch, and the detections of all the tiles are merged
+    with a cross-tile NMS. A downscaled pass on the whole frame is added to the batch, so large objects cut by the tiles are still detected.
+
+        tiler = TiledInference(tile_size=640, overlap=0.2)
+        im, tiles = tiler.slice(im0)  # (n, 3, 640, 640) uint8 batch, and where every tile comes from
+        pred = model(preprocessed(im))
+        det = tiler.merge(pred, tiles, im0.shape)  # (n, 6) xyxy, conf, cls in pixels of im0
+    """
+
+    def __init__(self, tile_size=640, overlap=0.2, full_frame=True, merge_thres=0.5, conf_thres=0.25, iou_thres=0.45, classes=None,
+                 agnostic_nms=False, max_det=1000):
+        """
+        :param tile_size: size of the square tiles, in pixels of the original frame (the input size of the model)
+        :param overlap: fraction of a tile shared with its neighbours, so an object cut at the border of a tile is whole in the next one
+        :param full_frame: also run the whole frame, downscaled to tile_size
+        :param merge_thres: intersection over the smaller box above which detections of the same object by different tiles are merged
+        :param conf_thres: confidence threshold
+        :param iou_thres: NMS IOU threshold within a tile
+        :param classes: filter by class: --class 0, or --class 0 2 3
+        :param agnostic_nms: class-agnostic NMS
+        :param max_det: maximum detections per frame
+        """
+        if not 0 <= overlap < 1:
+            raise Exception(f"Tile overlap must be in [0, 1), got {overlap}")
+        self.tile_size = tile_size
+        self.overlap = overlap
+        self.full_frame = full_frame
+        self.merge_thres = merge_thres
+        self.conf_thres, self.iou_thres, self.max_det = conf_thres, iou_thres, max_det
+        self.classes, self.agnostic_nms = classes, agnostic_nms
+
+    def slice(self, im0: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """
+        :param im0: frame, HWC BGR
+        :return: (n, 3, tile_size, tile_size) RGB batch of the tiles, and (n, 5) x0, y0, gain, pad x, pad y of every tile to map its boxes
+                 back to the frame (x = (x_tile - pad x) / gain + x0)
+        """
+        height, width = im0.shape[:2]
+        ims, tiles = [], []
+        for y0 in tileStarts(height, self.tile_size, self.overlap):
+            for x0 in tileStarts(width, self.tile_size, self.overlap):
+                crop = im0[y0:y0 + self.tile_size, x0:x0 + self.tile_size]
+                im, (gain, _), (padw, padh) = letterbox(crop, self.tile_size, auto=False, scaleup=False)  # padded only if the frame is smaller
+                ims.append(im)
+                tiles.append((x0, y0, gain, padw, padh))
+        if self.full_frame and len(tiles) > 1:
+            im, (gain, _), (padw, padh) = letterbox(im0, self.tile_size, auto=False)
+            ims.append(im)
+            tiles.append((0, 0, gain, padw, padh))
+        im = np.stack(ims).transpose((0, 3, 1, 2))[:, ::-1]  # BHWC to BCHW, BGR to RGB
+        return np.ascontiguousarray(im), np.array(tiles, dtype=np.float32)
+
+    def merge(self, pred, tiles: np.ndarray, shape0) -> torch.Tensor:
+        """
+        :param pred: output of the model for the batch of slice
+        :param tiles: tiles returned by slice
+        :param shape0: shape of the frame
+        :return: (n, 6) detections of the frame, xyxy in pixels of the frame, conf, cls, as a detection of runYoloDetection after scale_boxes
+        """
+        det = non_max_suppression(pred, self.conf_thres, self.iou_thres, self.classes, self.agnostic_nms, max_det=self.max_det)
+        tiles = torch.from_numpy(tiles).to(det[0].device)
+        det = torch.cat([d for d in (self._toFrame(d, tile) for d, tile in zip(det, tiles)) if len(d)] or [det[0]])
+        clip_boxes(det[:, :4], shape0)
+        return crossTileNms(det, self.merge_thres, self.agnostic_nms)[:self.max_det]
+
+    @staticmethod
+    def _toFrame(det: torch.Tensor, tile: torch.Tensor) -> torch.Tensor:
+        x0, y0, gain, padw, padh = tile
+        det = det.clone()
+        det[:, [0, 2]] = (det[:, [0, 2]] - padw) / gain + x0
+        det[:, [1, 3]] = (det[:, [1, 3]] - padh) / gain + y0
+        return det
+
+
+def crossTileNms(det: torch.Tensor, thres: float = 0.5, agnostic=False) -> torch.Tensor:
+    """
+    NMS on the intersection over the smaller box rather than on the IOU: an object cut by the border of a tile gives a partial box inside the
+    whole box found by the next tile, with a low IOU but an intersection over the smaller box close to 1
+    :param det: (n, 6) detections, xyxy, conf, cls
+    :param thres: intersection over the smaller box above which the less confident detection is removed
+    :param agnostic: also merge detections of different classes
+    :return: detections kept, most confident first
+    """
+    if len(det) < 2:
+        return det
+    areas = (det[:, 2] - det[:, 0]).clamp(0) * (det[:, 3] - det[:, 1]).clamp(0)
+    order = areas.argsort(descending=True)
+    order = order[det[order, 4].argsort(descending=True, stable=True)]  # most confident first, then the whole box before its parts
+    det, areas = det[order], areas[order]
+    boxes = det[:, :4]
+    top_left = torch.max(boxes[:, None, :2], boxes[None, :, :2])
+    bottom_right = torch.min(boxes[:, None, 2:], boxes[None, :, 2:])
+    inter = (bottom_right - top_left).clamp(0).prod(2)
+    ios = inter / torch.min(areas[:, None], areas[None, :]).clamp(min=1e-7)
+    overlapping = ios > thres
+    if not agnostic:
+        overlapping &= det[:, None, 5] == det[None, :, 5]
+    overlapping = overlapping.triu(diagonal=1).cpu().numpy()  # only suppressed by a more confident detection
+
+    keep = np.ones(len(det), dtype=bool)
+    for i in range(len(det)):
+        if keep[i]:
+            keep[i + 1:] &= ~overlapping[i, i + 1:]
+    return det[torch.from_numpy(keep).to(det.device)]
@@ -236,6 +236,85 @@ class LoadScreenshots:
         return str(self.screen), im, im0, None, s  # screen, img, original img, im0s, s
 
 
+class LoadSharedMemory:
+    # YOLOv5 shared memory dataloader, i.e. `python MainYoloDetect.py --source shm://ue_frames`, frames written by a Core.SharedFrameRing producer
+    def __init__(self, source, img_size=640, stride=32, auto=True, transforms=None, timeout=None):
+        from Core.SharedFrameRing import SharedFrameRing
+
+        self.name = source[len('shm://'):]
+        self.ring = SharedFrameRing(self.name)  # attach, the producer owns the shared memory
+        self.img_size = img_size
+        self.stride = stride
+        self.transforms = transforms
+        self.auto = auto
+        self.timeout = timeout  # seconds without a new frame before the stream ends, None waits forever
+        self.mode = 'stream'
+        self.frame = 0
+        self.sequence = 0  # sequence number of the last frame read, older frames are skipped
+        self.skipped = 0  # frames written by the producer but never read, or overwritten while being read
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        while True:
+            frame = self.ring.read(self.sequence, timeout=self.timeout)
+            if frame is None:
+                raise StopIteration
+            self.skipped += frame.sequence - self.sequence - 1
+            self.sequence = frame.sequence
+            im0 = frame.image  # read-only view on the shared memory, no copy
+
+            if self.transforms:
+                im = self.transforms(im0)  # transforms
+            else:
+                im = letterbox(im0, self.img_size, stride=self.stride, auto=self.auto)[0]  # padded resize
+                im = im.transpose((2, 0, 1))[::-1]  # HWC to CHW, BGR to RGB
+                im = np.ascontiguousarray(im)  # contiguous, the only copy of the frame
+            if self.ring.isValid(frame):
+                break
+            self.skipped += 1  # overwritten by the producer while being preprocessed, use the next one
+
+        s = f'shm://{self.name} frame {frame.sequence}: '
+        self.frame += 1
+        return f'shm_{self.name}', im, im0, None, s  # name, img, original img, im0s, s
+
+    def __del__(self):
+        with contextlib.suppress(Exception):
+            self.ring.close()
+
+
+class LoadFrameSubscription:
+    # YOLOv5 frame broker dataloader, frames of a capture shared with other detectors, i.e. `runYoloDetection(frame_source=broker.subscribe())`
+    def __init__(self, subscription, img_size=640, stride=32, auto=True, transforms=None):
+        self.subscription = subscription  # AI.FrameBroker.FrameSubscription, the stream ends when it is closed
+        self.img_size = img_size
+        self.stride = stride
+        self.transforms = transforms
+        self.auto = auto
+        self.mode = 'stream'
+        self.frame = 0
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        frame = self.subscription.get()
+        if frame is None:
+            raise StopIteration
+        im0 = frame.image  # read-only, shared with the other subscribers
+
+        if self.transforms:
+            im = self.transforms(im0)  # transforms
+        else:
+            im = letterbox(im0, self.img_size, stride=self.stride, auto=self.auto)[0]  # padded resize
+            im = im.transpose((2, 0, 1))[::-1]  # HWC to CHW, BGR to RGB
+            im = np.ascontiguousarray(im)  # contiguous
+        s = f'broker frame {frame.index}: '
+        self.frame += 1
+        return 'broker', im, im0, None, s  # name, img, original img, im0s, s
+
+
 class LoadImages:
     # YOLOv5 image/video dataloader, i.e. `python MainYoloDetect.py --source image.jpg/vid.mp4`
     def __init__(self, path, img_size=640, stride=32, auto=True, transforms=None, vid_stride=1):